@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+Enrichissement des annonces par leur page de détail
+
+Les cartes des pages de résultats ne donnent que le prix, la surface, une courte
+description et la ville. L'étage, les charges, les classes énergie / GES et les
+nombres exacts de pièces et de chambres ne figurent que sur la page /ad/... de
+chaque annonce.
+
+Les pages de détail sont téléchargées dans un pool borné (DETAIL_CONFIG['workers']
+téléchargements simultanés au plus, tous appels confondus) avec un débit maximal
+commun vers le site. Le résultat est mémorisé par identifiant d'annonce avec la
+signature de la carte (prix, surface) : une annonce déjà détaillée n'est jamais
+retéléchargée, sauf si sa carte a changé.
+
+L'extraction n'utilise pas BeautifulSoup : les attributs sont lus dans les
+données embarquées de la page (__NEXT_DATA__), puis, à défaut, dans le texte par
+des expressions régulières compilées une seule fois.
+"""
+
+import html
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from ad_index import ad_id
+from config import DETAIL_CONFIG
+
+_DONNEES = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+_BALISES = re.compile(r'<(script|style)[^>]*>.*?</\1>|<[^>]+>', re.S | re.I)
+_ESPACES = re.compile(r'[\s\xa0 ]+')
+_NOMBRE = re.compile(r'\d+(?:[.,]\d+)?')
+
+# Attributs des données embarquées : clé du site -> champ de l'annonce
+_ATTRIBUTS = {
+    'rooms': 'pieces',
+    'bedrooms': 'chambres',
+    'square': 'surface_m2',
+    'floor_number': 'etage',
+    'nb_floors_building': 'etages_immeuble',
+    'energy_rate': 'classe_energie',
+    'ges': 'ges',
+    'monthly_charges': 'charges',
+    'charges': 'charges',
+    'elevator': 'ascenseur'
+}
+
+# Repli sur le texte de la page : champ -> motif (premier groupe capturé)
+_MOTIFS = {
+    'pieces': re.compile(r'(\d+)\s*pi[èe]ces?\b', re.I),
+    'chambres': re.compile(r'(\d+)\s*chambres?\b', re.I),
+    'etage': re.compile(r'[ée]tage\s*:?\s*(\d+|rdc|rez-de-chauss[ée]e)', re.I),
+    'classe_energie': re.compile(r'(?:classe [ée]nergie|dpe)\s*:?\s*([A-G])\b', re.I),
+    'ges': re.compile(r'\bges\s*:?\s*([A-G])\b', re.I),
+    'charges': re.compile(r'charges[^0-9€]{0,40}?(\d[\d ]*)\s*€', re.I)
+}
+
+_ENTIERS = {'pieces', 'chambres', 'etage', 'etages_immeuble', 'surface_m2', 'charges'}
+
+
+def _valeur(champ, brute):
+    """Normalise une valeur extraite (nombre, lettre de classe ou booléen)"""
+    texte = str(brute).strip()
+    if champ in _ENTIERS:
+        if champ == 'etage' and texte.lower().startswith(('rdc', 'rez')):
+            return 0
+        nombre = _NOMBRE.search(texte.replace(' ', ''))
+        return round(float(nombre.group().replace(',', '.'))) if nombre else None
+    if champ in ('classe_energie', 'ges'):
+        return texte.upper()[:1] if texte[:1].upper() in 'ABCDEFG' else None
+    if champ == 'ascenseur':
+        return texte.lower() in ('1', 'true', 'oui', 'yes')
+    return texte
+
+
+def _attributs(objet):
+    """Première liste d'attributs ({'key', 'value'}) trouvée dans les données embarquées"""
+    pile = [objet]
+    while pile:
+        courant = pile.pop()
+        if isinstance(courant, dict):
+            attributs = courant.get('attributes')
+            if isinstance(attributs, list) and attributs and isinstance(attributs[0], dict) and 'key' in attributs[0]:
+                return attributs
+            pile.extend(courant.values())
+        elif isinstance(courant, list):
+            pile.extend(courant)
+    return []
+
+
+def extract_details(content):
+    """
+    Extrait les caractéristiques d'une page de détail d'annonce
+
+    Args:
+        content (str): Contenu HTML de la page /ad/...
+
+    Returns:
+        dict: Champs trouvés parmi 'pieces', 'chambres', 'surface_m2', 'etage',
+              'etages_immeuble', 'classe_energie', 'ges', 'charges', 'ascenseur'
+    """
+    details = {}
+    donnees = _DONNEES.search(content)
+    if donnees:
+        try:
+            for attribut in _attributs(json.loads(donnees.group(1))):
+                champ = _ATTRIBUTS.get(attribut.get('key'))
+                if champ and champ not in details:
+                    valeur = _valeur(champ, attribut.get('value', attribut.get('value_label', '')))
+                    if valeur is not None:
+                        details[champ] = valeur
+        except ValueError as e:
+            print(f"Données embarquées illisibles : {e}")
+
+    manquants = [champ for champ in _MOTIFS if champ not in details]
+    if manquants:
+        texte = _ESPACES.sub(' ', html.unescape(_BALISES.sub(' ', content)))
+        for champ in manquants:
+            trouve = _MOTIFS[champ].search(texte)
+            if trouve:
+                valeur = _valeur(champ, trouve.group(1))
+                if valeur is not None:
+                    details[champ] = valeur
+    return details
+
+
+def _signature(annonce):
+    """Version de la carte d'une annonce : un changement de prix ou de surface relance le détail"""
+    return f"{annonce.get('prix')}|{annonce.get('surface_m2')}"
+
+
+def merge_details(annonce, details):
+    """Reporte les champs de la page de détail sur l'annonce (ils priment sur ceux de la carte)"""
+    annonce.update(details)
+    if annonce.get('prix') and annonce.get('surface_m2'):
+        annonce['prix_m2'] = round(annonce['prix'] / annonce['surface_m2'])
+    return annonce
+
+
+class DetailCache:
+    """Détails déjà extraits, par identifiant d'annonce (SQLite)"""
+
+    def __init__(self, path=None):
+        self.path = path or DETAIL_CONFIG['cache_path']
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS details ("
+            " ad_id TEXT PRIMARY KEY,"
+            " signature TEXT NOT NULL,"
+            " details TEXT NOT NULL,"  # JSON des champs extraits
+            " fetched_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key, signature):
+        """Détails mémorisés pour cette version de l'annonce, ou None"""
+        with self._lock:
+            row = self._db.execute("SELECT signature, details FROM details WHERE ad_id = ?", (key,)).fetchone()
+        if row is None or row[0] != signature:
+            return None
+        return json.loads(row[1])
+
+    def set(self, key, signature, details):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO details (ad_id, signature, details, fetched_at) VALUES (?, ?, ?, ?)",
+                (key, signature, json.dumps(details, ensure_ascii=False), time.time())
+            )
+            self._db.commit()
+
+
+class _Cadence:
+    """Espacement minimal entre deux requêtes, commun à tous les threads"""
+
+    def __init__(self, rate):
+        self.intervalle = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._prochain = 0.0
+
+    def attendre(self):
+        with self._lock:
+            maintenant = time.monotonic()
+            creneau = max(maintenant, self._prochain)
+            self._prochain = creneau + self.intervalle
+        time.sleep(creneau - maintenant)
+
+
+class DetailFetcher:
+    """Téléchargement concurrent, borné et mis en cache des pages de détail"""
+
+    def __init__(self, fetch=None, workers=None, rate=None, cache_path=None):
+        """
+        Args:
+            fetch (callable, optional): Fonction (url, chemin) -> contenu HTML ou None
+                (défaut: scraper.download_page avec nouvelles tentatives, voir resilience.py)
+            workers (int, optional): Téléchargements simultanés (défaut: DETAIL_CONFIG['workers'])
+            rate (float, optional): Requêtes par seconde au plus (défaut: DETAIL_CONFIG['requests_per_second'])
+            cache_path (str, optional): Fichier du cache (':memory:' pour un cache non persistant)
+        """
+        self.fetch = fetch
+        self.workers = workers or DETAIL_CONFIG['workers']
+        self.cache = DetailCache(cache_path)
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._cadence = _Cadence(DETAIL_CONFIG['requests_per_second'] if rate is None else rate)
+
+    def _fetch(self):
+        if self.fetch is None:
+            from challenges import get_challenge_queue
+            from config import CHALLENGE_CONFIG
+            from resilience import get_resilient_fetcher
+            self.fetch = partial(get_resilient_fetcher(),
+                                 challenges=get_challenge_queue() if CHALLENGE_CONFIG['park'] else None)
+        return self.fetch
+
+    def _telecharger(self, url):
+        """Contenu d'une page de détail, ou None ; une session bloquée est attendue dans ce thread"""
+        from challenges import ChallengeParked
+
+        fetch = self._fetch()
+        with self._slots:
+            self._cadence.attendre()
+            try:
+                return fetch(url, None)
+            except ChallengeParked as e:
+                return e.entry.queue.wait(e.entry)
+            except Exception as e:
+                print(f"Détail indisponible pour {url} : {e}")
+                return None
+
+    def enrich(self, annonces, verbose=True):
+        """
+        Complète les annonces avec leur page de détail
+
+        Args:
+            annonces (list): Annonces (modifiées sur place)
+            verbose (bool): Afficher l'avancement
+
+        Returns:
+            dict: 'annonces', 'en_cache', 'telechargees', 'echecs', 'elapsed' (secondes)
+        """
+        start = time.perf_counter()
+        a_telecharger = {}
+        en_cache = 0
+        for annonce in annonces:
+            if not annonce.get('url'):
+                continue
+            key, signature = ad_id(annonce), _signature(annonce)
+            details = self.cache.get(key, signature)
+            if details is not None:
+                merge_details(annonce, details)
+                en_cache += 1
+            else:
+                a_telecharger.setdefault((key, signature), []).append(annonce)
+
+        echecs = 0
+        if a_telecharger:
+            if verbose:
+                print(f"Pages de détail : {len(a_telecharger)} à télécharger, {en_cache} annonces déjà détaillées")
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(a_telecharger))) as executor:
+                contenus = executor.map(self._telecharger, [groupe[0]['url'] for groupe in a_telecharger.values()])
+                for ((key, signature), groupe), content in zip(a_telecharger.items(), contenus):
+                    if content is None:
+                        echecs += 1  # Non mémorisé : nouvel essai à la prochaine collecte
+                        continue
+                    details = extract_details(content)
+                    self.cache.set(key, signature, details)
+                    for annonce in groupe:
+                        merge_details(annonce, details)
+        return {'annonces': len(annonces), 'en_cache': en_cache, 'telechargees': len(a_telecharger) - echecs,
+                'echecs': echecs, 'elapsed': time.perf_counter() - start}
+
+
+_detail_fetcher = None
+_detail_fetcher_lock = threading.Lock()
+
+
+def get_detail_fetcher():
+    """Retourne le téléchargeur de pages de détail partagé (créé au premier appel)"""
+    global _detail_fetcher
+    with _detail_fetcher_lock:
+        if _detail_fetcher is None:
+            _detail_fetcher = DetailFetcher()
+        return _detail_fetcher
+
+
+def display_stats(stats):
+    """Affiche le bilan d'un enrichissement"""
+    print(f"Détails : {stats['telechargees']} pages téléchargées, {stats['en_cache']} annonces en cache, "
+          f"{stats['echecs']} échecs ({stats['elapsed']:.1f}s)")
+
+
+def _serveur_details(delai=0.2):
+    """Serveur HTTP local de pages de détail factices (une par identifiant)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delai)
+            numero = int(re.search(r'(\d+)', self.path).group(1))
+            donnees = {'props': {'pageProps': {'ad': {'list_id': numero, 'attributes': [
+                {'key': 'rooms', 'value': str(numero % 6 + 1)},
+                {'key': 'floor_number', 'value': str(numero % 5)},
+                {'key': 'energy_rate', 'value': 'abcdefg'[numero % 7]}]}}}}
+            corps = (f'<html><script id="__NEXT_DATA__" type="application/json">{json.dumps(donnees)}</script>'
+                     f'<p>GES : {"ABCDEFG"[numero % 7]}</p><p>{numero % 4 + 1} chambres</p>'
+                     f'<p>Charges : {numero % 300} €/mois</p></html>').encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def log_message(self, format, *args):
+            pass
+
+    serveur = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+def _benchmark(annonces=60, workers=6):
+    """Compare un téléchargement séquentiel et le pool, puis une seconde passe servie par le cache"""
+    from resilience import http_fetch
+
+    serveur = _serveur_details()
+    base = f"http://127.0.0.1:{serveur.server_port}"
+
+    def jeu():
+        return [{'url': f"{base}/ad/ventes_immobilieres/{1000 + i}", 'prix': 100000 + i, 'surface_m2': 50}
+                for i in range(annonces)]
+
+    for libelle, n in (("Séquentiel", 1), (f"Pool de {workers}", workers)):
+        fetcher = DetailFetcher(http_fetch, workers=n, rate=0, cache_path=':memory:')
+        stats = fetcher.enrich(jeu(), verbose=False)
+        print(f"{libelle:<14} : {stats['telechargees']} pages en {stats['elapsed']:.2f}s")
+
+    donnees = jeu()
+    stats = fetcher.enrich(donnees, verbose=False)
+    print(f"{'Seconde passe':<14} : {stats['telechargees']} pages, {stats['en_cache']} en cache "
+          f"({stats['elapsed'] * 1000:.0f} ms)")
+    donnees[0]['prix'] += 5000
+    stats = fetcher.enrich(donnees, verbose=False)
+    print(f"{'Prix modifié':<14} : {stats['telechargees']} page retéléchargée")
+    print(f"Exemple : {json.dumps({k: donnees[1][k] for k in sorted(donnees[1]) if k != 'url'}, ensure_ascii=False)}")
+    serveur.shutdown()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python ad_details.py <annonces.json> [sortie.json]")
+        print("       python ad_details.py bench [annonces] [workers]")
+        sys.exit(1)
+
+    if sys.argv[1] == 'bench':
+        _benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 60, int(sys.argv[3]) if len(sys.argv) > 3 else 6)
+        sys.exit(0)
+
+    try:
+        with open(sys.argv[1], 'r', encoding='utf-8') as f:
+            annonces = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Erreur lors de la lecture de {sys.argv[1]} : {e}")
+        sys.exit(1)
+    display_stats(get_detail_fetcher().enrich(annonces))
+    sortie = sys.argv[2] if len(sys.argv) > 2 else sys.argv[1]
+    with open(sortie, 'w', encoding='utf-8') as f:
+        json.dump(annonces, f, ensure_ascii=False, indent=2)
+    print(f"Annonces enrichies enregistrées dans {sortie}")
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Index en mémoire des annonces
+
+Ce module construit, une seule fois par jeu de données, un index permettant de
+filtrer les annonces sans reparcourir toute la liste à chaque critère :
+- tableaux triés + bisect pour les requêtes par intervalle sur les champs numériques
+- index inversé sur les mots normalisés de la localisation (ville, code postal)
+- bitsets (entiers Python) pour l'intersection des critères
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+# Champs numériques indexés pour les requêtes par intervalle
+NUMERIC_FIELDS = ('prix', 'surface_m2', 'prix_m2', 'pieces')
+
+
+def normalize_text(text):
+    """Met un texte en minuscules et supprime les accents"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize_location(text):
+    """Découpe une localisation en mots normalisés (ex: 'Saint-Juéry 81160' -> ['saint', 'juery', '81160'])"""
+    return re.findall(r'[a-z0-9]+', normalize_text(text))
+
+
+def parse_localisation(text):
+    """
+    Sépare la ville et le code postal d'une localisation d'annonce
+
+    Exemple : 'Saint-Juéry 81160' -> ('Saint-Juéry', '81160'), 'Albi' -> ('Albi', None)
+
+    Returns:
+        tuple: (ville, code postal ou None)
+    """
+    if not text:
+        return '', None
+    text = str(text).strip()
+    match = re.search(r'\b\d{5}\b', text)
+    if not match:
+        return text, None
+    ville = text[:match.start()].strip(' ,-') or text[match.end():].strip(' ,-')
+    return ville, match.group(0)
+
+
+def ad_id(annonce):
+    """Identifiant Le Bon Coin d'une annonce, tiré de son URL (l'URL entière à défaut)"""
+    url = annonce.get('url') or ''
+    match = re.search(r'/(\d+)(?:[/?#]|$)', url)
+    return match.group(1) if match else url
+
+
+def _bitset_from_positions(positions, size):
+    """Construit un bitset (entier) à partir d'une liste de positions"""
+    buffer = bytearray((size + 7) // 8)
+    for pos in positions:
+        buffer[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def _positions_from_bitset(bits):
+    """Retourne les positions des bits à 1, dans l'ordre croissant"""
+    # bin() est calculé en C : on ne boucle ensuite que sur les bits à 1
+    binary = bin(bits)[:1:-1]
+    positions = []
+    pos = binary.find('1')
+    while pos != -1:
+        positions.append(pos)
+        pos = binary.find('1', pos + 1)
+    return positions
+
+
+class AnnouncementIndex:
+    """Index des annonces pour des requêtes multi-critères rapides"""
+
+    def __init__(self, announcements):
+        """
+        Construit l'index à partir d'une liste d'annonces
+
+        Args:
+            announcements (list): Liste des annonces (dictionnaires)
+        """
+        self.announcements = list(announcements)
+        self.size = len(self.announcements)
+        self._all = (1 << self.size) - 1
+
+        # Tableaux triés (valeurs, positions) par champ numérique
+        self._sorted = {}
+        for field in NUMERIC_FIELDS:
+            self._sorted[field] = self._build_sorted(field)
+
+        # Dates de publication au format ISO : l'ordre lexicographique suffit
+        self._sorted['date_publication'] = self._build_sorted(
+            'date_publication', accept=lambda v: isinstance(v, str) and v != 'N/A'
+        )
+
+        # Index inversé mot -> bitset des annonces
+        postings = {}
+        for pos, annonce in enumerate(self.announcements):
+            for token in set(tokenize_location(annonce.get('localisation'))):
+                postings.setdefault(token, []).append(pos)
+        self._vocabulary = sorted(postings)
+        self._token_bits = {
+            token: _bitset_from_positions(positions, self.size)
+            for token, positions in postings.items()
+        }
+
+        # Bitsets meublé / non meublé
+        self._furnished_bits = {
+            value: _bitset_from_positions(
+                [pos for pos, a in enumerate(self.announcements) if a.get('furnished') is value],
+                self.size
+            )
+            for value in (True, False)
+        }
+
+    def _build_sorted(self, field, accept=None):
+        """Trie les annonces ayant une valeur pour le champ donné"""
+        if accept is None:
+            accept = lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)
+        pairs = sorted(
+            (annonce.get(field), pos)
+            for pos, annonce in enumerate(self.announcements)
+            if accept(annonce.get(field))
+        )
+        return [value for value, _ in pairs], [pos for _, pos in pairs]
+
+    def _range_bits(self, field, min_value=None, max_value=None):
+        """Bitset des annonces dont le champ est dans [min_value, max_value]"""
+        values, positions = self._sorted[field]
+        start = bisect_left(values, min_value) if min_value is not None else 0
+        end = bisect_right(values, max_value) if max_value is not None else len(values)
+        if start == 0 and end == len(values) and len(values) == self.size:
+            return self._all
+        return _bitset_from_positions(positions[start:end], self.size)
+
+    def _location_bits(self, location):
+        """
+        Bitset des annonces dont la localisation contient tous les mots recherchés.
+        Chaque mot recherché est comparé en préfixe aux mots indexés
+        ('alb' trouve 'Albi', '81' trouve '81000').
+        """
+        bits = self._all
+        for token in tokenize_location(location):
+            token_bits = 0
+            start = bisect_left(self._vocabulary, token)
+            for candidate in self._vocabulary[start:]:
+                if not candidate.startswith(token):
+                    break
+                token_bits |= self._token_bits[candidate]
+            bits &= token_bits
+            if not bits:
+                break
+        return bits
+
+    def query_positions(self, location=None, furnished=None, date_range=None, **ranges):
+        """
+        Retourne les positions des annonces correspondant à tous les critères
+
+        Args:
+            location (str, optional): Ville ou code postal (recherche par préfixe de mot)
+            furnished (bool, optional): True pour meublé, False pour non meublé
+            date_range (tuple, optional): (date_min, date_max) au format 'AAAA-MM-JJ', bornes incluses
+            **ranges: Intervalles (min, max) sur les champs numériques, ex: prix=(None, 200000)
+
+        Returns:
+            list: Positions des annonces dans l'ordre d'origine
+        """
+        bits = self._all
+        for field, bounds in ranges.items():
+            if field not in NUMERIC_FIELDS:
+                raise ValueError(f"Champ non indexé : {field}")
+            if bounds is None:
+                continue
+            min_value, max_value = bounds
+            if min_value is None and max_value is None:
+                continue
+            bits &= self._range_bits(field, min_value, max_value)
+            if not bits:
+                return []
+
+        if date_range is not None and date_range != (None, None):
+            bits &= self._range_bits('date_publication', *date_range)
+
+        if furnished is not None:
+            bits &= self._furnished_bits[bool(furnished)]
+
+        if location:
+            bits &= self._location_bits(location)
+
+        if bits == self._all:
+            return list(range(self.size))
+        return _positions_from_bitset(bits)
+
+    def query(self, **criteria):
+        """Comme query_positions, mais retourne directement les annonces"""
+        return [self.announcements[pos] for pos in self.query_positions(**criteria)]
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Contexte d'analyse des annonces
+
+Regroupe, pour une analyse donnée, les loyers de référence, les paramètres du prêt
+et les filtres. Chaque analyse possède son propre contexte : plusieurs villes peuvent
+être analysées en parallèle (threads ou processus) dans un même service, avec des
+résultats qui ne dépendent pas de l'ordre de traitement des fichiers.
+"""
+
+import copy
+
+from config import LOAN_PARAMS
+
+
+class AnalysisContext:
+    """Paramètres et références d'une analyse (remplace l'état global de display_ads)"""
+
+    def __init__(self, taux_annuel=None, duree_annees=None, filters=None, loyers_par_pieces=None,
+                 modele_loyer=None):
+        """
+        Args:
+            taux_annuel (float, optional): Taux du prêt en pourcentage (défaut: LOAN_PARAMS)
+            duree_annees (int, optional): Durée du prêt en années (défaut: LOAN_PARAMS)
+            filters (dict, optional): Critères transmis à filter_announcements
+            loyers_par_pieces (dict, optional): Loyer de référence par nombre de pièces
+            modele_loyer (RentModel, optional): Modèle des loyers estimant le loyer de chaque vente
+        """
+        self.taux_annuel = LOAN_PARAMS['interest_rate'] if taux_annuel is None else taux_annuel
+        self.duree_annees = LOAN_PARAMS['loan_duration_years'] if duree_annees is None else duree_annees
+        self.filters = {k: v for k, v in (filters or {}).items() if v is not None}
+        self.loyers_par_pieces = dict(loyers_par_pieces or {})
+        self.prix_moyen_par_pieces = {}
+        self.modele_loyer = modele_loyer
+
+    def copy(self):
+        """Retourne une copie indépendante du contexte"""
+        return copy.deepcopy(self)
+
+    def with_filters(self, **filters):
+        """Retourne une copie du contexte avec des filtres supplémentaires"""
+        ctx = self.copy()
+        ctx.filters.update({k: v for k, v in filters.items() if v is not None})
+        return ctx
+
+    @staticmethod
+    def moyennes_depuis_stats(stats_pieces):
+        """
+        Extrait le prix moyen par nombre de pièces d'un résultat de calculate_stats_par_pieces
+
+        Returns:
+            dict: {pieces: prix moyen arrondi à 2 décimales}
+        """
+        moyennes = {}
+        for pieces, data in (stats_pieces or {}).items():
+            if 'prix_moyen' in data:
+                moyennes[pieces] = round(data['prix_moyen'], 2)
+            elif data.get('surface_moyenne', 0) > 0 and 'prix_m2_moyen' in data:
+                moyennes[pieces] = round(data['prix_m2_moyen'] * data['surface_moyenne'], 2)
+        return moyennes
+
+    def set_loyers_depuis_stats(self, stats_pieces):
+        """Définit les loyers de référence à partir des statistiques par pièces des locations"""
+        self.loyers_par_pieces = self.moyennes_depuis_stats(stats_pieces)
+        return self
+
+    def set_modele_loyer(self, rentals):
+        """Ajuste (ou reprend du cache) le modèle des loyers sur les annonces de location"""
+        from rent_model import get_rent_model
+        self.modele_loyer = get_rent_model(rentals)
+        return self
+
+    def loyers_estimes(self, announcements):
+        """Loyer estimé de chaque annonce par le modèle, ou None sans modèle"""
+        if self.modele_loyer is None:
+            return None
+        return self.modele_loyer.predict(announcements)
+
+    def set_prix_depuis_stats(self, stats_pieces):
+        """Définit les prix moyens de vente à partir des statistiques par pièces des ventes"""
+        self.prix_moyen_par_pieces = self.moyennes_depuis_stats(stats_pieces)
+        return self
+
+    @property
+    def libelle_pret(self):
+        """Libellé des paramètres du prêt (ex: '3.5% - 25 ans')"""
+        return f"{self.taux_annuel:g}% - {self.duree_annees:g} ans"
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Exécution non interactive de recherches décrites dans un fichier de lot
+
+Le fichier (JSON, ou YAML si PyYAML est installé) liste les recherches :
+
+    {
+      "output_dir": "batch_output",
+      "workers": 3,
+      "shard": true,
+      "defaults": {"radius_km": 10, "variants": ["vente", "location_meublee", "location_non_meublee"]},
+      "searches": [
+        {"name": "albi", "locations": ["Albi", "81160"], "price": [50000, 200000], "rooms": [2, 4]},
+        {"name": "castres", "locations": ["Castres"], "radius_km": 15, "surface": "40-100"},
+        {"name": "tarn", "locations": ["Albi", "Castres", "Gaillac", "Lavaur"], "coverage": true}
+      ]
+    }
+
+Toutes les localisations sont géolocalisées en un lot, chaque recherche est
+développée en unités de collecte (une par variante vente / location), les unités
+identiques sont dédoublonnées puis exécutées dans le pool de crawler.run_units.
+Avec "coverage": true, les localisations d'une recherche sont remplacées par un
+ensemble réduit de cercles couvrant la même zone (voir coverage_planner.py). Avec
+"shard": true, chaque unité est découpée en tranches de prix / surface sous le
+plafond de résultats (voir sharding.py) ; avec "incremental": true, seules les
+pages de nouvelles annonces sont lues (voir incremental.py). "details": true
+complète les annonces avec leur page de détail (voir ad_details.py). Chaque recherche écrit ses annonces
+dans son propre dossier, et un résumé global est produit à la fin.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+from config import CRAWL_CONFIG
+from coverage_planner import plan_coverage
+from crawler import make_unit, run_units
+from geocoding import geocode_batch
+from url_builder import LBCUrlBuilder
+
+# Variante -> (catégorie, statut meublé)
+VARIANTS = {
+    'vente': ('vente', None),
+    'location': ('location', None),
+    'location_meublee': ('location', True),
+    'location_non_meublee': ('location', False)
+}
+DEFAULT_VARIANTS = ('vente', 'location_meublee', 'location_non_meublee')
+
+
+def load_job(path):
+    """Charge un fichier de lot JSON ou YAML"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(('.yml', '.yaml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML est nécessaire pour les fichiers YAML (pip install pyyaml)")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _bornes(value):
+    """Convertit [min, max] ou 'min-max' en tuple (min, max), None si absent"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [v or None for v in value.split('-', 1)]
+    bas, haut = (list(value) + [None, None])[:2]
+    return (int(bas) if bas is not None else None, int(haut) if haut is not None else None)
+
+
+def _nom_dossier(name):
+    """Nom de recherche utilisable comme nom de dossier"""
+    return re.sub(r'[^\w\-]+', '_', name).strip('_') or 'recherche'
+
+
+def build_search_units(search, coordinates):
+    """
+    Développe une recherche en unités de collecte
+
+    Args:
+        search (dict): Recherche (defaults déjà appliqués)
+        coordinates (dict): Résultat de géolocalisation par localisation saisie
+
+    Returns:
+        list: Unités (voir crawler.make_unit), une par variante
+    """
+    builder = LBCUrlBuilder()
+    builder.clear_locations()
+    radius_km = float(search.get('radius_km', CRAWL_CONFIG['default_radius_km']))
+    locations = [coordinates[loc] for loc in search['locations'] if coordinates.get(loc)]
+    if search.get('coverage') and locations:
+        # Cercles de recherche fusionnés / découpés à la place d'un cercle par localisation
+        plan = plan_coverage(locations, radius_km=radius_km)
+        search['couverture'] = plan['rapport']
+        locations = plan['cercles']
+    for loc in locations:
+        builder.add_location(loc['name'], loc['postcode'], loc['latitude'], loc['longitude'],
+                             int(float(loc.get('radius_km', radius_km)) * 1000))
+    if not builder.params.get('locations'):
+        return []
+
+    if _bornes(search.get('price')):
+        builder.set_price_range(*_bornes(search['price']))
+    if _bornes(search.get('surface')):
+        builder.set_surface_range(*_bornes(search['surface']))
+    if _bornes(search.get('rooms')):
+        builder.set_rooms_range(*_bornes(search['rooms']))
+    if search.get('property_types'):
+        builder.set_property_types(*search['property_types'])
+
+    units = []
+    for variant in search.get('variants', DEFAULT_VARIANTS):
+        if variant not in VARIANTS:
+            raise ValueError(f"Variante inconnue : {variant} (valeurs possibles : {', '.join(VARIANTS)})")
+        category, furnished = VARIANTS[variant]
+        if category == 'vente':
+            url = builder.build()
+        else:
+            url = builder.get_rental_url(furnished={True: 1, False: 2}.get(furnished))
+        units.append(make_unit(url, category, furnished, search.get('name')))
+    return units
+
+
+def expand_job(job):
+    """
+    Développe toutes les recherches d'un lot
+
+    Returns:
+        tuple: (recherches, unités) - chaque recherche porte 'name', 'dossier', 'units'
+               (clés de ses unités) et 'introuvables' (localisations non géolocalisées)
+    """
+    defaults = job.get('defaults', {})
+    searches = []
+    for i, search in enumerate(job.get('searches', []), 1):
+        search = dict(defaults, **search)
+        if isinstance(search.get('locations'), str):
+            search['locations'] = [search['locations']]
+        search.setdefault('name', f"recherche_{i}")
+        searches.append(search)
+
+    # Une seule géolocalisation par localisation distincte, pour tout le lot
+    entrees = sorted({loc for s in searches for loc in s.get('locations', [])})
+    coordinates = {r['input']: r['result'] for r in geocode_batch(entrees)}
+
+    units = {}
+    dossiers = set()
+    for search in searches:
+        dossier = _nom_dossier(search['name'])
+        while dossier in dossiers:
+            dossier += '_'
+        dossiers.add(dossier)
+        search_units = build_search_units(search, coordinates)
+        for unit in search_units:
+            units.setdefault(unit['key'], unit)
+        search['dossier'] = dossier
+        search['units'] = [unit['key'] for unit in search_units]
+        search['introuvables'] = [loc for loc in search.get('locations', []) if not coordinates.get(loc)]
+    return searches, units
+
+
+def _moyenne(valeurs):
+    valeurs = [v for v in valeurs if isinstance(v, (int, float))]
+    return round(sum(valeurs) / len(valeurs), 2) if valeurs else None
+
+
+def write_partition(output_dir, search, results):
+    """
+    Écrit les annonces d'une recherche dans son dossier et retourne son résumé
+
+    Args:
+        output_dir (str): Dossier du lot
+        search (dict): Recherche développée par expand_job
+        results (dict): Résultats de run_units par clé d'unité
+
+    Returns:
+        dict: Résumé de la recherche
+    """
+    ventes, locations = {}, {}
+    erreurs = 0
+    for key in search['units']:
+        result = results.get(key)
+        if not result or result['status'] != 'ok':
+            erreurs += 1
+            continue
+        for annonce in result['annonces']:
+            cible = ventes if annonce.get('category') == 'vente' else locations
+            cible.setdefault(annonce['url'], annonce)
+
+    dossier = os.path.join(output_dir, search['dossier'])
+    os.makedirs(dossier, exist_ok=True)
+    for nom, annonces in (('ventes.json', ventes), ('locations.json', locations)):
+        with open(os.path.join(dossier, nom), 'w', encoding='utf-8') as f:
+            json.dump(list(annonces.values()), f, ensure_ascii=False, indent=2)
+
+    return {
+        'name': search['name'],
+        'dossier': dossier,
+        'unites': len(search['units']),
+        'erreurs': erreurs,
+        'introuvables': search['introuvables'],
+        'ventes': len(ventes),
+        'locations': len(locations),
+        'prix_m2_moyen': _moyenne(a.get('prix_m2') for a in ventes.values()),
+        'loyer_moyen': _moyenne(a.get('prix') for a in locations.values()),
+        'couverture': search.get('couverture')
+    }
+
+
+def run_batch(job, max_workers=None, fetch=None):
+    """
+    Exécute toutes les recherches d'un lot
+
+    Args:
+        job (dict): Contenu du fichier de lot
+        max_workers (int, optional): Taille du pool (défaut: job['workers'], sinon CRAWL_CONFIG)
+        fetch (callable, optional): Fonction de téléchargement (voir crawler.fetch_unit)
+
+    Returns:
+        dict: Résumé global ('recherches', 'unites', 'unites_partagees', 'duree' et un résumé par recherche)
+    """
+    start = time.perf_counter()
+    output_dir = job.get('output_dir', CRAWL_CONFIG['output_dir'])
+    searches, units = expand_job(job)
+    references = sum(len(s['units']) for s in searches)
+    print(f"{len(searches)} recherches, {len(units)} unités de collecte "
+          f"({references - len(units)} partagées entre recherches)")
+
+    runner = run_units
+    if job.get('incremental'):
+        from incremental import run_incremental as runner
+    elif job.get('shard'):
+        from sharding import run_sharded as runner
+    results = runner(units.values(), max_workers=max_workers or job.get('workers'),
+                     pages_dir=os.path.join(output_dir, 'pages'), fetch=fetch)
+    details = None
+    if job.get('details'):
+        # Une annonce partagée entre recherches n'est détaillée qu'une fois
+        from ad_details import get_detail_fetcher
+        details = get_detail_fetcher().enrich([a for r in results.values() if r['status'] == 'ok'
+                                               for a in r['annonces']])
+
+    summary = {
+        'recherches': len(searches),
+        'unites': len(units),
+        'unites_partagees': references - len(units),
+        'erreurs': sum(1 for r in results.values() if r['status'] != 'ok'),
+        'temps_bloque': round(sum(r.get('bloque', 0.0) for r in results.values()), 1),
+        'details': details,
+        'incremental': None,
+        'resultats': [write_partition(output_dir, search, results) for search in searches]
+    }
+    if job.get('incremental'):
+        from incremental import throughput_report
+        summary['incremental'] = throughput_report(results)
+    if fetch is None:
+        from resilience import get_resilient_fetcher
+        summary['reseau'] = get_resilient_fetcher().stats()['total']
+    summary['duree'] = round(time.perf_counter() - start, 2)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def display_summary(summary):
+    """Affiche le résumé d'un lot"""
+    print(f"\n{'='*100}")
+    print(f"RÉSUMÉ DU LOT : {summary['recherches']} recherches, {summary['unites']} unités, "
+          f"{summary['erreurs']} en erreur, {summary['duree']}s dont {summary['temps_bloque']}s bloqué")
+    if summary.get('reseau'):
+        reseau = summary['reseau']
+        print(f"Requêtes : {reseau['tentatives']} tentatives pour {reseau['appels']} appels "
+              f"(amplification {reseau['amplification']:.2f}, {reseau['rejets']} rejetés par les disjoncteurs)")
+    if summary.get('incremental'):
+        from incremental import display_report
+        display_report(summary['incremental'])
+    if summary.get('details'):
+        details = summary['details']
+        print(f"Pages de détail : {details['telechargees']} téléchargées, {details['en_cache']} annonces en cache, "
+              f"{details['echecs']} échecs")
+    print(f"{'='*100}")
+    print(f"{'Recherche':<25} | {'Ventes':>7} | {'Locations':>9} | {'Prix/m² moyen':>13} | {'Loyer moyen':>11} | Erreurs")
+    print("-" * 100)
+    for r in summary['resultats']:
+        erreurs = r['erreurs'] + len(r['introuvables'])
+        print(f"{r['name'][:25]:<25} | {r['ventes']:>7} | {r['locations']:>9} | "
+              f"{r['prix_m2_moyen'] if r['prix_m2_moyen'] is not None else 'N/A':>13} | "
+              f"{r['loyer_moyen'] if r['loyer_moyen'] is not None else 'N/A':>11} | {erreurs}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python batch_runner.py <lot.json|lot.yaml> [workers]")
+        sys.exit(1)
+
+    try:
+        job = load_job(sys.argv[1])
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Erreur lors du chargement du lot : {e}")
+        sys.exit(1)
+    display_summary(run_batch(job, max_workers=int(sys.argv[2]) if len(sys.argv) > 2 else None))
@@ -10,7 +10,34 @@ Ce script permet de calculer les mensualités d'un prêt immobilier en fonction
 - de la durée de remboursement en années
 """
 
-import math
+from functools import lru_cache
+
+import numpy as np
+
+@lru_cache(maxsize=None)
+def facteur_annuite(taux_annuel, duree_annees):
+    """
+    Retourne le facteur d'annuité mensuel : mensualité = montant * facteur
+    
+    Le calcul de la puissance n'est fait qu'une fois par couple (taux, durée).
+    
+    Args:
+        taux_annuel (float): Taux d'intérêt annuel en pourcentage (ex: 1.5 pour 1.5%)
+        duree_annees (int): Durée du prêt en années
+        
+    Returns:
+        float: Facteur d'annuité (0 si la durée ou le taux ne sont pas valides)
+    """
+    if duree_annees <= 0 or taux_annuel < 0:
+        return 0.0
+    
+    taux_mensuel = (taux_annuel / 100) / 12
+    nb_mensualites = duree_annees * 12
+    
+    # Cas particulier : taux à 0%
+    if taux_mensuel == 0:
+        return 1 / nb_mensualites
+    return taux_mensuel / (1 - (1 + taux_mensuel) ** -nb_mensualites)
 
 def calculer_mensualite(montant, taux_annuel, duree_annees):
     """
@@ -24,23 +51,104 @@ def calculer_mensualite(montant, taux_annuel, duree_annees):
     Returns:
         float: Montant de la mensualité
     """
-    # Conversion du taux annuel en taux mensuel et en décimal
+    if montant <= 0:
+        return 0.0
+    return montant * facteur_annuite(taux_annuel, duree_annees)
+
+def calculer_mensualites(montants, taux_annuel, duree_annees):
+    """
+    Calcule les mensualités d'un lot de prêts en une seule opération
+    
+    Args:
+        montants (array-like): Montants des prêts en euros
+        taux_annuel (float): Taux d'intérêt annuel en pourcentage
+        duree_annees (int): Durée des prêts en années
+        
+    Returns:
+        numpy.ndarray: Mensualités (0 pour les montants nuls, négatifs ou manquants)
+    """
+    montants = np.asarray(montants, dtype=float)
+    return np.where(montants > 0, montants * facteur_annuite(taux_annuel, duree_annees), 0.0)
+
+def plan_amortissement(montants, taux_annuel, duree_annees):
+    """
+    Calcule le tableau d'amortissement complet d'un ou plusieurs prêts, sans boucle mensuelle
+    
+    Le capital restant dû après k mois est donné par la forme fermée
+    C_k = C * ((1 + t)^n - (1 + t)^k) / ((1 + t)^n - 1), dont on déduit les intérêts
+    et le capital remboursé de chaque mois.
+    
+    Args:
+        montants (float ou array-like): Montant(s) des prêts en euros
+        taux_annuel (float): Taux d'intérêt annuel en pourcentage
+        duree_annees (int): Durée des prêts en années
+        
+    Returns:
+        dict: Tableaux de forme (nb_prets, nb_mois) : 'interets', 'capital_rembourse',
+              'capital_restant' (après le paiement du mois), ainsi que 'mensualite' (nb_prets,)
+    """
+    montants = np.atleast_1d(np.asarray(montants, dtype=float))
+    nb_mensualites = int(duree_annees * 12)
     taux_mensuel = (taux_annuel / 100) / 12
+    mois = np.arange(nb_mensualites + 1, dtype=float)
+    
+    if taux_mensuel == 0:
+        part_restante = 1 - mois / nb_mensualites
+    else:
+        croissance = (1 + taux_mensuel) ** mois
+        part_restante = (croissance[-1] - croissance) / (croissance[-1] - 1)
+    
+    # Capital restant dû avant (colonne 0) et après chaque mensualité ;
+    # un montant invalide (nul, négatif ou absent) donne une ligne de zéros
+    montants = np.where(montants > 0, montants, 0.0)
+    restant = montants[:, None] * part_restante[None, :]
+    mensualite = calculer_mensualites(montants, taux_annuel, duree_annees)
+    interets = restant[:, :-1] * taux_mensuel
+    
+    return {
+        'mensualite': mensualite,
+        'interets': interets,
+        'capital_rembourse': mensualite[:, None] - interets,
+        'capital_restant': np.maximum(restant[:, 1:], 0.0)
+    }
+
+def cout_total_interets(montants, taux_annuel, duree_annees):
+    """Coût total des intérêts d'un lot de prêts (mensualité * nombre de mois - capital)"""
+    montants = np.asarray(montants, dtype=float)
+    mensualites = calculer_mensualites(montants, taux_annuel, duree_annees)
+    return np.where(montants > 0, mensualites * duree_annees * 12 - montants, 0.0)
+
+def capital_restant_du(montants, taux_annuel, duree_annees, apres_annees):
+    """
+    Capital restant dû d'un lot de prêts après un nombre d'années donné
     
-    # Calcul du nombre de mensualités
+    Args:
+        montants (array-like): Montants des prêts en euros
+        taux_annuel (float): Taux d'intérêt annuel en pourcentage
+        duree_annees (int): Durée des prêts en années
+        apres_annees (float): Nombre d'années écoulées
+        
+    Returns:
+        numpy.ndarray: Capital restant dû pour chaque prêt
+    """
+    montants = np.asarray(montants, dtype=float)
     nb_mensualites = duree_annees * 12
+    k = min(max(apres_annees * 12, 0), nb_mensualites)
+    taux_mensuel = (taux_annuel / 100) / 12
     
-    # Calcul de la mensualité avec la formule des intérêts composés
-    if taux_mensuel == 0:  # Cas particulier : taux à 0%
-        mensualite = montant / nb_mensualites
+    if taux_mensuel == 0:
+        part_restante = 1 - k / nb_mensualites
     else:
-        mensualite = (montant * taux_mensuel * (1 + taux_mensuel)**nb_mensualites) / ((1 + taux_mensuel)**nb_mensualites - 1)
-    
-    return mensualite
+        part_restante = ((1 + taux_mensuel) ** nb_mensualites - (1 + taux_mensuel) ** k) / \
+                        ((1 + taux_mensuel) ** nb_mensualites - 1)
+    return np.where(montants > 0, montants * part_restante, 0.0)
 
-def afficher_plan_remboursement(montant, taux_annuel, duree_annees, mensualite):
+def afficher_plan_remboursement(montant, taux_annuel, duree_annees, mensualite=None):
     """
     Affiche un tableau d'amortissement simplifié du prêt
+    
+    Les lignes sont lues dans plan_amortissement ; l'argument mensualite n'est
+    conservé que pour compatibilité (la mensualité est recalculée).
     """
     print("\n" + "="*80)
     print("TABLEAU D'AMORTISSEMENT DU PRÊT")
@@ -48,27 +156,22 @@ def afficher_plan_remboursement(montant, taux_annuel, duree_annees, mensualite):
     print(f"{'Mois':<8} | {'Capital restant dû':<20} | {'Intérêts':<15} | {'Capital remboursé':<20}")
     print("-"*80)
     
-    capital_restant = montant
-    taux_mensuel = (taux_annuel / 100) / 12
+    plan = plan_amortissement(montant, taux_annuel, duree_annees)
+    nb_mensualites = duree_annees * 12
     
-    for mois in range(1, duree_annees * 12 + 1):
-        interets_mois = capital_restant * taux_mensuel
-        capital_rembourse = mensualite - interets_mois
-        
+    for mois in range(1, nb_mensualites + 1):
         # Afficher uniquement la première année et la dernière année
-        if mois <= 12 or mois > (duree_annees * 12 - 12) or mois % 48 == 0:
-            print(f"{mois:<8} | {capital_restant:>18.2f} € | {interets_mois:>13.2f} € | {capital_rembourse:>18.2f} €")
+        if mois <= 12 or mois > (nb_mensualites - 12) or mois % 48 == 0:
+            # Capital restant dû avant le paiement du mois
+            capital_restant = montant if mois == 1 else plan['capital_restant'][0, mois - 2]
+            if capital_restant < 0.01:
+                capital_restant = 0
+            print(f"{mois:<8} | {capital_restant:>18.2f} € | {plan['interets'][0, mois - 1]:>13.2f} € | {plan['capital_rembourse'][0, mois - 1]:>18.2f} €")
             
             # Afficher une ligne de séparation après la première année
             if mois == 12 and duree_annees > 1:
                 print("-"*80)
                 print("...")
-        
-        capital_restant -= capital_rembourse
-        
-        # Éviter les valeurs négatives à la fin
-        if capital_restant < 0.01:
-            capital_restant = 0
     
     print("-"*80)
 
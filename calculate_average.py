@@ -40,6 +40,29 @@ def calculate_sale_stats(json_file):
         with open(json_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
+        return calculate_sale_stats_from_data(data)
+        
+    except FileNotFoundError:
+        print(f"Erreur: Le fichier {json_file} n'a pas été trouvé.")
+        return None
+    except json.JSONDecodeError:
+        print("Erreur: Le fichier n'est pas un JSON valide.")
+        return None
+    except Exception as e:
+        print(f"Une erreur s'est produite lors du calcul des statistiques de vente: {str(e)}")
+        return None
+
+def calculate_sale_stats_from_data(data):
+    """
+    Calcule les statistiques pour des annonces de vente déjà chargées en mémoire
+    
+    Args:
+        data (list): Liste des annonces de vente
+        
+    Returns:
+        dict: Dictionnaire contenant les statistiques de vente
+    """
+    try:
         if not data:
             print("Aucune annonce trouvée dans le fichier.")
             return None
@@ -74,12 +97,6 @@ def calculate_sale_stats(json_file):
             'by_rooms': avg_by_rooms
         }
         
-    except FileNotFoundError:
-        print(f"Erreur: Le fichier {json_file} n'a pas été trouvé.")
-        return None
-    except json.JSONDecodeError:
-        print("Erreur: Le fichier n'est pas un JSON valide.")
-        return None
     except Exception as e:
         print(f"Une erreur s'est produite lors du calcul des statistiques de vente: {str(e)}")
         return None
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+File d'attente des pages bloquées par une protection anti-bot (CAPTCHA)
+
+Quand une page de résultats affiche une protection anti-bot, le téléchargement
+n'attend plus une saisie au clavier : la session du navigateur est mise de côté
+(« parquée ») avec sa fenêtre ouverte, et le thread repart sur les URL suivantes.
+L'opérateur résout le CAPTCHA dans la fenêtre du navigateur, puis reprend la
+session :
+- depuis la page locale http://127.0.0.1:8765/ (CHALLENGE_CONFIG), démarrée au
+  premier blocage
+- ou en ligne de commande : python challenges.py list | resume <id> | abandon <id>
+
+À la reprise, le contenu de la page est relu dans la session conservée ; si la
+protection est toujours présente, la session reste en attente. Le temps passé
+en attente est mesuré pour chaque session.
+"""
+
+import html
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from config import CHALLENGE_CONFIG
+
+
+def is_challenge_page(content):
+    """Vrai si le contenu HTML est une page de protection anti-bot"""
+    content = (content or '').lower()
+    return 'datadome' in content or 'access denied' in content
+
+
+class ChallengeParked(Exception):
+    """Téléchargement interrompu : la session est en attente dans la file"""
+
+    def __init__(self, entry):
+        super().__init__(f"Protection anti-bot, session {entry.id} en attente de résolution")
+        self.entry = entry
+
+
+class ParkedSession:
+    """Session de navigateur bloquée, conservée jusqu'à sa reprise"""
+
+    def __init__(self, id, url, driver, output_path=None):
+        self.id = id
+        self.url = url
+        self.driver = driver
+        self.output_path = output_path
+        self.parked_at = time.time()
+        self.resolved_at = None
+        self.status = 'en_attente'  # en_attente, resolue, abandonnee
+        self.content = None
+        self.done = threading.Event()
+        self.queue = None  # File qui détient la session
+
+    @property
+    def blocked_seconds(self):
+        """Temps passé en attente (jusqu'à maintenant si la session n'est pas reprise)"""
+        return (self.resolved_at or time.time()) - self.parked_at
+
+    def to_dict(self):
+        return {'id': self.id, 'url': self.url, 'status': self.status,
+                'parked_at': time.strftime('%H:%M:%S', time.localtime(self.parked_at)),
+                'blocked_seconds': round(self.blocked_seconds, 1)}
+
+    def _close(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"Erreur lors de la fermeture du navigateur : {e}")
+        self.driver = None
+
+
+class ChallengeQueue:
+    """File des sessions bloquées, partagée par tous les threads de collecte"""
+
+    def __init__(self, host=None, port=None):
+        self.host = host or CHALLENGE_CONFIG['host']
+        self.port = port or CHALLENGE_CONFIG['port']
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._next_id = 1
+
+    @property
+    def address(self):
+        return f"http://{self.host}:{self.port}/"
+
+    def park(self, url, driver, output_path=None):
+        """
+        Met une session bloquée en attente et démarre la page de reprise si besoin
+
+        Returns:
+            ParkedSession: Session en attente (le navigateur appartient désormais à la file)
+        """
+        with self._lock:
+            entry = ParkedSession(str(self._next_id), url, driver, output_path)
+            entry.queue = self
+            self._next_id += 1
+            self.sessions[entry.id] = entry
+        self.start_server()
+        print(f"Protection anti-bot sur {url} : session {entry.id} en attente. "
+              f"Résolvez le CAPTCHA dans le navigateur puis reprenez-la sur {self.address} "
+              f"ou avec « python challenges.py resume {entry.id} »")
+        return entry
+
+    def resume(self, id):
+        """
+        Relit la page d'une session après résolution du CAPTCHA
+
+        Returns:
+            str: Nouveau statut ('resolue', 'en_attente' si la protection est toujours là),
+                 ou None si la session est inconnue ou déjà terminée
+        """
+        with self._lock:
+            entry = self.sessions.get(str(id))
+            if entry is None or entry.status != 'en_attente':
+                return None
+            try:
+                content = entry.driver.page_source
+            except Exception as e:
+                print(f"Session {entry.id} illisible : {e}")
+                return self._finish(entry, 'abandonnee')
+            if is_challenge_page(content):
+                return entry.status
+            entry.content = content
+            if entry.output_path:
+                with open(entry.output_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+            return self._finish(entry, 'resolue')
+
+    def abandon(self, id):
+        """Ferme une session sans récupérer sa page"""
+        with self._lock:
+            entry = self.sessions.get(str(id))
+            if entry is None or entry.status != 'en_attente':
+                return None
+            return self._finish(entry, 'abandonnee')
+
+    def _finish(self, entry, status):
+        entry.status = status
+        entry.resolved_at = time.time()
+        entry._close()
+        entry.done.set()
+        return status
+
+    def wait(self, entry, timeout=None):
+        """
+        Attend la reprise d'une session ; elle est abandonnée au-delà du délai
+
+        Returns:
+            str: Contenu HTML de la page, ou None si la session a été abandonnée
+        """
+        timeout = CHALLENGE_CONFIG['max_wait'] if timeout is None else timeout
+        if not entry.done.wait(max(0.0, timeout - (time.time() - entry.parked_at))):
+            print(f"Session {entry.id} abandonnée après {timeout}s d'attente")
+            self.abandon(entry.id)
+        return entry.content
+
+    def report(self):
+        """Temps bloqué par session et total (secondes)"""
+        with self._lock:
+            sessions = [s.to_dict() for s in self.sessions.values()]
+        return {'sessions': sessions, 'total_blocked_seconds': round(sum(s['blocked_seconds'] for s in sessions), 1)}
+
+    def start_server(self):
+        """Démarre la page de reprise locale (une seule fois)"""
+        with self._lock:
+            if self._server is not None:
+                return
+            try:
+                self._server = ThreadingHTTPServer((self.host, self.port), _handler(self))
+            except OSError as e:
+                print(f"Page de reprise indisponible sur {self.address} ({e}) ; "
+                      f"utilisez la session directement via ChallengeQueue.resume")
+                self._server = False
+                return
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+
+def _handler(queue):
+    """Classe de requête HTTP liée à une file"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, body, content_type='text/html; charset=utf-8'):
+            data = body.encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/api/challenges':
+                self._send(200, json.dumps(queue.report(), ensure_ascii=False), 'application/json')
+                return
+            lignes = []
+            for s in queue.report()['sessions']:
+                actions = ''
+                if s['status'] == 'en_attente':
+                    actions = ''.join(f'<form method="post" action="/{action}/{s["id"]}" style="display:inline">'
+                                      f'<button>{libelle}</button></form> '
+                                      for action, libelle in (('resume', 'Reprendre'), ('abandon', 'Abandonner')))
+                lignes.append(f"<tr><td>{s['id']}</td><td>{html.escape(s['url'])}</td><td>{s['status']}</td>"
+                              f"<td>{s['parked_at']}</td><td>{s['blocked_seconds']:.0f}s</td><td>{actions}</td></tr>")
+            self._send(200, "<html><head><meta charset='utf-8'><meta http-equiv='refresh' content='10'>"
+                            "<title>Sessions bloquées</title></head><body><h1>Sessions bloquées</h1>"
+                            "<p>Résolvez le CAPTCHA dans la fenêtre du navigateur, puis reprenez la session.</p>"
+                            "<table border='1' cellpadding='4'><tr><th>Id</th><th>URL</th><th>Statut</th>"
+                            "<th>Depuis</th><th>Bloquée</th><th></th></tr>" + ''.join(lignes) + "</table></body></html>")
+
+        def do_POST(self):
+            parts = self.path.strip('/').split('/')
+            if len(parts) != 2 or parts[0] not in ('resume', 'abandon'):
+                self._send(404, "Action inconnue")
+                return
+            status = queue.resume(parts[1]) if parts[0] == 'resume' else queue.abandon(parts[1])
+            if 'application/json' in (self.headers.get('Accept') or ''):
+                self._send(200, json.dumps({'id': parts[1], 'status': status}), 'application/json')
+            else:
+                self.send_response(303)
+                self.send_header('Location', '/')
+                self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_challenge_queue():
+    """Retourne la file partagée des sessions bloquées (créée au premier appel)"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ChallengeQueue()
+        return _queue
+
+
+def _appel(chemin, methode='GET', port=None):
+    """Envoie une commande à la page de reprise d'une collecte en cours"""
+    adresse = f"http://{CHALLENGE_CONFIG['host']}:{port or CHALLENGE_CONFIG['port']}{chemin}"
+    requete = Request(adresse, method=methode, headers={'Accept': 'application/json'})
+    with urlopen(requete, timeout=10) as reponse:
+        return json.loads(reponse.read().decode('utf-8'))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('list', 'resume', 'abandon') or \
+            (sys.argv[1] != 'list' and len(sys.argv) < 3):
+        print("Usage: python challenges.py list | resume <id> | abandon <id>")
+        sys.exit(1)
+
+    try:
+        if sys.argv[1] == 'list':
+            rapport = _appel('/api/challenges')
+            for s in rapport['sessions']:
+                print(f"{s['id']:>4} | {s['status']:<11} | {s['blocked_seconds']:>7.0f}s | {s['url']}")
+            print(f"Temps bloqué total : {rapport['total_blocked_seconds']:.0f}s")
+        else:
+            reponse = _appel(f"/{sys.argv[1]}/{sys.argv[2]}", methode='POST')
+            if reponse['status'] is None:
+                print(f"Session {sys.argv[2]} inconnue ou déjà terminée")
+            elif reponse['status'] == 'en_attente':
+                print(f"Session {sys.argv[2]} toujours bloquée : résolvez le CAPTCHA dans le navigateur")
+            else:
+                print(f"Session {sys.argv[2]} : {reponse['status']}")
+    except (URLError, OSError) as e:
+        print(f"Aucune collecte en attente joignable sur le port {CHALLENGE_CONFIG['port']} : {e}")
+        sys.exit(1)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Estimation du loyer d'une annonce de vente par des locations comparables
+
+Pour chaque annonce de vente, les k locations les plus semblables sont retenues
+selon une distance combinant :
+- l'écart relatif de surface (logarithme du rapport des surfaces)
+- l'écart du nombre de pièces
+- un statut meublé différent
+- la distance géographique (voir spatial_index.resoudre_coordonnees), en projection plane
+
+Les distances sont calculées par blocs d'annonces de vente, chaque bloc étant un
+seul produit matriciel (bloc × termes) @ (termes × locations), puis np.argpartition
+sélectionne les k plus proches : aucune double boucle Python sur les annonces.
+"""
+
+import sys
+
+import numpy as np
+
+from config import COMPARABLES_CONFIG
+from enrichment import colonne_numerique
+from spatial_index import KM_PAR_DEGRE, resoudre_coordonnees
+
+
+def _meuble(announcements):
+    """Statut meublé : 1.0, 0.0 ou NaN si inconnu"""
+    return np.array(
+        [float(a['furnished']) if isinstance(a.get('furnished'), bool) else np.nan for a in announcements],
+        dtype=float
+    )
+
+
+class ComparablesEngine:
+    """Recherche des locations comparables et estimation du loyer des annonces de vente"""
+
+    def __init__(self, rentals, k=None, params=None, remote=None):
+        """
+        Args:
+            rentals (list): Annonces de location (celles sans loyer sont ignorées)
+            k (int, optional): Nombre de comparables par annonce (défaut: COMPARABLES_CONFIG['k'])
+            params (dict, optional): Échelles et pénalités (voir COMPARABLES_CONFIG)
+            remote (bool, optional): Géolocalisation via Nominatim (voir resoudre_coordonnees)
+        """
+        self.params = dict(COMPARABLES_CONFIG)
+        self.params.update(params or {})
+        self.k = k or self.params['k']
+        self.remote = remote
+
+        loyers = colonne_numerique(rentals, 'prix')
+        valides = loyers > 0
+        self.rentals = [a for a, ok in zip(rentals, valides) if ok]
+        self.loyer = loyers[valides]
+        self.surface = colonne_numerique(self.rentals, 'surface_m2')
+        self.pieces = colonne_numerique(self.rentals, 'pieces')
+        self.meuble = _meuble(self.rentals)
+        lat, lon = resoudre_coordonnees(self.rentals, remote=remote)
+
+        # Projection plane (km) autour du point moyen : suffisante à l'échelle d'un département
+        localisees = np.isfinite(lat) & np.isfinite(lon)
+        self.lat_ref = float(np.mean(lat[localisees])) if localisees.any() else 0.0
+        self.lon_ref = float(np.mean(lon[localisees])) if localisees.any() else 0.0
+        self.termes = self._termes(self.surface, self.pieces, self.meuble,
+                                   *self._projeter(lat, lon), cote='location').T
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.loyer_m2 = np.where(self.surface > 0, self.loyer / self.surface, np.nan)
+
+    def __len__(self):
+        return len(self.rentals)
+
+    def _projeter(self, lat, lon):
+        """Convertit des coordonnées en km autour du point moyen des locations (x vers l'est, y vers le nord)"""
+        return ((lon - self.lon_ref) * KM_PAR_DEGRE * np.cos(np.radians(self.lat_ref)),
+                (lat - self.lat_ref) * KM_PAR_DEGRE)
+
+    def _termes(self, surface, pieces, meuble, x, y, cote):
+        """
+        Matrice des termes de la distance au carré d'un côté de la comparaison
+
+        Pour un critère v connu sur les deux annonces (masques m), m_a m_b (v_a - v_b)²
+        se développe en m_a v_a² · m_b - 2 m_a v_a · m_b v_b + m_a · m_b v_b² : la
+        matrice des distances au carré est alors le produit ventes @ locations.T.
+        Une localisation inconnue d'un côté compte pour unknown_distance_km.
+
+        Args:
+            cote (str): 'vente' ou 'location'
+
+        Returns:
+            numpy.ndarray: Termes (nb_annonces × nb_termes)
+        """
+        p = self.params
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_surface = np.log(np.where(surface > 0, surface, np.nan))
+        criteres = [
+            log_surface / p['surface_scale'],
+            pieces / p['pieces_scale'],
+            meuble * p['furnished_penalty']
+        ]
+        colonnes = []
+        for v in criteres:
+            m = np.isfinite(v).astype(float)
+            v = np.nan_to_num(v)
+            if cote == 'vente':
+                colonnes += [m * v ** 2, -2 * m * v, m]
+            else:
+                colonnes += [m, m * v, m * v ** 2]
+
+        # Distance géographique : g_a g_b [(x_a - x_b)² + (y_a - y_b)² - u²] + u²
+        u2 = (p['unknown_distance_km'] / p['distance_scale_km']) ** 2
+        g = (np.isfinite(x) & np.isfinite(y)).astype(float)
+        x = np.nan_to_num(x) / p['distance_scale_km']
+        y = np.nan_to_num(y) / p['distance_scale_km']
+        if cote == 'vente':
+            colonnes += [g * (x ** 2 + y ** 2 - u2), -2 * g * x, -2 * g * y, g, np.ones_like(g)]
+        else:
+            colonnes += [g, g * x, g * y, g * (x ** 2 + y ** 2), np.full_like(g, u2)]
+        return np.column_stack(colonnes)
+
+    def estimate(self, sales, furnished=None):
+        """
+        Estime le loyer de chaque annonce de vente
+
+        L'estimation est la moyenne, pondérée par 1 / (1 + distance), des loyers au m²
+        des comparables multipliés par la surface de l'annonce (ou des loyers bruts
+        lorsqu'une des surfaces est inconnue).
+
+        Args:
+            sales (list): Annonces de vente
+            furnished (bool, optional): Statut meublé visé pour la mise en location
+                                        (défaut: celui de l'annonce, sinon indifférent)
+
+        Returns:
+            dict: Tableaux alignés sur les annonces :
+                  'loyer_estime', 'dispersion' (écart type pondéré des estimations individuelles),
+                  'comparables' (positions dans self.rentals, n × k, -1 si moins de k locations),
+                  'distances' (n × k)
+        """
+        n = len(sales)
+        k = min(self.k, len(self))
+        resultat = {
+            'loyer_estime': np.full(n, np.nan),
+            'dispersion': np.full(n, np.nan),
+            'comparables': np.full((n, self.k), -1, dtype=np.int64),
+            'distances': np.full((n, self.k), np.nan)
+        }
+        if not n or not k:
+            return resultat
+
+        surface = colonne_numerique(sales, 'surface_m2')
+        meuble = _meuble(sales) if furnished is None else np.full(n, float(furnished))
+        termes = self._termes(surface, colonne_numerique(sales, 'pieces'), meuble,
+                              *self._projeter(*resoudre_coordonnees(sales, remote=self.remote)), cote='vente')
+
+        taille = self.params['chunk_size']
+        for debut in range(0, n, taille):
+            bloc = slice(debut, min(debut + taille, n))
+            distances = np.sqrt(np.maximum(termes[bloc] @ self.termes, 0))
+
+            # k plus proches sans trier toute la ligne, puis tri des k retenus
+            proches = np.argpartition(distances, k - 1, axis=1)[:, :k] if k < len(self) \
+                else np.tile(np.arange(k), (distances.shape[0], 1))
+            d = np.take_along_axis(distances, proches, axis=1)
+            ordre = np.argsort(d, axis=1, kind='stable')
+            proches = np.take_along_axis(proches, ordre, axis=1)
+            d = np.take_along_axis(d, ordre, axis=1)
+
+            # Estimation individuelle de chaque comparable
+            par_m2 = self.loyer_m2[proches] * surface[bloc, None]
+            estimations = np.where(np.isfinite(par_m2), par_m2, self.loyer[proches])
+            poids = 1 / (1 + d)
+            moyenne = np.sum(poids * estimations, axis=1) / np.sum(poids, axis=1)
+            variance = np.sum(poids * (estimations - moyenne[:, None]) ** 2, axis=1) / np.sum(poids, axis=1)
+
+            resultat['loyer_estime'][bloc] = np.round(moyenne, 2)
+            resultat['dispersion'][bloc] = np.round(np.sqrt(variance), 2)
+            resultat['comparables'][bloc, :k] = proches
+            resultat['distances'][bloc, :k] = d
+        return resultat
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python comparables.py <ventes.json> <locations.json> [k]")
+        sys.exit(1)
+
+    import time
+    from display_ads import format_price, load_announcements
+
+    ventes = load_announcements(sys.argv[1]) or []
+    locations = load_announcements(sys.argv[2]) or []
+
+    debut = time.perf_counter()
+    moteur = ComparablesEngine(locations, k=int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    estimation = moteur.estimate(ventes)
+    duree = time.perf_counter() - debut
+
+    print(f"\n{'ID':<6} | {'Localisation':<25} | {'Surface':<8} | {'Pièces':<6} | {'Loyer estimé':<13} | {'Dispersion':<10} | Comparables")
+    print("-" * 110)
+    for i, annonce in enumerate(ventes):
+        if not np.isfinite(estimation['loyer_estime'][i]):
+            continue
+        ids = [str(moteur.rentals[j].get('id', j)) for j in estimation['comparables'][i] if j >= 0]
+        print(f"{annonce.get('id', 'N/A'):<6} | {str(annonce.get('localisation', 'N/A'))[:25]:<25} | "
+              f"{annonce.get('surface_m2', 'N/A'):<8} | {annonce.get('pieces', 'N/A'):<6} | "
+              f"{format_price(estimation['loyer_estime'][i]):<13} | {format_price(estimation['dispersion'][i]):<10} | "
+              f"{', '.join(ids)}")
+    print(f"\n{len(ventes)} annonces de vente évaluées sur {len(moteur)} locations en {duree:.2f}s")
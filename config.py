@@ -29,13 +29,154 @@ LOAN_PARAMS = {
     'default_rent_per_sqm': 15  # Loyer moyen par m² par défaut
 }
 
+# Grille de scénarios de financement (voir scenarios.py)
+FINANCING_SCENARIOS = {
+    'interest_rates': [3.0, 3.5, 4.0, 4.5],  # Taux d'intérêt annuels en pourcentage
+    'loan_durations_years': [15, 20, 25],  # Durées de prêt en années
+    'down_payments': [0.0, 0.1, 0.2]  # Apport en fraction du prix (0.1 = 10 %)
+}
+
+# Hypothèses d'investissement locatif (voir investment.py)
+INVESTMENT_PARAMS = {
+    'acquisition_costs': 0.08,  # Frais d'acquisition (notaire...) en fraction du prix
+    'operating_costs': 0.25,  # Charges, taxe foncière et vacance en fraction du loyer
+    'down_payment': 0.1,  # Apport en fraction du coût total (rendement sur fonds propres)
+    'discount_rate': 5.0,  # Taux d'actualisation annuel en pourcentage (VAN)
+    'holding_period_years': 10,  # Durée de détention avant revente
+    'annual_appreciation': 1.0,  # Revalorisation annuelle du bien en pourcentage
+    'rent_growth': 1.0,  # Hausse annuelle des loyers en pourcentage
+    'resale_costs': 0.05  # Frais de revente en fraction du prix de revente
+}
+
 # Paramètres de scraping
 SCRAPER_CONFIG = {
     'base_url': 'https://www.leboncoin.fr',
     'search_url': 'https://www.leboncoin.fr/recherche',
     'timeout': 30,  # Timeout en secondes pour les requêtes
     'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'max_retries': 3  # Nombre de tentatives en cas d'échec
+    'max_retries': 3,  # Nombre de tentatives en cas d'échec
+    'network_capture': False,  # Lire les annonces dans les réponses de l'API (voir network_capture.py)
+    'api_url_pattern': r'/finder/search'  # URL des réponses capturées
+}
+
+# Nouvelles tentatives et disjoncteurs des téléchargements (voir resilience.py)
+RESILIENCE_CONFIG = {
+    'base_delay': 2.0,  # Délai de base avant une nouvelle tentative (secondes, doublé à chaque fois)
+    'max_delay': 60.0,  # Délai maximal entre deux tentatives
+    'breaker_window': 20,  # Derniers résultats pris en compte par hôte
+    'breaker_min_calls': 10,  # Résultats minimum avant de pouvoir couper un hôte
+    'breaker_error_rate': 0.5,  # Taux d'erreur qui coupe l'hôte
+    'breaker_cooldown': 120  # Durée de coupure avant une requête d'essai (secondes)
+}
+
+# Pages bloquées par une protection anti-bot (voir challenges.py)
+CHALLENGE_CONFIG = {
+    'park': True,  # Mettre les sessions bloquées en attente au lieu de bloquer toute la collecte
+    'host': '127.0.0.1',  # Adresse de la page de reprise
+    'port': 8765,  # Port de la page de reprise
+    'max_wait': 1800  # Attente maximale d'une session bloquée (secondes) avant abandon
+}
+
+# Paramètres de géolocalisation (voir geocoding.py)
+GEOCODING_CONFIG = {
+    'user_agent': 'lbc_scraper',
+    'domain': 'nominatim.openstreetmap.org',
+    'timeout': 10,  # Timeout en secondes d'une requête Nominatim
+    'min_delay_seconds': 2,  # Délai minimum entre deux requêtes (conditions d'utilisation)
+    'cache_path': 'geocode_cache.sqlite',  # Cache persistant des résultats
+    'cache_ttl_days': 90,  # Durée de validité d'un résultat en cache
+    'negative_ttl_days': 1,  # Durée de validité d'un échec (localisation introuvable)
+    'memory_cache_size': 1024,  # Nombre d'entrées gardées en mémoire (LRU)
+    'use_offline_index': True,  # Résoudre d'abord avec l'index hors ligne des communes
+    'offline_index_path': 'data/communes_fr.csv',  # Index hors ligne (voir offline_geocoder.py)
+    'batch_workers': 4  # Requêtes Nominatim simultanées en géolocalisation par lot (débit toujours limité)
+}
+
+# Index spatial des annonces (voir spatial_index.py)
+SPATIAL_CONFIG = {
+    'cell_size_km': 5,  # Côté d'une cellule de la grille
+    'remote_geocoding': False  # Géolocaliser via Nominatim les localisations absentes de l'index hors ligne
+}
+
+# Estimation du loyer par annonces comparables (voir comparables.py)
+COMPARABLES_CONFIG = {
+    'k': 8,  # Nombre de locations comparables retenues par annonce de vente
+    'surface_scale': 0.25,  # Écart relatif de surface comptant pour 1 (0.25 = 25 %)
+    'pieces_scale': 1,  # Écart de pièces comptant pour 1
+    'distance_scale_km': 5,  # Distance comptant pour 1
+    'furnished_penalty': 1,  # Pénalité d'un statut meublé différent
+    'unknown_distance_km': 20,  # Distance retenue quand une des deux annonces n'est pas localisée
+    'chunk_size': 1024  # Annonces de vente évaluées à la fois (taille des matrices de distances)
+}
+
+# Modèle hédonique des loyers (voir rent_model.py)
+RENT_MODEL_CONFIG = {
+    'features': ('surface', 'pieces', 'furnished', 'ville'),  # Ajouter 'distance_centre' si besoin
+    'min_rentals': 10,  # Nombre minimal de locations pour ajuster le modèle
+    'min_city_count': 3,  # Locations nécessaires pour qu'une ville ait son propre coefficient
+    'city_ridge': 1.0,  # Pénalité ridge des coefficients de ville (villes peu représentées)
+    'cv_folds': 5,  # Nombre de blocs de la validation croisée
+    'cache_size': 8  # Modèles ajustés gardés en mémoire (les moins récemment utilisés sont oubliés)
+}
+
+# Agrégats par tuiles geohash pour les cartes de prix au m² (voir tile_rollup.py)
+TILE_CONFIG = {
+    'precisions': (4, 5, 6, 7),  # Précisions geohash agrégées (4 : ~39 km, 7 : ~150 m)
+    'sketch_accuracy': 0.02,  # Précision relative des quantiles (histogramme logarithmique)
+    'path': 'tiles_rollup.json'  # Fichier des agrégats
+}
+
+# Collecte par lots (voir crawler.py et batch_runner.py)
+CRAWL_CONFIG = {
+    'workers': 3,  # Navigateurs ouverts simultanément
+    'pages_dir': 'pages',  # Pages HTML téléchargées, une par unité de collecte
+    'output_dir': 'batch_output',  # Résultats des lots, un sous-dossier par recherche
+    'default_radius_km': 10  # Rayon de recherche autour de chaque localisation
+}
+
+# Planification des cercles de recherche (voir coverage_planner.py)
+COVERAGE_CONFIG = {
+    'max_radius_km': 30,  # Rayon maximal d'un cercle de recherche
+    'max_overhead': 0.25,  # Part de surface hors zone tolérée pour fusionner deux cercles
+    'grid_points': 100000  # Points de la grille de mesure des surfaces
+}
+
+# Découpage des recherches en tranches de prix / surface (voir sharding.py)
+SHARD_CONFIG = {
+    'max_results': 35,  # Annonces lisibles par requête : la collecte ne lit que la première page
+    'price_bounds': {'9': (0, 2000000), '10': (0, 5000)},  # Bornes pour placer les coupes si la recherche n'en a pas (non filtrées)
+    'surface_bounds': (0, 500),  # Bornes de surface pour placer les coupes si la recherche n'en a pas (non filtrées)
+    'min_price_step': {'9': 5000, '10': 50},  # Largeur minimale d'une tranche de prix
+    'min_surface_step': 5,  # Largeur minimale d'une tranche de surface (m²)
+    'max_shards': 200,  # Nombre maximal de tranches par recherche
+    'plans_path': 'shard_plans.json',  # Plans de découpage mémorisés par recherche
+    'plan_ttl_days': 7  # Durée de validité d'un plan avant un nouveau sondage
+}
+
+# Archive des pages HTML brutes (voir page_archive.py)
+ARCHIVE_CONFIG = {
+    'enabled': True,  # Archiver chaque page téléchargée par crawler.fetch_unit
+    'dir': 'archive',  # Segments mensuels compressés et leur index
+    'compression_level': 6,  # Niveau gzip (1 : rapide, 9 : compact)
+    'replay_workers': None,  # Processus de relecture (défaut: nombre de cœurs)
+    'replay_batch': 32  # Pages par lot envoyé à un processus de relecture
+}
+
+# Pages de détail des annonces (voir ad_details.py)
+DETAIL_CONFIG = {
+    'workers': 3,  # Pages de détail téléchargées simultanément, tous appels confondus
+    'requests_per_second': 0.5,  # Débit maximal vers le site
+    'cache_path': 'ad_details.sqlite'  # Détails déjà extraits, par identifiant d'annonce
+}
+
+# Collecte incrémentale triée par date (voir incremental.py)
+INCREMENTAL_CONFIG = {
+    'store_path': 'listings.sqlite',  # Annonces déjà vues, avec leurs recherches
+    'known_ratio': 0.8,  # Part d'annonces connues d'une page qui arrête la pagination
+    'max_pages': 10,  # Pages lues au plus par recherche (première collecte comprise)
+    'bloom_capacity': 200000,  # Annonces prévues dans le filtre de Bloom
+    'bloom_error_rate': 0.01,  # Taux de faux positifs du filtre à pleine capacité
+    'max_age_days': 30  # Annonces non revues depuis plus longtemps exclues des résultats
 }
 
 # Chemins des fichiers
@@ -49,5 +190,8 @@ FILE_PATHS = {
 # Paramètres d'affichage
 DISPLAY_CONFIG = {
     'page_width': 150,  # Largeur de la page pour l'affichage
-    'max_description_length': 30  # Longueur maximale de la description
+    'max_description_length': 30,  # Longueur maximale de la description
+    'page_size': 50,  # Nombre de lignes du tableau écrites à la fois
+    'width_sample_rows': 200,  # Lignes utilisées pour calculer la largeur des colonnes
+    'max_column_width': 60  # Largeur maximale d'une colonne du tableau
 }
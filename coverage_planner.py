@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Planification géométrique des cercles de recherche
+
+Une étude sur plusieurs communes ajoute un cercle de 10 km par commune : pour
+des communes voisines, ces cercles se recouvrent largement et des recherches
+séparées téléchargent plusieurs fois les mêmes annonces. Le planificateur
+transforme les centres et rayons demandés en un petit ensemble de cercles qui
+couvre toute la zone étudiée :
+- fusion : deux cercles sont remplacés par le cercle qui les englobe tant que la
+  surface ajoutée hors de la zone reste sous COVERAGE_CONFIG['max_overhead'] et
+  que le rayon reste sous COVERAGE_CONFIG['max_radius_km'] (fusion gloutonne,
+  paire la moins coûteuse d'abord)
+- découpage : un cercle plus grand que le rayon maximal est pavé par des cercles
+  de rayon maximal sur une grille hexagonale
+- élagage : les cercles entièrement couverts par les autres sont supprimés, et
+  chaque cercle est réduit au rayon utile pour les points qu'il est seul à couvrir
+
+Les surfaces (zone étudiée, recouvrements) sont mesurées sur une grille de points
+en projection locale (km) ; la redondance estimée suppose une densité d'annonces
+uniforme dans la zone.
+"""
+
+import sys
+
+import numpy as np
+
+from config import COVERAGE_CONFIG
+from spatial_index import KM_PAR_DEGRE
+
+
+def _projection(cercles):
+    """Origine et facteur de longitude de la projection locale en km"""
+    lat0 = float(np.mean([c['latitude'] for c in cercles]))
+    lon0 = float(np.mean([c['longitude'] for c in cercles]))
+    return lat0, lon0, KM_PAR_DEGRE * np.cos(np.radians(lat0))
+
+
+def _vers_km(cercles, projection):
+    lat0, lon0, km_lon = projection
+    x = np.array([(c['longitude'] - lon0) * km_lon for c in cercles])
+    y = np.array([(c['latitude'] - lat0) * KM_PAR_DEGRE for c in cercles])
+    r = np.array([float(c['radius_km']) for c in cercles])
+    return x, y, r
+
+
+def _vers_degres(x, y, projection):
+    lat0, lon0, km_lon = projection
+    return round(lat0 + y / KM_PAR_DEGRE, 5), round(lon0 + x / km_lon, 5)
+
+
+class _Grille:
+    """Points régulièrement espacés couvrant un ensemble de disques (en km)"""
+
+    def __init__(self, x, y, r, nb_points):
+        bas_x, haut_x = np.min(x - r), np.max(x + r)
+        bas_y, haut_y = np.min(y - r), np.max(y + r)
+        self.pas = max(np.sqrt((haut_x - bas_x) * (haut_y - bas_y) / nb_points), 1e-3)
+        gx, gy = np.meshgrid(np.arange(bas_x, haut_x + self.pas, self.pas),
+                             np.arange(bas_y, haut_y + self.pas, self.pas))
+        self.x, self.y = gx.ravel(), gy.ravel()
+        self.cellule = self.pas ** 2
+
+    def couverture(self, x, y, r):
+        """Nombre de disques contenant chaque point"""
+        compte = np.zeros(len(self.x), dtype=np.int32)
+        for cx, cy, cr in zip(x, y, r):
+            compte += ((self.x - cx) ** 2 + (self.y - cy) ** 2 <= cr ** 2)
+        return compte
+
+    def dans(self, x, y, r):
+        return self.couverture([x], [y], [r]) > 0
+
+
+def _englobant(c1, c2):
+    """Plus petit cercle (x, y, r) contenant deux cercles"""
+    (x1, y1, r1), (x2, y2, r2) = c1, c2
+    d = np.hypot(x2 - x1, y2 - y1)
+    if d + r2 <= r1:
+        return c1
+    if d + r1 <= r2:
+        return c2
+    r = (d + r1 + r2) / 2
+    t = (r - r1) / d
+    return (x1 + (x2 - x1) * t, y1 + (y2 - y1) * t, r)
+
+
+def _paver(x, y, r, rayon_max):
+    """Cercles de rayon rayon_max couvrant le disque (x, y, r) (grille hexagonale)"""
+    if r <= rayon_max:
+        return [(x, y, r)]
+    # Sur une grille hexagonale d'espacement rayon_max * sqrt(3), les disques couvrent le plan
+    dx = rayon_max * np.sqrt(3)
+    dy = rayon_max * 1.5
+    cercles = []
+    nb = int(np.ceil((r + rayon_max) / dy))
+    for j in range(-nb, nb + 1):
+        decalage = dx / 2 if j % 2 else 0.0
+        for i in range(-int(np.ceil((r + rayon_max) / dx)) - 1, int(np.ceil((r + rayon_max) / dx)) + 2):
+            cx, cy = x + i * dx + decalage, y + j * dy
+            d = np.hypot(cx - x, cy - y)
+            if d < r + rayon_max:
+                # Un centre hors du disque est ramené sur son bord : la projection sur
+                # un convexe rapproche le centre de tout point du disque
+                if d > r:
+                    cx, cy = x + (cx - x) * r / d, y + (cy - y) * r / d
+                cercles.append((cx, cy, rayon_max))
+    return cercles
+
+
+def _elaguer(plan, grille, zone):
+    """
+    Réduit les recouvrements d'un plan sans perdre de couverture
+
+    Un cercle dont toute la zone est déjà couverte par les autres est supprimé ;
+    les autres sont réduits au rayon nécessaire pour les points de la zone qu'ils
+    sont seuls à couvrir.
+    """
+    plan = list(plan)
+    masques = [grille.dans(cx, cy, cr) & zone for cx, cy, cr, _ in plan]
+    compte = np.sum(masques, axis=0) if masques else np.zeros(len(zone), dtype=int)
+
+    # Suppression, en commençant par les cercles qui apportent le moins de points propres
+    for i in sorted(range(len(plan)), key=lambda i: np.count_nonzero(masques[i] & (compte == 1))):
+        if masques[i].any() and not np.any(masques[i] & (compte == 1)):
+            compte -= masques[i]
+            masques[i] = np.zeros_like(zone)
+            plan[i] = None
+
+    # Réduction du rayon aux points dont le cercle est seul responsable
+    for i, cercle in enumerate(plan):
+        if cercle is None:
+            continue
+        cx, cy, cr, membres = cercle
+        propres = masques[i] & (compte == 1)
+        if not propres.any():
+            # Cercle plus petit que le pas de la grille : aucun point pour le mesurer, il est gardé tel quel
+            continue
+        rayon = min(cr, float(np.max(np.hypot(grille.x[propres] - cx, grille.y[propres] - cy))) + grille.pas)
+        nouveau = grille.dans(cx, cy, rayon) & zone
+        compte += nouveau.astype(compte.dtype) - masques[i]
+        masques[i] = nouveau
+        plan[i] = (cx, cy, rayon, membres)
+    return [c for c in plan if c is not None]
+
+
+def plan_coverage(locations, radius_km=None, max_radius_km=None, max_overhead=None):
+    """
+    Calcule un ensemble réduit de cercles de recherche couvrant les localisations
+
+    Args:
+        locations (list): Dictionnaires 'name', 'postcode', 'latitude', 'longitude'
+                          et, en option, 'radius_km' (défaut: radius_km)
+        radius_km (float, optional): Rayon par défaut (défaut: CRAWL_CONFIG['default_radius_km'])
+        max_radius_km (float, optional): Rayon maximal d'un cercle de recherche
+        max_overhead (float, optional): Part de surface hors zone tolérée par fusion
+
+    Returns:
+        dict: 'cercles' (dictionnaires 'name', 'postcode', 'latitude', 'longitude',
+              'radius_km', 'membres') et 'rapport' (voir coverage_report)
+    """
+    from config import CRAWL_CONFIG
+
+    radius_km = radius_km or CRAWL_CONFIG['default_radius_km']
+    max_radius_km = max_radius_km or COVERAGE_CONFIG['max_radius_km']
+    max_overhead = COVERAGE_CONFIG['max_overhead'] if max_overhead is None else max_overhead
+
+    entrees = [dict(loc, radius_km=float(loc.get('radius_km') or radius_km)) for loc in locations
+               if loc.get('latitude') is not None and loc.get('longitude') is not None]
+    if not entrees:
+        return {'cercles': [], 'rapport': None}
+
+    projection = _projection(entrees)
+    x, y, r = _vers_km(entrees, projection)
+    grille = _Grille(x, y, r, COVERAGE_CONFIG['grid_points'])
+    zone = grille.couverture(x, y, r) > 0
+
+    # Groupes : cercle englobant, membres, points de la zone couverts par les membres
+    groupes = [{'cercle': (x[i], y[i], r[i]), 'membres': [i], 'zone': grille.dans(x[i], y[i], r[i]) & zone}
+               for i in range(len(entrees))]
+
+    def cout(g1, g2):
+        """Part de surface hors zone du cercle fusionné, None si la fusion est refusée"""
+        cercle = _englobant(g1['cercle'], g2['cercle'])
+        if cercle[2] > max_radius_km:
+            return None, cercle
+        couverts = np.count_nonzero(grille.dans(*cercle))
+        utiles = np.count_nonzero(g1['zone'] | g2['zone'])
+        surplus = 1 - utiles / max(couverts, 1)
+        return (surplus if surplus <= max_overhead else None), cercle
+
+    # Fusion gloutonne : la paire dont le cercle englobant ajoute le moins de surface hors zone
+    couts = {}
+    for i in range(len(groupes)):
+        for j in range(i + 1, len(groupes)):
+            couts[(i, j)] = cout(groupes[i], groupes[j])
+    actifs = set(range(len(groupes)))
+    while True:
+        candidats = [(c[0], paire) for paire, c in couts.items() if c[0] is not None
+                     and paire[0] in actifs and paire[1] in actifs]
+        if not candidats:
+            break
+        _, (i, j) = min(candidats)
+        cercle = couts[(i, j)][1]
+        groupes.append({'cercle': cercle, 'membres': groupes[i]['membres'] + groupes[j]['membres'],
+                        'zone': groupes[i]['zone'] | groupes[j]['zone']})
+        actifs -= {i, j}
+        nouveau = len(groupes) - 1
+        for k in actifs:
+            couts[(k, nouveau)] = cout(groupes[k], groupes[nouveau])
+        actifs.add(nouveau)
+
+    # Découpage des cercles trop grands (rayon demandé au-delà du maximum)
+    plan = [(cx, cy, cr, groupes[k]['membres'])
+            for k in sorted(actifs, key=lambda k: min(groupes[k]['membres']))
+            for cx, cy, cr in _paver(*groupes[k]['cercle'], max_radius_km)]
+    plan = _elaguer(plan, grille, zone)
+
+    cercles = []
+    for cx, cy, cr, membres in plan:
+        # Nom et code postal de la localisation la plus proche du centre
+        proche = min(membres, key=lambda m: np.hypot(x[m] - cx, y[m] - cy))
+        lat, lon = _vers_degres(cx, cy, projection)
+        cercles.append({
+            'name': entrees[proche]['name'],
+            'postcode': entrees[proche].get('postcode'),
+            'latitude': lat,
+            'longitude': lon,
+            'radius_km': float(np.ceil(cr * 10) / 10),
+            'membres': [entrees[m]['name'] for m in membres]
+        })
+
+    return {'cercles': cercles, 'rapport': coverage_report(entrees, cercles)}
+
+
+def coverage_report(locations, cercles):
+    """
+    Estime la redondance évitée par un plan de couverture
+
+    Args:
+        locations (list): Localisations demandées (avec 'radius_km')
+        cercles (list): Cercles du plan
+
+    Returns:
+        dict: 'requetes_avant' / 'requetes_apres' (une recherche par cercle),
+              'surface_zone_km2', 'surface_avant_km2' / 'surface_apres_km2' (surface
+              téléchargée, recouvrements compris), 'doublons_avant' / 'doublons_apres'
+              (part de la surface téléchargée plusieurs fois), 'hors_zone' (part de la
+              surface du plan hors de la zone) et 'couverture' (part de la zone couverte)
+    """
+    projection = _projection(locations)
+    x, y, r = _vers_km(locations, projection)
+    cx, cy, cr = _vers_km(cercles, projection)
+    grille = _Grille(np.concatenate([x, cx]), np.concatenate([y, cy]), np.concatenate([r, cr]),
+                     COVERAGE_CONFIG['grid_points'])
+    avant = grille.couverture(x, y, r)
+    apres = grille.couverture(cx, cy, cr)
+    zone = avant > 0
+
+    def km2(nombre):
+        return round(float(nombre * grille.cellule), 1)
+
+    return {
+        'requetes_avant': len(locations),
+        'requetes_apres': len(cercles),
+        'surface_zone_km2': km2(np.count_nonzero(zone)),
+        'surface_avant_km2': km2(avant.sum()),
+        'surface_apres_km2': km2(apres.sum()),
+        'doublons_avant': round(float(1 - np.count_nonzero(avant) / max(avant.sum(), 1)), 3),
+        'doublons_apres': round(float(1 - np.count_nonzero(apres) / max(apres.sum(), 1)), 3),
+        'hors_zone': round(float(np.count_nonzero((apres > 0) & ~zone) / max(np.count_nonzero(apres), 1)), 3),
+        'couverture': round(float(np.count_nonzero((apres > 0) & zone) / max(np.count_nonzero(zone), 1)), 3)
+    }
+
+
+def display_report(plan):
+    """Affiche les cercles d'un plan et la redondance évitée"""
+    rapport = plan['rapport']
+    if not rapport:
+        print("Aucune localisation géolocalisée")
+        return
+    print(f"\n{'Cercle':<25} | {'Latitude':>9} | {'Longitude':>9} | {'Rayon':>7} | Localisations couvertes")
+    print("-" * 100)
+    for c in plan['cercles']:
+        print(f"{c['name'][:25]:<25} | {c['latitude']:>9.5f} | {c['longitude']:>9.5f} | "
+              f"{c['radius_km']:>4.1f} km | {', '.join(c['membres'])}")
+    print(f"\nRecherches : {rapport['requetes_avant']} -> {rapport['requetes_apres']}")
+    print(f"Surface téléchargée : {rapport['surface_avant_km2']:.0f} km² -> {rapport['surface_apres_km2']:.0f} km² "
+          f"(zone étudiée : {rapport['surface_zone_km2']:.0f} km²)")
+    print(f"Annonces en double (densité uniforme) : {rapport['doublons_avant']:.1%} -> {rapport['doublons_apres']:.1%}")
+    print(f"Surface hors zone : {rapport['hors_zone']:.1%}, zone couverte : {rapport['couverture']:.1%}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print('Usage: python coverage_planner.py "Albi, Castres, 81160, ..." [rayon_km]')
+        sys.exit(1)
+
+    from geocoding import geocode_batch, split_locations
+
+    rayon = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    resultats = geocode_batch(split_locations(sys.argv[1]))
+    for r in resultats:
+        if r['status'] != 'found':
+            print(f"Impossible de trouver les coordonnées pour : {r['input']}")
+    locations = {}
+    for r in resultats:
+        if r['status'] == 'found':
+            locations.setdefault((r['result']['latitude'], r['result']['longitude']), r['result'])
+    locations = list(locations.values())
+    display_report(plan_coverage(locations, radius_km=rayon))
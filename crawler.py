@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Exécution des unités de collecte
+
+Une unité de collecte est une URL de recherche à télécharger puis à extraire,
+avec la catégorie (vente / location) et le statut meublé à reporter sur les
+annonces. Les unités sont identifiées par leur URL canonique : deux recherches
+qui produisent la même URL partagent une seule unité. Les unités s'exécutent
+dans un pool de threads commun, chaque thread pilotant son propre navigateur.
+"""
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+from challenges import ChallengeParked, get_challenge_queue
+from config import ARCHIVE_CONFIG, CHALLENGE_CONFIG, CRAWL_CONFIG
+from url_builder import canonical_url
+
+
+def make_unit(url, category, furnished=None, search=None):
+    """
+    Crée une unité de collecte
+
+    Args:
+        url (str): URL de recherche
+        category (str): 'vente' ou 'location', reporté sur chaque annonce
+        furnished (bool, optional): Statut meublé reporté sur chaque annonce
+        search (str, optional): Identifiant de la recherche d'origine, repris dans
+                                l'archive des pages (défaut: dérivé de l'URL canonique)
+
+    Returns:
+        dict: Unité ('key', 'url', 'category', 'furnished', 'search')
+    """
+    key = canonical_url(url)
+    return {'key': key, 'url': str(url), 'category': category, 'furnished': furnished,
+            'search': search or hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}
+
+
+def unit_page_path(unit, pages_dir=None):
+    """Fichier HTML d'une unité (nom dérivé de son URL canonique)"""
+    pages_dir = pages_dir or CRAWL_CONFIG['pages_dir']
+    return os.path.join(pages_dir, hashlib.sha1(unit['key'].encode('utf-8')).hexdigest()[:16] + '.html')
+
+
+def _archiver(unit, content):
+    """Ajoute une page téléchargée à l'archive (voir page_archive.py), sans bloquer la collecte"""
+    if not ARCHIVE_CONFIG['enabled']:
+        return
+    from page_archive import get_page_archive
+    try:
+        get_page_archive().add(unit['url'], content, search=unit.get('search'),
+                               category=unit['category'], furnished=unit.get('furnished'))
+    except Exception as e:
+        print(f"Archivage impossible pour {unit['url']} : {e}")
+
+
+def _extraire(unit, content, result):
+    """
+    Extrait les annonces d'une page (réponses de l'API capturées, sinon DOM) et les
+    marque avec la catégorie de l'unité
+    """
+    from extract_ads import parse_result_count
+    from network_capture import extract_listings
+
+    annonces, cartes, _ = extract_listings(content)
+    for annonce in annonces:
+        annonce['category'] = unit['category']
+        if unit.get('furnished') is not None:
+            annonce['furnished'] = unit['furnished']
+    result.update(status='ok', annonces=annonces, cartes=cartes, total=parse_result_count(content))
+
+
+def fetch_unit(unit, pages_dir=None, fetch=None, challenges=None):
+    """
+    Télécharge et extrait une unité de collecte
+
+    Args:
+        unit (dict): Unité créée par make_unit
+        pages_dir (str, optional): Dossier des pages HTML (défaut: CRAWL_CONFIG['pages_dir'])
+        fetch (callable, optional): Fonction (url, chemin) -> contenu HTML ou None
+                                    (défaut: scraper.download_page, avec nouvelles
+                                    tentatives et disjoncteurs, voir resilience.py)
+        challenges (ChallengeQueue, optional): File des sessions bloquées utilisée par
+            scraper.download_page (défaut: file partagée si CHALLENGE_CONFIG['park'])
+
+    Returns:
+        dict: 'key', 'url', 'status' ('ok', 'error' ou 'parked'), 'annonces', 'cartes'
+              (annonces trouvées dans la page), 'total' (résultats annoncés pour la
+              recherche, None si inconnu), 'elapsed' (secondes), 'bloque' (secondes
+              d'attente d'une session bloquée), 'error' et, pour une unité en attente,
+              'session' (voir resume_parked)
+    """
+    if fetch is None:
+        from resilience import get_resilient_fetcher
+        if challenges is None and CHALLENGE_CONFIG['park']:
+            challenges = get_challenge_queue()
+        fetch = partial(get_resilient_fetcher(), challenges=challenges)
+
+    start = time.perf_counter()
+    result = {'key': unit['key'], 'url': unit['url'], 'status': 'error', 'annonces': [],
+              'cartes': 0, 'total': None, 'elapsed': 0.0, 'bloque': 0.0, 'error': None}
+    path = unit_page_path(unit, pages_dir)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    try:
+        content = fetch(unit['url'], path)
+        if content is None:
+            result['error'] = "Téléchargement impossible"
+        else:
+            _archiver(unit, content)
+            _extraire(unit, content, result)
+    except ChallengeParked as e:
+        result.update(status='parked', session=e.entry, error=str(e))
+    except Exception as e:
+        result['error'] = str(e)
+
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def resume_parked(unit, result, timeout=None):
+    """
+    Attend la reprise de la session bloquée d'une unité, puis l'extrait
+
+    Args:
+        unit (dict): Unité créée par make_unit
+        result (dict): Résultat 'parked' de fetch_unit
+        timeout (float, optional): Attente maximale (défaut: CHALLENGE_CONFIG['max_wait'])
+
+    Returns:
+        dict: Résultat complété comme celui de fetch_unit
+    """
+    if result['status'] != 'parked':
+        return result
+    entry = result.pop('session')
+    start = time.perf_counter()
+    content = entry.queue.wait(entry, timeout)
+    result.update(status='error', bloque=entry.blocked_seconds,
+                  error=None if content is not None else "Session bloquée abandonnée")
+    if content is not None:
+        _archiver(unit, content)
+        try:
+            _extraire(unit, content, result)
+        except Exception as e:
+            result.update(status='error', error=str(e))
+    result['elapsed'] += time.perf_counter() - start
+    return result
+
+
+def run_units(units, max_workers=None, pages_dir=None, fetch=None, verbose=True):
+    """
+    Exécute des unités de collecte dans un pool de threads partagé
+
+    Les unités de même clé ne sont exécutées qu'une fois.
+
+    Args:
+        units (iterable): Unités créées par make_unit
+        max_workers (int, optional): Unités simultanées (défaut: CRAWL_CONFIG['workers'])
+        pages_dir (str, optional): Dossier des pages HTML
+        fetch (callable, optional): Fonction de téléchargement (voir fetch_unit)
+        verbose (bool): Afficher l'avancement
+
+    Returns:
+        dict: Résultat de fetch_unit par clé d'unité
+    """
+    uniques = {}
+    for unit in units:
+        uniques.setdefault(unit['key'], unit)
+    if not uniques:
+        return {}
+
+    results = {}
+    parked = []
+    max_workers = min(max_workers or CRAWL_CONFIG['workers'], len(uniques))
+
+    def afficher(result, rang):
+        if verbose:
+            detail = f"{len(result['annonces'])} annonces" if result['status'] == 'ok' else result['error']
+            print(f"[{rang}/{len(uniques)}] {result['status']} ({detail}, {result['elapsed']:.1f}s) : {result['url']}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fetch_unit, unit, pages_dir, fetch) for unit in uniques.values()]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[result['key']] = result
+            if result['status'] == 'parked':
+                parked.append(result)
+            afficher(result, done)
+
+    # Les unités bloquées sont terminées une fois toutes les autres téléchargées
+    if parked:
+        print(f"{len(parked)} unités en attente de résolution d'une protection anti-bot")
+        for result in parked:
+            afficher(resume_parked(uniques[result['key']], result), len(uniques))
+        bloque = sum(r['bloque'] for r in results.values())
+        print(f"Temps bloqué : {bloque:.0f}s sur {len(parked)} sessions")
+    return results
@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 import json
 import sys
-import math
 import io
+import contextlib
 from datetime import datetime, timedelta
-from tabulate import tabulate
+import numpy as np
 
 # Configuration de l'encodage pour la console
 if sys.platform.startswith('win'):
@@ -12,38 +12,19 @@ if sys.platform.startswith('win'):
     os.system('chcp 65001 > nul')  # Passe en UTF-8 sous Windows
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
-from config import LOAN_PARAMS, DISPLAY_CONFIG
-
-# Dictionnaire global pour stocker les loyers moyens par nombre de pièces
-loyers_par_pieces = {}
-prix_moyen_par_pieces = {}
+from config import DISPLAY_CONFIG
+from ad_index import AnnouncementIndex, parse_localisation
+from enrichment import enrichir_annonces
+from table_renderer import iter_grid_pages, write_delimited
+from analysis_context import AnalysisContext
+from calcul_mensualite import calculer_mensualite as _calculer_mensualite
 
 def calculer_mensualite(montant, taux_annuel, duree_annees):
     """
-    Calcule la mensualitÃ© d'un prÃªt immobilier
-    
-    Args:
-        montant (float): Montant du prÃªt en euros
-        taux_annuel (float): Taux d'intÃ©rÃªt annuel (en pourcentage, ex: 3.5 pour 3.5%)
-        duree_annees (int): DurÃ©e du prÃªt en annÃ©es
-        
-    Returns:
-        float: Montant de la mensualitÃ©
+    Calcule la mensualité d'un prêt immobilier, arrondie au centime
+    (voir calcul_mensualite.calculer_mensualite)
     """
-    if montant <= 0 or taux_annuel <= 0 or duree_annees <= 0:
-        return 0.0
-        
-    taux_mensuel = (taux_annuel / 100) / 12
-    nb_mensualites = duree_annees * 12
-    
-    # ÃEviter la division par zÃ©ro
-    if taux_mensuel == 0:
-        return montant / nb_mensualites
-        
-    # Formule de calcul de la mensualitÃ©
-    mensualite = (montant * taux_mensuel) / (1 - (1 + taux_mensuel) ** -nb_mensualites)
-    
-    return round(mensualite, 2)
+    return round(_calculer_mensualite(montant, taux_annuel, duree_annees), 2)
 
 def load_announcements(json_file):
     """Charge les annonces depuis un fichier JSON"""
@@ -71,7 +52,9 @@ def calculate_statistics(announcements):
     villes = {}
     for annonce in announcements:
         if 'localisation' in annonce and 'prix_m2' in annonce and annonce['prix_m2'] is not None:
-            ville = annonce['localisation'].split()[0]  # Prendre le premier mot comme nom de ville
+            ville = parse_localisation(annonce['localisation'])[0]  # Nom complet de la ville, sans le code postal
+            if not ville:
+                continue
             if ville not in villes:
                 villes[ville] = []
             villes[ville].append(annonce['prix_m2'])
@@ -188,7 +171,142 @@ def calculate_average_rent(announcements):
     # Retourner la moyenne des loyers au m², ou une valeur par dÃ©faut si pas assez de donnÃ©es
     return round(sum(rents) / len(rents), 2) if rents else 15
 
-def display_announcements_table(announcements, rental_stats=None):
+def format_temps_ecoule(jours):
+    """Formate une ancienneté en jours (ex: 'il y a 2 mois et 3 jours')"""
+    if jours is None or jours != jours or jours < 0:  # NaN ou date future
+        return 'N/A'
+    jours = int(jours)
+    
+    ans = jours // 365
+    mois = (jours % 365) // 30
+    reste = jours % 30
+    
+    if ans > 0:
+        temps_ecoule = f"il y a {ans} an{'s' if ans > 1 else ''}"
+        if mois > 0:
+            temps_ecoule += f" et {mois} mois"
+    elif mois > 0:
+        temps_ecoule = f"il y a {mois} mois"
+        if reste > 0:
+            temps_ecoule += f" et {reste} jour{'s' if reste > 1 else ''}"
+    elif jours == 0:
+        temps_ecoule = "aujourd'hui"
+    elif jours == 1:
+        temps_ecoule = "hier"
+    else:
+        temps_ecoule = f"il y a {jours} jours"
+    return temps_ecoule
+
+def format_table_row(annonce, enrichi, i):
+    """
+    Formate une ligne du tableau des annonces
+    
+    Args:
+        annonce (dict): Annonce à afficher
+        enrichi (dict): Colonnes calculées par enrichir_annonces
+        i (int): Position de l'annonce dans les tableaux enrichis
+    """
+    mensualite = enrichi['mensualite'][i]
+    difference = enrichi['difference'][i]
+    prix_m2 = enrichi['prix_m2'][i]
+    
+    return [
+        annonce.get('id', 'N/A'),
+        annonce.get('localisation', 'N/A'),
+        format_price(annonce.get('prix', 0)),
+        format_surface(annonce.get('surface_m2', 0)),
+        annonce.get('pieces', 'N/A'),
+        format_price(int(prix_m2) if prix_m2 == prix_m2 else 0) + '/m²',
+        format_price(int(mensualite)) if mensualite > 0 else 'N/A',
+        format_price(int(difference)) if difference == difference else 'N/A',
+        format_temps_ecoule(enrichi['age_jours'][i]),
+        annonce.get('description', 'N/A')
+    ]
+
+# Colonnes de tri disponibles -> tableau de enrichir_annonces
+SORT_KEYS = {
+    'prix': 'prix',
+    'surface': 'surface',
+    'pieces': 'pieces',
+    'prix_m2': 'prix_m2',
+    'mensualite': 'mensualite',
+    'difference': 'difference',
+    'date': 'age_jours'
+}
+
+# En-têtes de la sortie CSV/TSV
+RAW_HEADERS = ["id", "localisation", "prix", "surface_m2", "pieces", "prix_m2",
+               "mensualite", "loyer", "difference", "age_jours", "description", "url"]
+
+def select_rows(enrichi, sort_by=None, offset=0, limit=None):
+    """
+    Retourne les positions des annonces à afficher
+    
+    Args:
+        enrichi (dict): Colonnes calculées par enrichir_annonces
+        sort_by (str, optional): Clé de SORT_KEYS, préfixée par '-' pour un tri décroissant.
+                                 Pour 'date', le tri croissant affiche les plus récentes d'abord.
+        offset (int): Nombre de lignes à sauter
+        limit (int, optional): Nombre maximum de lignes
+    
+    Returns:
+        list: Positions des annonces, dans l'ordre d'affichage
+    """
+    n = len(enrichi['prix'])
+    offset = max(offset or 0, 0)
+    end = n if limit is None else min(n, offset + max(limit, 0))
+    if offset >= end:
+        return []
+    
+    if not sort_by:
+        return list(range(offset, end))
+    
+    descending = sort_by.startswith('-')
+    key = sort_by.lstrip('-')
+    if key not in SORT_KEYS:
+        raise ValueError(f"Colonne de tri inconnue : {key} (valeurs possibles : {', '.join(SORT_KEYS)})")
+    
+    # Les valeurs manquantes sont toujours placées en fin de tableau
+    values = enrichi[SORT_KEYS[key]]
+    values = np.where(np.isnan(values), np.inf, -values if descending else values)
+    
+    # Tri partiel : seules les `end` premières positions ont besoin d'être ordonnées
+    if end < n:
+        candidates = np.argpartition(values, end - 1)[:end]
+        order = candidates[np.argsort(values[candidates], kind='stable')]
+    else:
+        order = np.argsort(values, kind='stable')
+    return order[offset:end].tolist()
+
+def raw_table_row(annonce, enrichi, i):
+    """Ligne brute (valeurs non formatées) pour la sortie CSV/TSV"""
+    def value(name):
+        v = enrichi[name][i]
+        return '' if v != v else round(float(v), 2)
+    
+    return [
+        annonce.get('id', ''),
+        annonce.get('localisation', ''),
+        annonce.get('prix', ''),
+        annonce.get('surface_m2', ''),
+        annonce.get('pieces', ''),
+        value('prix_m2'),
+        value('mensualite'),
+        value('loyer'),
+        value('difference'),
+        value('age_jours'),
+        annonce.get('description', ''),
+        annonce.get('url', '')
+    ]
+
+def default_output_format(stream=None):
+    """Format du tableau selon la sortie : 'grid' sur un terminal, 'tsv' sinon (fichier, tube)"""
+    stream = stream or sys.stdout
+    isatty = getattr(stream, 'isatty', None)
+    return 'grid' if isatty and isatty() else 'tsv'
+
+def display_announcements_table(announcements, rental_stats=None, limit=None, offset=0,
+                                sort_by=None, output_format='grid', stream=None, context=None):
     """
     Affiche les annonces sous forme de tableau
     
@@ -196,25 +314,29 @@ def display_announcements_table(announcements, rental_stats=None):
         announcements: Liste des annonces à afficher
         rental_stats: Dictionnaire des statistiques de location par nombre de pièces
                      (optionnel, utilisé pour calculer les différences de loyer)
+        limit (int, optional): Nombre maximum de lignes à afficher
+        offset (int): Nombre de lignes à sauter (après tri)
+        sort_by (str, optional): Colonne de tri (voir SORT_KEYS), préfixée par '-' pour un tri décroissant
+        output_format (str): 'grid' (tableau), 'csv' ou 'tsv' (voir default_output_format
+                             pour choisir selon la sortie)
+        stream: Flux de sortie du tableau (défaut: sys.stdout)
+        context (AnalysisContext, optional): Loyers de référence et paramètres du prêt
     """
     if not announcements:
         print("Aucune annonce à afficher.")
         return
+    if context is None:
+        context = AnalysisContext()
     
     # Calculer le loyer moyen global
     loyer_moyen_global = calculate_average_rent(announcements)
     
-    # Mettre à jour le dictionnaire global des loyers moyens par nombre de pièces uniquement pour les locations
-    global loyers_par_pieces
+    # Loyers de référence : ceux du contexte, ou ceux des statistiques fournies pour des locations
+    loyers_par_pieces = context.loyers_par_pieces
     is_rental = any(a.get('category') == 'location' for a in announcements) if announcements else False
     
     if is_rental and rental_stats:
-        loyers_par_pieces.clear()  # Vider le dictionnaire avant de le remplir
-        for pieces, data in rental_stats.items():
-            if 'prix_moyen' in data:  # Utiliser directement le prix moyen
-                loyers_par_pieces[pieces] = data['prix_moyen']
-            elif 'prix_m2_moyen' in data and 'surface_moyenne' in data and data['surface_moyenne'] > 0:
-                loyers_par_pieces[pieces] = data['prix_m2_moyen'] * data['surface_moyenne']
+        loyers_par_pieces = AnalysisContext.moyennes_depuis_stats(rental_stats)
         
         # Afficher les statistiques avant le tableau
         if loyers_par_pieces:
@@ -225,82 +347,35 @@ def display_announcements_table(announcements, rental_stats=None):
     if stats:
         display_statistics(stats)
     
-    # Préparer les données pour le tableau
-    table_data = []
-    for annonce in announcements:
-        # Calculer la mensualité avec les paramètres du prêt
-        prix_annonce = annonce.get('prix', 0)
-        mensualite = calculer_mensualite(
-            prix_annonce, 
-            LOAN_PARAMS['interest_rate'], 
-            LOAN_PARAMS['loan_duration_years']
-        ) if prix_annonce else 0
-        
-        surface = annonce.get('surface_m2', 0)
-        
-        # Si c'est une annonce de location, utiliser son propre loyer
-        if annonce.get('category') == 'location':
-            loyer_mensuel = annonce.get('prix', 0)
-        else:
-            # Pour les annonces de vente, utiliser le loyer moyen pour ce nombre de pièces
-            pieces = annonce.get('pieces')
-            loyer_mensuel = loyers_par_pieces.get(pieces)
-        
-        # Calculer la différence entre le loyer mensuel et la mensualité
-        difference = (loyer_mensuel - mensualite) if loyer_mensuel is not None and mensualite > 0 else None
-        difference_str = format_price(int(difference)) if difference is not None else 'N/A'
-        
-        # Récupérer le nombre de pièces depuis les données de l'annonce
-        pieces = annonce.get('pieces', 'N/A')
-        
-        # Calculer le temps écoulé depuis la publication
-        temps_ecoule = 'N/A'
-        date_publication = annonce.get('date_publication')
-        if date_publication and date_publication != 'N/A':
-            try:
-                date_pub = datetime.strptime(date_publication, "%Y-%m-%d").date()
-                aujourdhui = datetime.now().date()
-                delta = aujourdhui - date_pub
-                
-                ans = delta.days // 365
-                mois = (delta.days % 365) // 30
-                jours = delta.days % 30
-                
-                if ans > 0:
-                    temps_ecoule = f"il y a {ans} an{'s' if ans > 1 else ''}"
-                    if mois > 0:
-                        temps_ecoule += f" et {mois} mois"
-                elif mois > 0:
-                    temps_ecoule = f"il y a {mois} mois"
-                    if jours > 0:
-                        temps_ecoule += f" et {jours} jour{'s' if jours > 1 else ''}"
-                else:
-                    if delta.days == 0:
-                        temps_ecoule = "aujourd'hui"
-                    elif delta.days == 1:
-                        temps_ecoule = "hier"
-                    else:
-                        temps_ecoule = f"il y a {delta.days} jour{'s' if delta.days > 1 else ''}"
-                        
-            except (ValueError, TypeError) as e:
-                temps_ecoule = 'N/A'
-        
-        table_data.append([
-            annonce.get('id', 'N/A'),
-            annonce.get('localisation', 'N/A'),
-            format_price(prix_annonce),
-            format_surface(annonce.get('surface_m2', 0)),
-            pieces,
-            format_price(annonce.get('prix_m2', 0)) + '/m²',
-            format_price(int(mensualite)) if mensualite > 0 else 'N/A',
-            difference_str,
-            temps_ecoule,
-            annonce.get('description', 'N/A')
-        ])
+    # Loyer estimé annonce par annonce pour les ventes (modèle des loyers), la moyenne
+    # par nombre de pièces restant la référence des annonces non estimées
+    loyers = None if is_rental else context.loyers_estimes(announcements)
+    if loyers is not None:
+        print(f"\nLoyer de référence : modèle des loyers ({np.isfinite(loyers).sum()}/{len(announcements)} annonces estimées)")
+    
+    # Calculer en une passe les colonnes dérivées (mensualité, différence, ancienneté)
+    enrichi = enrichir_annonces(
+        announcements,
+        loyers_par_pieces=loyers_par_pieces,
+        taux_annuel=context.taux_annuel,
+        duree_annees=context.duree_annees,
+        loyers=loyers
+    )
+    
+    # Sélectionner les lignes à afficher (tri, décalage, limite)
+    positions = select_rows(enrichi, sort_by=sort_by, offset=offset, limit=limit)
+    rows = (format_table_row(announcements[i], enrichi, i) for i in positions)
+    out = stream or sys.stdout
+    
+    # Sortie non interactive : écriture directe en CSV/TSV, valeurs brutes
+    if output_format in ('csv', 'tsv'):
+        raw_rows = (raw_table_row(announcements[i], enrichi, i) for i in positions)
+        write_delimited(RAW_HEADERS, raw_rows, out, delimiter=',' if output_format == 'csv' else '\t')
+        return
     
     # En-têtes du tableau
     headers = ["ID", "Localisation", "Prix", "Surface", "Pièces", "Prix/m²", 
-               "Mensualité (3.5% - 25 ans)", "Différence (loyer - mensualité)", 
+               f"Mensualité ({context.libelle_pret})", "Différence (loyer - mensualité)", 
                "Publié il y a", "Description"]
     
     # Afficher le tableau
@@ -309,31 +384,54 @@ def display_announcements_table(announcements, rental_stats=None):
     print(f"LISTE DÉTAILLÉE DES ANNONCES ({len(announcements)} résultats)")
     print(separator)
     
-    # Utiliser tabulate pour un affichage propre
-    print(tabulate(table_data, headers=headers, tablefmt='grid', stralign='right', numalign='right'))
+    # Écrire le tableau page par page, sans attendre le formatage de toutes les lignes
+    for page in iter_grid_pages(headers, rows):
+        out.write(page + "\n")
+        out.flush()
     
     # Afficher un résumé
     separator = '-' * DISPLAY_CONFIG['page_width']
     print("\n" + separator)
-    print(f"Total : {len(announcements)} annonces affichées")
+    print(f"Total : {len(positions)} annonces affichées sur {len(announcements)}")
     print(separator + "\n")
 
-def filter_announcements(announcements, max_price=None, min_surface=None, location=None):
-    """Filtre les annonces selon des critères"""
-    filtered = announcements.copy()
-    
-    if max_price is not None:
-        filtered = [a for a in filtered if a.get('prix', float('inf')) <= max_price]
-    if min_surface is not None:
-        filtered = [a for a in filtered if a.get('surface_m2', 0) >= min_surface]
-    if location:
-        location = location.lower()
-        filtered = [a for a in filtered if location in a.get('localisation', '').lower()]
-    
-    return filtered
+def filter_announcements(announcements, max_price=None, min_surface=None, location=None,
+                          min_price=None, max_surface=None, min_prix_m2=None, max_prix_m2=None,
+                          min_pieces=None, max_pieces=None, furnished=None,
+                          date_min=None, date_max=None, index=None):
+    """
+    Filtre les annonces selon des critères
+
+    Args:
+        announcements (list): Liste des annonces
+        max_price, min_price (int, optional): Bornes de prix
+        min_surface, max_surface (int, optional): Bornes de surface en m²
+        location (str, optional): Ville ou code postal
+        min_prix_m2, max_prix_m2 (int, optional): Bornes de prix au m²
+        min_pieces, max_pieces (int, optional): Bornes du nombre de pièces
+        furnished (bool, optional): True pour meublé, False pour non meublé
+        date_min, date_max (str, optional): Fenêtre de publication ('AAAA-MM-JJ')
+        index (AnnouncementIndex, optional): Index déjà construit sur ces annonces
+
+    Returns:
+        list: Annonces correspondant à tous les critères
+    """
+    if index is None:
+        index = AnnouncementIndex(announcements)
+
+    return index.query(
+        prix=(min_price, max_price),
+        surface_m2=(min_surface, max_surface),
+        prix_m2=(min_prix_m2, max_prix_m2),
+        pieces=(min_pieces, max_pieces),
+        location=location,
+        furnished=furnished,
+        date_range=(date_min, date_max)
+    )
 
 
-def process_file(file_path, max_price=None, min_surface=None, location=None, is_rental=False):
+def process_file(file_path, max_price=None, min_surface=None, location=None, is_rental=False,
+                 display_options=None, context=None, **filters):
     """
     Traite un seul fichier d'annonces
     
@@ -343,6 +441,10 @@ def process_file(file_path, max_price=None, min_surface=None, location=None, is_
         min_surface (int, optional): Surface minimale pour le filtrage
         location (str, optional): Localisation pour le filtrage
         is_rental (bool): Si True, traite le fichier comme des locations (affichage diffÃ©rent)
+        display_options (dict, optional): Options du tableau (limit, offset, sort_by, output_format, stream)
+        context (AnalysisContext, optional): Contexte de l'analyse (loyers de référence, prêt, filtres)
+        **filters: Critères supplémentaires transmis à filter_announcements
+                   (min_price, max_surface, min_pieces, furnished, date_min, ...)
     """
     print(f"\n{'='*80}")
     print(f"TRAITEMENT DU FICHIER: {file_path}".center(80))
@@ -354,34 +456,48 @@ def process_file(file_path, max_price=None, min_surface=None, location=None, is_
         print(f"Aucune annonce valide dans le fichier {file_path}")
         return
     
+    process_announcements(announcements, max_price, min_surface, location, is_rental=is_rental,
+                          display_options=display_options, context=context, **filters)
+
+def process_announcements(announcements, max_price=None, min_surface=None, location=None,
+                          is_rental=False, display_options=None, stats=None, stats_pieces=None,
+                          context=None, **filters):
+    """
+    Traite une liste d'annonces déjà chargée en mémoire (voir process_file)
+    
+    Args:
+        announcements (list): Annonces à traiter
+        stats (dict, optional): Résultat déjà calculé de calculate_statistics(announcements)
+        stats_pieces (dict, optional): Résultat déjà calculé de calculate_stats_par_pieces(announcements)
+        Les autres arguments sont ceux de process_file.
+    
+    Les statistiques fournies ne sont réutilisées que si les filtres conservent
+    toutes les annonces ; sinon elles sont recalculées sur les annonces filtrées.
+    """
+    if context is None:
+        context = AnalysisContext()
+    context = context.with_filters(max_price=max_price, min_surface=min_surface,
+                                   location=location, **filters)
+    
     # Appliquer les filtres
-    filtered_announcements = filter_announcements(
-        announcements,
-        max_price=max_price,
-        min_surface=min_surface,
-        location=location
-    )
+    filtered_announcements = filter_announcements(announcements, **context.filters)
     
     if not filtered_announcements:
         print("Aucune annonce ne correspond aux critères de recherche.")
         return
     
-    # Calculer les statistiques
-    stats = calculate_statistics(filtered_announcements)
-    stats_pieces = calculate_stats_par_pieces(filtered_announcements)
+    # Calculer les statistiques (sauf si celles fournies portent déjà sur ces annonces)
+    if stats is None or len(filtered_announcements) != len(announcements):
+        stats = calculate_statistics(filtered_announcements)
+    if stats_pieces is None or len(filtered_announcements) != len(announcements):
+        stats_pieces = calculate_stats_par_pieces(filtered_announcements)
     
     # Afficher les statistiques par nombre de pièces (toujours affichÃ©)
     if stats_pieces:
-        if is_rental:
-            for pieces, data in sorted(stats_pieces.items()):
-                print(pieces, round(data['prix_moyen'], 2))
-                loyers_par_pieces[pieces] = round(data['prix_moyen'], 2)
-                print(loyers_par_pieces), print(prix_moyen_par_pieces)
-        else:
-            for pieces, data in sorted(stats_pieces.items()):
-                print(pieces, round(data['prix_moyen'], 2))
-                prix_moyen_par_pieces[pieces] = round(data['prix_moyen'], 2)
-                print(prix_moyen_par_pieces), print(loyers_par_pieces)
+        # Les loyers de référence sont fixés avant le traitement (voir prepare_context) :
+        # le résultat ne dépend pas de l'ordre des fichiers
+        if not is_rental:
+            context.set_prix_depuis_stats(stats_pieces)
 
         print("\nPRIX MOYEN PAR NOMBRE DE PIÃˆCES:")
         print(f"{'Pièces':<8} | {'Annonces':<8} | {'Prix moyen':<15} | {'Surface moy.':<12} | {'Prix/m² moy.'}")
@@ -416,7 +532,107 @@ def process_file(file_path, max_price=None, min_surface=None, location=None, is_
         print("LISTE DETAILLEE DES ANNONCES".center(80))
         print(f"{'='*80}")
         # Passer les statistiques de location pour le calcul des differences
-        display_announcements_table(filtered_announcements, rental_stats=stats_pieces)
+        display_announcements_table(filtered_announcements, rental_stats=stats_pieces,
+                                    context=context, **(display_options or {}))
+
+def prepare_context(context, locations, stats_pieces=None):
+    """
+    Fixe les loyers de référence du contexte (moyennes par pièces et modèle des loyers)
+    à partir des annonces de location filtrées
+    
+    Args:
+        context (AnalysisContext): Contexte à compléter
+        locations (list): Annonces de location
+        stats_pieces (dict, optional): calculate_stats_par_pieces déjà calculé sur toutes
+                                       les locations, repris si les filtres les conservent toutes
+        
+    Returns:
+        dict: Statistiques par nombre de pièces des locations filtrées
+    """
+    filtered = filter_announcements(locations, **context.filters) if locations else []
+    if stats_pieces is None or len(filtered) != len(locations or []):
+        stats_pieces = calculate_stats_par_pieces(filtered)
+    stats_pieces = stats_pieces or {}
+    context.set_loyers_depuis_stats(stats_pieces)
+    context.set_modele_loyer(filtered)
+    return stats_pieces
+
+def analyser_annonces(ventes, locations=None, context=None):
+    """
+    Analyse des annonces sans affichage, utilisable en parallèle (un contexte par analyse)
+    
+    Args:
+        ventes (list): Annonces de vente
+        locations (list, optional): Annonces de location servant de référence de loyer
+        context (AnalysisContext, optional): Contexte de l'analyse (non modifié)
+        
+    Returns:
+        dict: 'context' (contexte complété), 'ventes' (annonces filtrées),
+              'statistiques', 'stats_par_pieces' et 'enrichi' (colonnes de enrichir_annonces)
+    """
+    context = (context or AnalysisContext()).copy()
+    if locations:
+        prepare_context(context, locations)
+    
+    filtered = filter_announcements(ventes or [], **context.filters)
+    stats_pieces = calculate_stats_par_pieces(filtered)
+    if stats_pieces:
+        context.set_prix_depuis_stats(stats_pieces)
+    
+    return {
+        'context': context,
+        'ventes': filtered,
+        'statistiques': calculate_statistics(filtered),
+        'stats_par_pieces': stats_pieces,
+        'enrichi': enrichir_annonces(filtered, loyers_par_pieces=context.loyers_par_pieces,
+                                     taux_annuel=context.taux_annuel,
+                                     duree_annees=context.duree_annees,
+                                     loyers=context.loyers_estimes(filtered))
+    }
+
+def display_results(ventes=None, locations=None, max_price=None, min_surface=None, location=None,
+                    display_options=None, stats_ventes=None, stats_locations=None, context=None,
+                    statistiques_ventes=None, statistiques_locations=None, **filters):
+    """
+    Étape d'affichage utilisable comme bibliothèque, sans relire les fichiers JSON
+    
+    Args:
+        ventes (list, optional): Annonces de vente en mémoire
+        locations (list, optional): Annonces de location en mémoire
+        max_price, min_surface, location: Filtres (voir process_file)
+        display_options (dict, optional): Options du tableau (voir display_announcements_table)
+        stats_ventes (dict, optional): calculate_stats_par_pieces déjà calculé sur les ventes
+        stats_locations (dict, optional): calculate_stats_par_pieces déjà calculé sur les locations
+        context (AnalysisContext, optional): Contexte de l'analyse (un nouveau contexte par défaut)
+        statistiques_ventes (dict, optional): calculate_statistics déjà calculé sur les ventes
+        statistiques_locations (dict, optional): calculate_statistics déjà calculé sur les locations
+        **filters: Critères supplémentaires transmis à filter_announcements
+    
+    Les statistiques fournies ne sont reprises que si les filtres conservent toutes
+    les annonces (voir process_announcements).
+    """
+    if context is None:
+        context = AnalysisContext()
+    context = context.with_filters(max_price=max_price, min_surface=min_surface,
+                                   location=location, **filters)
+    
+    # Les loyers de référence sont fixés avant tout affichage
+    if locations:
+        prepare_context(context, locations, stats_locations)
+    
+    if locations:
+        print(f"\n{'='*80}")
+        print("TRAITEMENT DES ANNONCES DE LOCATION".center(80))
+        print(f"{'='*80}")
+        process_announcements(locations, is_rental=True, display_options=display_options,
+                              stats=statistiques_locations, stats_pieces=stats_locations, context=context)
+    
+    if ventes:
+        print(f"\n{'='*80}")
+        print("TRAITEMENT DES ANNONCES DE VENTE".center(80))
+        print(f"{'='*80}")
+        process_announcements(ventes, is_rental=False, display_options=display_options,
+                              stats=statistiques_ventes, stats_pieces=stats_ventes, context=context)
 
 def main():
     # Configuration de l'encodage de la console
@@ -425,6 +641,8 @@ def main():
         os.system('chcp 65001 > nul')  # Passe en UTF-8 sous Windows
     if len(sys.argv) < 2:
         print("Usage: python display_ads.py [--vente=FICHIER] [--location=FICHIER] [--max-price PRIX] [--min-surface SURFACE] [--location-ville VILLE]")
+        print("Options supplémentaires: [--min-price PRIX] [--max-surface SURFACE] [--min-prix-m2 N] [--max-prix-m2 N] [--min-pieces N] [--max-pieces N] [--meuble|--non-meuble] [--depuis AAAA-MM-JJ] [--jusqu-au AAAA-MM-JJ]")
+        print("Affichage: [--limit N] [--offset N] [--sort-by COLONNE|-COLONNE] [--format grid|csv|tsv]")
         print("Exemple: python display_ads.py --vente=ventes.json --location=locations.json --max-price 100000 --min-surface 50 --location-ville albi")
         sys.exit(1)
     
@@ -434,6 +652,18 @@ def main():
     max_price = None
     min_surface = None
     location_ville = None
+    filters = {}
+    display_options = {}
+    
+    # Options numériques supplémentaires -> paramètre de filter_announcements
+    numeric_options = {
+        '--min-price': 'min_price',
+        '--max-surface': 'max_surface',
+        '--min-prix-m2': 'min_prix_m2',
+        '--max-prix-m2': 'max_prix_m2',
+        '--min-pieces': 'min_pieces',
+        '--max-pieces': 'max_pieces'
+    }
     
     # Traiter les arguments
     i = 1
@@ -461,9 +691,47 @@ def main():
         elif arg == '--location-ville' and i + 1 < len(sys.argv):
             location_ville = sys.argv[i+1]
             i += 1
+        elif arg in numeric_options and i + 1 < len(sys.argv):
+            try:
+                filters[numeric_options[arg]] = int(sys.argv[i+1])
+                i += 1
+            except ValueError:
+                print(f"Erreur: La valeur de {arg} doit être un nombre.")
+                sys.exit(1)
+        elif arg in ('--limit', '--offset') and i + 1 < len(sys.argv):
+            try:
+                display_options[arg[2:]] = int(sys.argv[i+1])
+                i += 1
+            except ValueError:
+                print(f"Erreur: La valeur de {arg} doit être un nombre.")
+                sys.exit(1)
+        elif arg == '--sort-by' and i + 1 < len(sys.argv):
+            if sys.argv[i+1].lstrip('-') not in SORT_KEYS:
+                print(f"Erreur: Colonne de tri inconnue. Valeurs possibles : {', '.join(SORT_KEYS)} (préfixe '-' pour un tri décroissant)")
+                sys.exit(1)
+            display_options['sort_by'] = sys.argv[i+1]
+            i += 1
+        elif arg == '--format' and i + 1 < len(sys.argv):
+            if sys.argv[i+1] not in ('grid', 'csv', 'tsv'):
+                print("Erreur: Le format doit être grid, csv ou tsv.")
+                sys.exit(1)
+            display_options['output_format'] = sys.argv[i+1]
+            i += 1
+        elif arg == '--meuble':
+            filters['furnished'] = True
+        elif arg == '--non-meuble':
+            filters['furnished'] = False
+        elif arg in ('--depuis', '--jusqu-au') and i + 1 < len(sys.argv):
+            try:
+                date_value = datetime.strptime(sys.argv[i+1], "%Y-%m-%d").date().isoformat()
+                i += 1
+            except ValueError:
+                print(f"Erreur: La date de {arg} doit être au format AAAA-MM-JJ.")
+                sys.exit(1)
+            filters['date_min' if arg == '--depuis' else 'date_max'] = date_value
         else:
             print(f"Argument inconnu ou manquant une valeur: {arg}")
-            print("Utilisation: python display_ads.py [--vente=FICHIER] [--location=FICHIER] [--max-price PRIX] [--min-surface SURFACE] [--location-ville VILLE]")
+            print("Utilisation: python display_ads.py [--vente=FICHIER] [--location=FICHIER] [--max-price PRIX] [--min-surface SURFACE] [--location-ville VILLE] [options supplémentaires]")
             sys.exit(1)
         i += 1
     
@@ -472,13 +740,30 @@ def main():
         print("Erreur: Vous devez spécifier au moins un fichier avec --vente ou --location")
         sys.exit(1)
     
-    # Traiter le fichier de location s'il est spécifié (en premier)
-    if location_file:
-        process_file(location_file, max_price, min_surface, location_ville, is_rental=True)
+    # Sortie redirigée sans format demandé : valeurs délimitées plutôt que le tableau paginé
+    display_options.setdefault('output_format', default_output_format())
     
-    # Traiter le fichier de vente s'il est spÃ©cifiÃ© (ensuite)
-    if vente_file:
-        process_file(vente_file, max_price, min_surface, location_ville, is_rental=False)
+    # En CSV/TSV, seul le tableau va sur la sortie standard, les statistiques sur stderr
+    if display_options.get('output_format') in ('csv', 'tsv'):
+        display_options['stream'] = sys.stdout
+        report = contextlib.redirect_stdout(sys.stderr)
+    else:
+        report = contextlib.nullcontext()
+    
+    # Contexte propre à cette analyse : loyers de référence, prêt et filtres
+    context = AnalysisContext(filters=dict(max_price=max_price, min_surface=min_surface,
+                                           location=location_ville, **filters))
+    
+    with report:
+        locations = load_announcements(location_file) if location_file else None
+        ventes = load_announcements(vente_file) if vente_file else None
+        if location_file and not locations:
+            print(f"Aucune annonce valide dans le fichier {location_file}")
+        if vente_file and not ventes:
+            print(f"Aucune annonce valide dans le fichier {vente_file}")
+        
+        display_results(ventes=ventes, locations=locations,
+                        display_options=display_options, context=context)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Enrichissement vectorisé des annonces
+
+Calcule en une seule passe NumPy, pour toutes les annonces d'un jeu de données :
+- la mensualité du prêt
+- le loyer de référence (estimation par annonce, sinon moyenne par nombre de pièces)
+  et la différence loyer - mensualité
+- le prix au m²
+- l'ancienneté de l'annonce en jours
+"""
+
+from datetime import date
+
+import numpy as np
+
+from calcul_mensualite import calculer_mensualites, cout_total_interets
+from config import LOAN_PARAMS
+
+
+def colonne_numerique(announcements, field):
+    """Extrait un champ numérique sous forme de tableau float (NaN si absent)"""
+    return np.array(
+        [a.get(field) if isinstance(a.get(field), (int, float)) else np.nan for a in announcements],
+        dtype=float
+    )
+
+
+def _dates(announcements):
+    """Convertit les dates de publication en tableau datetime64[D] (NaT si absente ou invalide)"""
+    valeurs = [a.get('date_publication') for a in announcements]
+    valeurs = [v if isinstance(v, str) and v != 'N/A' else 'NaT' for v in valeurs]
+    try:
+        return np.array(valeurs, dtype='datetime64[D]')
+    except ValueError:
+        # Au moins une date mal formée : conversion élément par élément
+        dates = []
+        for v in valeurs:
+            try:
+                dates.append(np.datetime64(v, 'D'))
+            except ValueError:
+                dates.append(np.datetime64('NaT'))
+        return np.array(dates, dtype='datetime64[D]')
+
+
+def enrichir_annonces(announcements, loyers_par_pieces=None, taux_annuel=None,
+                      duree_annees=None, aujourdhui=None, loyers=None):
+    """
+    Calcule les colonnes dérivées de toutes les annonces sous forme de tableaux NumPy
+
+    Args:
+        announcements (list): Liste des annonces
+        loyers_par_pieces (dict, optional): Loyer de référence par nombre de pièces,
+                                            utilisé pour les annonces de vente
+        taux_annuel (float, optional): Taux du prêt (défaut: LOAN_PARAMS)
+        duree_annees (int, optional): Durée du prêt (défaut: LOAN_PARAMS)
+        aujourdhui (date, optional): Date de référence pour l'ancienneté
+        loyers (array-like, optional): Loyer estimé de chaque annonce de vente (voir rent_model.py),
+                                       prioritaire sur loyers_par_pieces lorsqu'il est connu
+
+    Returns:
+        dict: Tableaux alignés sur les annonces ('prix', 'surface', 'pieces', 'prix_m2',
+              'mensualite', 'cout_interets', 'loyer', 'difference', 'age_jours'). Les valeurs
+              manquantes sont NaN.
+    """
+    if taux_annuel is None:
+        taux_annuel = LOAN_PARAMS['interest_rate']
+    if duree_annees is None:
+        duree_annees = LOAN_PARAMS['loan_duration_years']
+    if aujourdhui is None:
+        aujourdhui = date.today()
+    loyers_par_pieces = loyers_par_pieces or {}
+
+    prix = colonne_numerique(announcements, 'prix')
+    surface = colonne_numerique(announcements, 'surface_m2')
+    pieces = colonne_numerique(announcements, 'pieces')
+
+    # Prix au m² : valeur extraite de l'annonce, calculée seulement si elle manque
+    prix_m2 = colonne_numerique(announcements, 'prix_m2')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prix_m2 = np.where(np.isnan(prix_m2) & (surface > 0), np.round(prix / surface), prix_m2)
+
+    # Mensualité : un seul facteur d'annuité (mis en cache) pour toutes les annonces
+    mensualite = np.round(calculer_mensualites(prix, taux_annuel, duree_annees), 2)
+    cout_interets = cout_total_interets(prix, taux_annuel, duree_annees)
+
+    # Loyer de référence : le loyer de l'annonce pour une location ; pour une vente,
+    # le loyer estimé s'il est fourni, sinon la moyenne par nombre de pièces
+    est_location = np.array([a.get('category') == 'location' for a in announcements], dtype=bool)
+    loyer_reference = np.array(
+        [loyers_par_pieces.get(a.get('pieces'), np.nan) for a in announcements],
+        dtype=float
+    )
+    if loyers is not None:
+        loyers = np.asarray(loyers, dtype=float)
+        loyer_reference = np.where(np.isfinite(loyers), loyers, loyer_reference)
+    loyer = np.where(est_location, np.nan_to_num(prix), loyer_reference)
+    difference = np.where(mensualite > 0, loyer - mensualite, np.nan)
+
+    # Ancienneté en jours
+    dates = _dates(announcements)
+    age = (np.datetime64(aujourdhui, 'D') - dates).astype('timedelta64[D]')
+    age_jours = np.where(np.isnat(age), np.nan, age.astype(float))
+
+    return {
+        'prix': prix,
+        'surface': surface,
+        'pieces': pieces,
+        'prix_m2': prix_m2,
+        'mensualite': mensualite,
+        'cout_interets': cout_interets,
+        'loyer': loyer,
+        'difference': difference,
+        'age_jours': age_jours
+    }
@@ -5,12 +5,14 @@ from datetime import datetime, timedelta
 from bs4 import BeautifulSoup
 import uuid  # Pour générer des IDs uniques
 
-def parse_date(date_text):
+def parse_date(date_text, reference_date=None):
     """
     Convertit une date textuelle de Le Bon Coin en date au format ISO (sans heure).
     
     Args:
         date_text (str): Date au format texte (ex: "Aujourd'hui, 15:30", "Hier, 09:15", "Il y a 3 jours")
+        reference_date (date, optional): Jour du téléchargement de la page, pour les dates
+                                         relatives (défaut: aujourd'hui)
         
     Returns:
         str: Date au format ISO (ex: "2023-09-26") ou None en cas d'erreur
@@ -19,7 +21,7 @@ def parse_date(date_text):
         return None
     
     date_text = date_text.strip()
-    today = datetime.now().date()
+    today = reference_date or datetime.now().date()
     
     try:
         # Cas 1: "Aujourd'hui" ou "Aujourd'hui, HH:MM"
@@ -96,8 +98,8 @@ def extract_pieces(description):
     match = re.search(r'(\d+)\s*pi[èe]ce', description, re.IGNORECASE)
     return int(match.group(1)) if match else None
 
-def extract_announcement_data(ad, annonce_id):
-    """Extrait les données d'une annonce"""
+def extract_announcement_data(ad, annonce_id, reference_date=None):
+    """Extrait les données d'une annonce (dates relatives comptées depuis reference_date)"""
     data = {
         'id': str(annonce_id),  # Ajout de l'ID unique
         'prix': None,
@@ -158,7 +160,7 @@ def extract_announcement_data(ad, annonce_id):
             # Nettoyer le texte de la date
             date_text = ' '.join(word for word in date_text.split() if word != '·')
             # Convertir la date en format ISO
-            data['date_publication'] = parse_date(date_text)
+            data['date_publication'] = parse_date(date_text, reference_date)
         
         # Vérifier si les champs requis sont présents
         required_fields = ['prix', 'localisation', 'description', 'url']
@@ -170,6 +172,69 @@ def extract_announcement_data(ad, annonce_id):
         
     return None
 
+def parse_announcements(content, reference_date=None):
+    """
+    Extrait les annonces d'un contenu HTML, sans lecture ni écriture de fichier
+    
+    Args:
+        content (str): Contenu HTML d'une page de résultats
+        reference_date (date, optional): Jour du téléchargement de la page (défaut: aujourd'hui)
+        
+    Returns:
+        tuple: (annonces uniques, nombre de cartes trouvées, nombre d'annonces ignorées)
+    """
+    # Utiliser BeautifulSoup pour parser le HTML
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    # Trouver tous les éléments qui contiennent des annonces
+    ads = soup.find_all('div', class_=lambda x: x and x.startswith('adcard_'))
+    
+    # Extraire les données de chaque annonce en éliminant les doublons par URL
+    unique_announcements = {}  # Dictionnaire pour stocker les annonces uniques par URL
+    ignored_ads = 0  # Compteur d'annonces ignorées
+    
+    for i, ad in enumerate(ads, 1):
+        announcement = extract_announcement_data(ad, i, reference_date)
+        if announcement and 'url' in announcement and announcement['url']:
+            url = announcement['url']
+            # Vérifier si l'URL commence par le préfixe souhaité
+            if not url.startswith('https://www.leboncoin.fr/ad/'):
+                ignored_ads += 1
+                continue
+                
+            # Si l'URL n'existe pas encore ou si la nouvelle annonce a plus d'informations
+            if url not in unique_announcements or (
+                announcement.get('prix') is not None or 
+                announcement.get('surface_m2') is not None
+            ):
+                unique_announcements[url] = announcement
+    
+    # Convertir le dictionnaire en liste pour le JSON
+    announcements = list(unique_announcements.values())
+    # Réattribuer des IDs séquentiels après la déduplication
+    for i, annonce in enumerate(announcements, 1):
+        annonce['id'] = str(i)
+    
+    return announcements, len(ads), ignored_ads
+
+def parse_result_count(content):
+    """
+    Nombre total de résultats annoncé par une page de recherche
+    
+    Args:
+        content (str): Contenu HTML d'une page de résultats
+        
+    Returns:
+        int: Nombre de résultats de la recherche (toutes pages), ou None s'il n'est pas indiqué
+    """
+    # Données embarquées de la page, puis titre du type "1 234 annonces"
+    match = re.search(r'"total"\s*:\s*(\d+)', content)
+    if not match:
+        match = re.search(r'>\s*(\d[\d \xa0\u202f]*)\s*annonces?\b', content)
+    if not match:
+        return None
+    return int(re.sub(r'\D', '', match.group(1)))
+
 def extract_ads(html_file, output_file):
     """
     Extrait les annonces de la page HTML et enregistre les données structurées
@@ -179,47 +244,16 @@ def extract_ads(html_file, output_file):
         with open(html_file, 'r', encoding='utf-8') as file:
             content = file.read()
         
-        # Utiliser BeautifulSoup pour parser le HTML
-        soup = BeautifulSoup(content, 'html.parser')
+        announcements, total_ads, ignored_ads = parse_announcements(content)
         
-        # Trouver tous les éléments qui contiennent des annonces
-        ads = soup.find_all('div', class_=lambda x: x and x.startswith('adcard_'))
-        
-        if not ads:
+        if not total_ads:
             print("Aucune annonce trouvée dans la page.")
             return False
         
-        # Extraire les données de chaque annonce en éliminant les doublons par URL
-        unique_announcements = {}  # Dictionnaire pour stocker les annonces uniques par URL
-        ignored_ads = 0  # Compteur d'annonces ignorées
-        
-        for i, ad in enumerate(ads, 1):
-            announcement = extract_announcement_data(ad, i)
-            if announcement and 'url' in announcement and announcement['url']:
-                url = announcement['url']
-                # Vérifier si l'URL commence par le préfixe souhaité
-                if not url.startswith('https://www.leboncoin.fr/ad/'):
-                    ignored_ads += 1
-                    continue
-                    
-                # Si l'URL n'existe pas encore ou si la nouvelle annonce a plus d'informations
-                if url not in unique_announcements or (
-                    announcement.get('prix') is not None or 
-                    announcement.get('surface_m2') is not None
-                ):
-                    unique_announcements[url] = announcement
-        
-        # Convertir le dictionnaire en liste pour le JSON
-        announcements = list(unique_announcements.values())
-        # Réattribuer des IDs séquentiels après la déduplication
-        for i, annonce in enumerate(announcements, 1):
-            annonce['id'] = str(i)
-        
         # Écrire les données dans un fichier JSON
         with open(output_file, 'w', encoding='utf-8') as file:
             json.dump(announcements, file, ensure_ascii=False, indent=2)
         
-        total_ads = len(ads)
         valid_ads = len(announcements)
         print(f"{valid_ads} annonces valides extraites sur {total_ads} ({valid_ads/max(1, total_ads)*100:.1f}% de complétion)")
         if ignored_ads > 0:
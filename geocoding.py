@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+"""
+Géolocalisation des villes et codes postaux
+
+Les résultats de Nominatim sont conservés dans un cache persistant (SQLite) indexé
+par l'entrée normalisée, avec une durée de validité et un cache des échecs.
+Un cache LRU en mémoire se place devant le cache SQLite ; seules les entrées
+absentes des deux caches interrogent Nominatim, via un client unique partagé.
+Les communes de l'index hors ligne (offline_geocoder.py) sont résolues avant tout
+cache, sans accès réseau.
+
+geocode_batch résout une liste de villes ou de codes postaux : les doublons sont
+regroupés, l'index hors ligne et le cache servent ce qu'ils peuvent, et le reste est
+interrogé en parallèle à travers le limiteur de débit partagé.
+"""
+
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from ad_index import normalize_text
+from config import GEOCODING_CONFIG
+from offline_geocoder import get_offline_geocoder
+
+# Marqueur d'un échec mis en cache (localisation introuvable)
+NOT_FOUND = object()
+
+
+def is_postal_code(input_str):
+    """Vérifie si l'entrée est un code postal français valide (5 chiffres)"""
+    return input_str.isdigit() and len(input_str) == 5 and 1000 <= int(input_str) <= 98999
+
+
+def normalize_query(location_input):
+    """Normalise une entrée utilisateur pour servir de clé de cache ('  Saint Juéry ' -> 'saint juery')"""
+    return ' '.join(re.split(r'[\s\-]+', normalize_text(location_input).strip()))
+
+
+class GeocodeCache:
+    """Cache persistant (SQLite) des résultats de géolocalisation, précédé d'un LRU en mémoire"""
+
+    def __init__(self, path=None, ttl_days=None, negative_ttl_days=None, memory_size=None):
+        """
+        Args:
+            path (str, optional): Fichier SQLite (':memory:' pour un cache non persistant)
+            ttl_days (float, optional): Validité d'un résultat trouvé
+            negative_ttl_days (float, optional): Validité d'un échec
+            memory_size (int, optional): Nombre d'entrées du LRU en mémoire
+        """
+        self.path = path or GEOCODING_CONFIG['cache_path']
+        self.ttl = (ttl_days if ttl_days is not None else GEOCODING_CONFIG['cache_ttl_days']) * 86400
+        self.negative_ttl = (negative_ttl_days if negative_ttl_days is not None
+                             else GEOCODING_CONFIG['negative_ttl_days']) * 86400
+        self.memory_size = memory_size or GEOCODING_CONFIG['memory_cache_size']
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " key TEXT PRIMARY KEY,"
+            " result TEXT,"  # JSON du résultat, NULL pour un échec
+            " expires REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def _remember(self, key, value, expires):
+        """Ajoute une entrée au LRU en mémoire"""
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Cherche une entrée valide dans le cache
+
+        Returns:
+            dict, NOT_FOUND ou None: Le résultat, le marqueur d'échec, ou None si absent/expiré
+        """
+        now = time.time()
+        with self._lock:
+            if key in self._memory:
+                value, expires = self._memory[key]
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            row = self._db.execute("SELECT result, expires FROM geocode WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                return None
+            value = json.loads(row[0]) if row[0] is not None else NOT_FOUND
+            self._remember(key, value, row[1])
+            return value
+
+    def set(self, key, value):
+        """Enregistre un résultat (dict) ou un échec (None) dans les deux niveaux de cache"""
+        expires = time.time() + (self.ttl if value is not None else self.negative_ttl)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocode (key, result, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False) if value is not None else None, expires)
+            )
+            self._db.commit()
+            self._remember(key, value if value is not None else NOT_FOUND, expires)
+
+    def purge_expired(self):
+        """Supprime les entrées expirées du fichier SQLite"""
+        with self._lock:
+            self._db.execute("DELETE FROM geocode WHERE expires <= ?", (time.time(),))
+            self._db.commit()
+
+
+_geocoder = None
+_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_geocoder():
+    """Retourne le client Nominatim partagé (créé au premier appel), limité en débit"""
+    global _geocoder
+    with _shared_lock:
+        if _geocoder is None:
+            from geopy.geocoders import Nominatim
+            from geopy.extra.rate_limiter import RateLimiter
+
+            geolocator = Nominatim(
+                user_agent=GEOCODING_CONFIG['user_agent'],
+                timeout=GEOCODING_CONFIG['timeout'],
+                domain=GEOCODING_CONFIG['domain']
+            )
+            # Ajouter un délai pour respecter les conditions d'utilisation.
+            # Les nouvelles tentatives sont gérées par geocode_remote : le limiteur
+            # n'en fait pas et laisse remonter les erreurs
+            _geocoder = RateLimiter(
+                geolocator.geocode,
+                min_delay_seconds=GEOCODING_CONFIG['min_delay_seconds'],
+                max_retries=0,
+                swallow_exceptions=False
+            )
+        return _geocoder
+
+
+def get_cache():
+    """Retourne le cache de géolocalisation partagé"""
+    global _cache
+    with _shared_lock:
+        if _cache is None:
+            _cache = GeocodeCache()
+        return _cache
+
+
+def _parse_location(location, location_input):
+    """Convertit une réponse Nominatim en dictionnaire de localisation (None sans code postal)"""
+    # Extraire le code postal et le nom de la ville
+    address = location.raw.get('address', {})
+    postcode = address.get('postcode')
+    city_name = address.get('city') or address.get('town') or address.get('village') or location_input
+
+    # Si pas de code postal, essayer de le trouver dans display_name
+    if not postcode and 'display_name' in location.raw:
+        # Chercher un code postal français (5 chiffres) dans le display_name
+        match = re.search(r'\b(?:0[1-9]|[1-8]\d|9[0-8])\d{3}\b', location.raw['display_name'])
+        if match:
+            postcode = match.group(0)
+
+    # Si on avait un code postal en entrée mais qu'on ne le retrouve pas dans la réponse
+    if is_postal_code(location_input) and not postcode:
+        postcode = location_input
+
+    if not postcode:
+        print(f"Impossible de déterminer le code postal pour : {location_input}")
+        return None
+
+    return {
+        'name': city_name,
+        'postcode': postcode,
+        'latitude': location.latitude,
+        'longitude': location.longitude,
+        'input_type': 'postal_code' if is_postal_code(location_input) else 'city_name'
+    }
+
+
+def geocode_remote(location_input, max_retries=3, verbose=True):
+    """
+    Interroge Nominatim (sans cache) pour une ville ou un code postal
+
+    Args:
+        location_input (str): Nom de ville ou code postal français
+        max_retries (int): Nombre de tentatives
+        verbose (bool): Afficher les messages d'erreur et les conseils
+
+    Returns:
+        dict: Informations de localisation, ou None si non trouvée
+
+    Raises:
+        Exception: Erreur réseau persistante après max_retries tentatives
+    """
+    geocode = get_geocoder()
+
+    # Préparer les requêtes en fonction du type d'entrée
+    if is_postal_code(location_input):
+        # Si c'est un code postal, on le recherche directement
+        queries = [
+            f"{location_input}, France",
+            f"{location_input}, FR"
+        ]
+    else:
+        # Si c'est un nom de ville, on essaie différents formats
+        queries = [
+            f"{location_input}, France",
+            f"Ville de {location_input}, France",
+            f"{location_input}, {location_input}, France"
+        ]
+
+    retry_count = 0
+    while True:
+        try:
+            location = None
+            for query in queries:
+                location = geocode(query, addressdetails=True, language='fr')
+                if location:
+                    break
+
+            if location:
+                return _parse_location(location, location_input)
+
+            retry_count += 1
+            if retry_count >= max_retries:
+                if verbose:
+                    print(f"\nErreur : Impossible de trouver la localisation pour '{location_input}' après {max_retries} tentatives.")
+                    print("Conseils :")
+                    print("1. Vérifiez l'orthographe du nom de la ville ou du code postal")
+                    print("2. Essayez d'utiliser un nom de ville plus grand à proximité")
+                    print("3. Vérifiez votre connexion Internet")
+                    print("4. Le service de géolocalisation peut être temporairement indisponible")
+                return None
+            if verbose:
+                print(f"Localisation non trouvée pour '{location_input}'. Nouvelle tentative ({retry_count}/{max_retries-1})...")
+            time.sleep(2)  # Attendre 2 secondes avant de réessayer
+
+        except Exception as e:
+            retry_count += 1
+            if retry_count >= max_retries:
+                raise
+            if verbose:
+                print(f"\nERREUR lors de la recherche de localisation : {str(e)}")
+                print(f"Nouvelle tentative dans 5 secondes... ({retry_count}/{max_retries})")
+            time.sleep(5)  # Attendre 5 secondes avant de réessayer
+
+
+def get_city_coordinates(location_input, cache=None, verbose=True):
+    """
+    Récupère les coordonnées GPS et le code postal d'une ville ou d'un code postal
+
+    L'index hors ligne des communes, puis les caches (mémoire puis SQLite) sont
+    consultés avant Nominatim ; les succès comme les échecs y sont enregistrés.
+
+    Args:
+        location_input (str): Peut être un nom de ville ou un code postal français
+        cache (GeocodeCache, optional): Cache à utiliser (défaut: cache partagé)
+        verbose (bool): Afficher les messages d'erreur et les conseils
+
+    Returns:
+        dict: Dictionnaire contenant les informations de localisation ou None si non trouvé
+    """
+    location_input = location_input.strip()
+
+    if GEOCODING_CONFIG['use_offline_index']:
+        result = get_offline_geocoder().lookup(location_input)
+        if result:
+            return result
+
+    cache = cache or get_cache()
+    key = normalize_query(location_input)
+
+    cached = cache.get(key)
+    if cached is NOT_FOUND:
+        if verbose:
+            print(f"Localisation introuvable pour '{location_input}' (résultat en cache).")
+        return None
+    if cached is not None:
+        return cached
+
+    try:
+        result = geocode_remote(location_input, verbose=verbose)
+    except Exception as e:
+        # Erreur réseau : ne pas mettre en cache, la prochaine tentative pourra aboutir
+        if verbose:
+            print(f"\nERREUR CRITIQUE lors de la recherche de localisation :")
+            print(str(e))
+            print("\nConseils de dépannage :")
+            print("1. Vérifiez votre connexion Internet")
+            print("2. Le service de géolocalisation peut être temporairement indisponible")
+            print("3. Essayez de réessayer dans quelques instants")
+        return None
+
+    cache.set(key, result)
+    return result
+
+
+def _resolve_local(location_input, key, cache):
+    """
+    Résout une entrée sans réseau (index hors ligne puis cache)
+
+    Returns:
+        tuple: (source, résultat) avec source 'offline' ou 'cache', ou None si une requête est nécessaire
+    """
+    if GEOCODING_CONFIG['use_offline_index']:
+        result = get_offline_geocoder().lookup(location_input)
+        if result:
+            return 'offline', result
+    cached = cache.get(key)
+    if cached is NOT_FOUND:
+        return 'cache', None
+    if cached is not None:
+        return 'cache', cached
+    return None
+
+
+def geocode_batch(locations, max_workers=None, cache=None, verbose=False):
+    """
+    Géolocalise une liste de villes ou de codes postaux
+
+    Les entrées sont normalisées et dédoublonnées ; l'index hors ligne et le cache sont
+    consultés d'abord, puis les entrées restantes sont envoyées à Nominatim par un pool
+    de threads. Tous les threads partagent le même RateLimiter : le débit reste conforme
+    aux conditions d'utilisation, mais les temps de réponse se recouvrent.
+
+    Args:
+        locations (list): Noms de villes ou codes postaux
+        max_workers (int, optional): Nombre de requêtes simultanées (défaut: GEOCODING_CONFIG['batch_workers'])
+        cache (GeocodeCache, optional): Cache à utiliser (défaut: cache partagé)
+        verbose (bool): Afficher les messages de geocode_remote
+
+    Returns:
+        list: Un dictionnaire par entrée, dans l'ordre reçu :
+              'input', 'key' (entrée normalisée), 'status' ('found', 'not_found' ou 'error'),
+              'source' ('offline', 'cache' ou 'nominatim'), 'result' (localisation ou None),
+              'error' (message ou None) et 'elapsed' (secondes)
+    """
+    cache = cache or get_cache()
+    max_workers = max_workers or GEOCODING_CONFIG['batch_workers']
+
+    # Regrouper les doublons ('Albi', ' albi ') sur la même clé normalisée
+    inputs = [loc.strip() for loc in locations]
+    keys = [normalize_query(loc) for loc in inputs]
+    uniques = {}
+    for loc, key in zip(inputs, keys):
+        if key and key not in uniques:
+            uniques[key] = loc
+
+    resolved = {}
+    pending = []
+    for key, loc in uniques.items():
+        start = time.perf_counter()
+        local = _resolve_local(loc, key, cache)
+        if local is None:
+            pending.append((key, loc))
+            continue
+        source, result = local
+        resolved[key] = {
+            'status': 'found' if result else 'not_found',
+            'source': source,
+            'result': result,
+            'error': None,
+            'elapsed': time.perf_counter() - start
+        }
+
+    def resolve_remote(item):
+        key, loc = item
+        start = time.perf_counter()
+        try:
+            result = geocode_remote(loc, verbose=verbose)
+        except Exception as e:
+            # Erreur réseau : rien n'est mis en cache
+            return key, {'status': 'error', 'source': 'nominatim', 'result': None,
+                         'error': str(e), 'elapsed': time.perf_counter() - start}
+        cache.set(key, result)
+        return key, {'status': 'found' if result else 'not_found', 'source': 'nominatim',
+                     'result': result, 'error': None, 'elapsed': time.perf_counter() - start}
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            for key, entry in executor.map(resolve_remote, pending):
+                resolved[key] = entry
+
+    empty = {'status': 'not_found', 'source': None, 'result': None, 'error': 'Entrée vide', 'elapsed': 0.0}
+    return [dict(resolved.get(key, empty), input=loc, key=key) for loc, key in zip(inputs, keys)]
+
+
+def split_locations(text):
+    """Découpe une liste saisie ('Albi, 81160; Castres') en entrées individuelles"""
+    return [part.strip() for part in re.split(r'[,;\n]', text) if part.strip()]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python geocoding.py <ville ou code postal> [...]")
+        print("       python geocoding.py \"Albi, Castres, 81160\"")
+        sys.exit(1)
+
+    entries = [loc for arg in sys.argv[1:] for loc in split_locations(arg)]
+    start = time.perf_counter()
+    results = geocode_batch(entries)
+    total = time.perf_counter() - start
+
+    print(f"{'Entrée':<25} | {'Statut':<10} | {'Source':<9} | {'Temps':>8} | Résultat")
+    print("-" * 100)
+    for r in results:
+        loc = r['result']
+        detail = (f"{loc['name']} ({loc['postcode']}) - {loc['latitude']}, {loc['longitude']}"
+                  if loc else (r['error'] or ''))
+        print(f"{r['input'][:25]:<25} | {r['status']:<10} | {r['source'] or '-':<9} | "
+              f"{r['elapsed'] * 1000:>6.1f}ms | {detail}")
+    found = sum(1 for r in results if r['status'] == 'found')
+    print(f"\n{found}/{len(results)} localisations résolues en {total:.2f}s")
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Collecte incrémentale : pages triées par date, arrêt sur les annonces déjà vues
+
+Une recollecte horaire des mêmes recherches renvoie surtout des annonces déjà
+connues. En mode incrémental, chaque recherche est triée de la plus récente à la
+plus ancienne (sort=time, order=desc) et lue page par page : les identifiants
+d'annonces de chaque page sont confrontés à l'ensemble des annonces déjà vues, et
+la pagination s'arrête dès qu'une page est connue à plus de
+INCREMENTAL_CONFIG['known_ratio'] (les annonces mises en avant, anciennes mais
+affichées en tête, empêchent d'exiger une page entièrement connue).
+
+Les annonces vues sont conservées dans un magasin SQLite (ListingStore), avec les
+unités de collecte (URL canoniques) où elles apparaissent. Le test d'appartenance passe par un filtre de
+Bloom construit depuis ce magasin au démarrage : il tient en mémoire et ne
+demande aucune requête SQL par annonce. Un faux positif ne peut qu'avancer
+légèrement l'arrêt ; le décompte des nouvelles annonces vient du magasin.
+
+Le résultat d'une unité reprend toutes les annonces du magasin revues dans cette
+unité depuis moins de INCREMENTAL_CONFIG['max_age_days'] jours : le coût d'une
+collecte suit le nombre de nouvelles annonces, pas la taille du marché.
+"""
+
+import hashlib
+import json
+import math
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from ad_index import ad_id
+from config import INCREMENTAL_CONFIG
+from crawler import make_unit, run_units
+
+
+class BloomFilter:
+    """Filtre de Bloom (tableau de bits et double hachage)"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        Args:
+            capacity (int): Nombre d'éléments prévus
+            error_rate (float): Taux de faux positifs visé à pleine capacité
+        """
+        capacity = max(int(capacity), 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        empreinte = hashlib.blake2b(str(key).encode('utf-8'), digest_size=16).digest()
+        h1, h2 = int.from_bytes(empreinte[:8], 'little'), int.from_bytes(empreinte[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class ListingStore:
+    """Annonces déjà vues (SQLite), avec les unités de collecte où elles apparaissent"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str, optional): Fichier SQLite (défaut: INCREMENTAL_CONFIG['store_path'])
+        """
+        self.path = path or INCREMENTAL_CONFIG['store_path']
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            " ad_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"  # JSON de la dernière version de l'annonce
+            " first_seen REAL NOT NULL,"
+            " last_seen REAL NOT NULL)"
+        )
+        # Rattachement par URL canonique : les variantes d'une même recherche
+        # (vente, location meublée...) portent le même nom mais sont distinctes
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS listing_units ("
+            " unit_key TEXT NOT NULL,"
+            " ad_id TEXT NOT NULL,"
+            " last_seen REAL NOT NULL,"
+            " PRIMARY KEY (unit_key, ad_id))"
+        )
+        self._db.commit()
+        self.bloom = self._construire_bloom()
+
+    def _construire_bloom(self):
+        with self._lock:
+            ids = [row[0] for row in self._db.execute("SELECT ad_id FROM listings")]
+        bloom = BloomFilter(max(INCREMENTAL_CONFIG['bloom_capacity'], 2 * len(ids)),
+                            INCREMENTAL_CONFIG['bloom_error_rate'])
+        for key in ids:
+            bloom.add(key)
+        return bloom
+
+    def seen(self, key):
+        """Vrai si l'annonce a (très probablement) déjà été vue"""
+        return key in self.bloom
+
+    def record(self, unit_key, annonces):
+        """
+        Enregistre les annonces d'une page
+
+        Args:
+            unit_key (str): Clé de l'unité de collecte (URL canonique, voir crawler.make_unit)
+            annonces (list): Annonces extraites de la page
+
+        Returns:
+            list: Annonces absentes du magasin avant cet appel
+        """
+        maintenant = time.time()
+        nouvelles = []
+        with self._lock:
+            for annonce in annonces:
+                key = ad_id(annonce)
+                data = json.dumps(annonce, ensure_ascii=False)
+                curseur = self._db.execute(
+                    "INSERT OR IGNORE INTO listings (ad_id, data, first_seen, last_seen) VALUES (?, ?, ?, ?)",
+                    (key, data, maintenant, maintenant))
+                if curseur.rowcount:
+                    nouvelles.append(annonce)
+                    self.bloom.add(key)
+                else:
+                    self._db.execute("UPDATE listings SET data = ?, last_seen = ? WHERE ad_id = ?",
+                                     (data, maintenant, key))
+                self._db.execute("INSERT OR REPLACE INTO listing_units (unit_key, ad_id, last_seen) VALUES (?, ?, ?)",
+                                 (unit_key, key, maintenant))
+            self._db.commit()
+        return nouvelles
+
+    def annonces(self, unit_key, max_age_days=None):
+        """Annonces d'une unité de collecte revues dans celle-ci depuis moins de max_age_days jours"""
+        max_age_days = INCREMENTAL_CONFIG['max_age_days'] if max_age_days is None else max_age_days
+        with self._lock:
+            lignes = self._db.execute(
+                "SELECT l.data FROM listing_units u JOIN listings l ON l.ad_id = u.ad_id"
+                " WHERE u.unit_key = ? AND u.last_seen >= ? ORDER BY l.first_seen DESC",
+                (unit_key, time.time() - max_age_days * 86400)
+            ).fetchall()
+        return [json.loads(ligne[0]) for ligne in lignes]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_listing_store():
+    """Retourne le magasin d'annonces partagé (créé au premier appel)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ListingStore()
+        return _store
+
+
+def page_url(url, page):
+    """URL d'une page de la recherche, triée de la plus récente à la plus ancienne"""
+    parsed = urlparse(str(url))
+    params = dict(parse_qsl(parsed.query))
+    params.update(sort='time', order='desc')
+    params.pop('page', None)
+    if page > 1:
+        params['page'] = str(page)
+    return urlunparse(parsed._replace(query=urlencode(params)))
+
+
+def run_incremental(units, max_workers=None, pages_dir=None, fetch=None, store=None,
+                    known_ratio=None, max_pages=None, verbose=True):
+    """
+    Collecte les nouvelles annonces de chaque recherche, jusqu'à une page déjà connue
+
+    Les recherches avancent ensemble, une page par tour, dans le pool de crawler.run_units.
+
+    Args:
+        units (iterable): Unités créées par crawler.make_unit
+        max_workers (int, optional): Taille du pool (voir crawler.run_units)
+        pages_dir (str, optional): Dossier des pages HTML
+        fetch (callable, optional): Fonction de téléchargement (voir crawler.fetch_unit)
+        store (ListingStore, optional): Magasin des annonces vues (défaut: magasin partagé)
+        known_ratio (float, optional): Part d'annonces connues qui arrête la pagination
+        max_pages (int, optional): Pages lues au plus par recherche
+        verbose (bool): Afficher l'avancement
+
+    Returns:
+        dict: Par clé d'unité, un résultat au format de crawler.fetch_unit dont les
+              'annonces' sont celles du magasin pour cette unité, complété de
+              'nouvelles' (annonces inconnues jusque-là), 'vues' (annonces distinctes lues),
+              'pages' et 'arret' ('connue', 'fin', 'max_pages' ou 'erreur')
+    """
+    start = time.perf_counter()
+    store = store or get_listing_store()
+    known_ratio = INCREMENTAL_CONFIG['known_ratio'] if known_ratio is None else known_ratio
+    max_pages = max_pages or INCREMENTAL_CONFIG['max_pages']
+    etats = {}
+    for unit in units:
+        etats.setdefault(unit['key'], {'unit': unit, 'page': 0, 'vues': set(), 'nouvelles': [], 'arret': None,
+                                       'resultats': []})
+
+    actives = list(etats.values())
+    while actives:
+        for etat in actives:
+            etat['page'] += 1
+        sous_unites = [make_unit(page_url(e['unit']['url'], e['page']), e['unit']['category'],
+                                 e['unit'].get('furnished'), e['unit'].get('search')) for e in actives]
+        resultats = run_units(sous_unites, max_workers=max_workers, pages_dir=pages_dir, fetch=fetch, verbose=False)
+
+        suivantes = []
+        for etat, sous_unite in zip(actives, sous_unites):
+            result = resultats[sous_unite['key']]
+            etat['resultats'].append(result)
+            if result['status'] != 'ok':
+                etat['arret'] = 'erreur'
+                continue
+            annonces = result['annonces']
+            connues = sum(1 for a in annonces if store.seen(ad_id(a)))
+            # Annonces distinctes : les annonces mises en avant reviennent sur chaque page
+            etat['vues'].update(ad_id(a) for a in annonces)
+            etat['nouvelles'].extend(store.record(etat['unit']['key'], annonces))
+            if verbose:
+                print(f"Page {etat['page']} : {len(annonces) - connues} nouvelles sur {len(annonces)} "
+                      f"({etat['unit']['url']})")
+            if not annonces or (result['total'] is not None and len(etat['vues']) >= result['total']):
+                etat['arret'] = 'fin'
+            elif connues >= known_ratio * len(annonces):
+                etat['arret'] = 'connue'
+            elif etat['page'] >= max_pages:
+                etat['arret'] = 'max_pages'
+            else:
+                suivantes.append(etat)
+        actives = suivantes
+
+    sortie = {}
+    for key, etat in etats.items():
+        erreurs = [r['error'] for r in etat['resultats'] if r['status'] != 'ok']
+        sortie[key] = {
+            'key': key,
+            'url': etat['unit']['url'],
+            'status': 'ok' if len(erreurs) < len(etat['resultats']) else 'error',
+            'annonces': store.annonces(etat['unit']['key']),
+            'cartes': sum(r['cartes'] for r in etat['resultats']),
+            'total': next((r['total'] for r in etat['resultats'] if r['total'] is not None), None),
+            'elapsed': time.perf_counter() - start,
+            'bloque': sum(r.get('bloque', 0.0) for r in etat['resultats']),
+            'error': '; '.join(sorted(set(erreurs))) or None,
+            'nouvelles': etat['nouvelles'],
+            'vues': len(etat['vues']),
+            'pages': etat['page'],
+            'arret': etat['arret']
+        }
+    return sortie
+
+
+def throughput_report(results):
+    """Pages, nouvelles annonces et débit d'une collecte incrémentale"""
+    pages = sum(r['pages'] for r in results.values())
+    nouvelles = sum(len(r['nouvelles']) for r in results.values())
+    duree = max((r['elapsed'] for r in results.values()), default=0.0)
+    return {'recherches': len(results), 'pages': pages, 'vues': sum(r['vues'] for r in results.values()),
+            'nouvelles': nouvelles, 'nouvelles_par_page': round(nouvelles / pages, 2) if pages else 0.0,
+            'nouvelles_par_minute': round(nouvelles / duree * 60, 1) if duree else 0.0, 'duree': round(duree, 2)}
+
+
+def display_report(report):
+    """Affiche le bilan d'une collecte incrémentale"""
+    print(f"Incrémental : {report['nouvelles']} nouvelles annonces sur {report['vues']} lues, "
+          f"{report['pages']} pages pour {report['recherches']} recherches "
+          f"({report['nouvelles_par_page']} nouvelles par page, {report['nouvelles_par_minute']} par minute)")
+
+
+def _marche_simule(annonces=600, par_page=35, mises_en_avant=3, seed=0):
+    """
+    Marché factice trié par date, avec des annonces mises en avant en tête de chaque page
+
+    Returns:
+        tuple: (fonction de téléchargement (url, chemin) -> HTML, fonction publier(n))
+    """
+    import random
+
+    tirage = random.Random(seed)
+    ids = list(range(1000000, 1000000 + annonces))  # Du plus ancien au plus récent
+    en_avant = tirage.sample(ids[:annonces // 2], mises_en_avant)
+
+    def carte(numero):
+        return (f'<div class="adcard_x"><a href="/ad/ventes_immobilieres/{numero}">x</a>'
+                f'<p data-test-id="price">{100000 + numero % 1000 * 250} €</p><p data-test-id="city">Albi 81000</p>'
+                f'<p class="text-body-2">Maison {numero % 5 + 1} pièces · {numero % 150 + 30} m²</p></div>')
+
+    def fetch(url, output_path=None):
+        page = int(dict(parse_qsl(urlparse(url).query)).get('page', 1))
+        recents = ids[::-1]
+        cartes = en_avant + recents[(page - 1) * (par_page - mises_en_avant):page * (par_page - mises_en_avant)]
+        return f'<html>"total": {len(ids)}' + ''.join(carte(n) for n in cartes) + '</html>'
+
+    def publier(n):
+        ids.extend(range(ids[-1] + 1, ids[-1] + 1 + n))
+
+    return fetch, publier
+
+
+def _benchmark():
+    """Première collecte puis recollectes d'un marché factice où quelques annonces paraissent entre deux passages"""
+    import os
+    import tempfile
+
+    from config import ARCHIVE_CONFIG
+
+    ARCHIVE_CONFIG['enabled'] = False
+    fetch, publier = _marche_simule()
+    with tempfile.TemporaryDirectory() as dossier:
+        store = ListingStore(os.path.join(dossier, 'listings.sqlite'))
+        unit = make_unit('https://www.leboncoin.fr/recherche?category=9&locations=Albi', 'vente')
+        print(f"{'Passage':<22} | {'Pages':>5} | {'Lues':>5} | {'Nouvelles':>9} | Arrêt")
+        print("-" * 60)
+        for libelle, parues in (("Première collecte", 0), ("+0 annonce", 0), ("+10 annonces", 10),
+                                ("+40 annonces", 40), ("+100 annonces", 100)):
+            publier(parues)
+            r = run_incremental([unit], pages_dir=dossier, fetch=fetch, store=store, max_pages=50,
+                                verbose=False)[unit['key']]
+            print(f"{libelle:<22} | {r['pages']:>5} | {r['vues']:>5} | {len(r['nouvelles']):>9} | {r['arret']}")
+        print(f"\n{len(r['annonces'])} annonces dans le magasin pour la recherche")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python incremental.py <url_de_recherche> [vente|location]")
+        print("       python incremental.py bench")
+        sys.exit(1)
+
+    if sys.argv[1] == 'bench':
+        _benchmark()
+        sys.exit(0)
+
+    unit = make_unit(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else 'vente')
+    results = run_incremental([unit])
+    display_report(throughput_report(results))
+    result = results[unit['key']]
+    print(f"Arrêt : {result['arret']} après {result['pages']} pages ; "
+          f"{len(result['annonces'])} annonces connues pour cette recherche")
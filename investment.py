@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Indicateurs d'investissement locatif
+
+Calcule pour toutes les annonces de vente, sous forme de tableaux NumPy :
+- rendement brut et rendement net
+- rendement sur fonds propres (cash-on-cash) avec le prêt de LOAN_PARAMS
+- valeur actuelle nette (VAN) et taux de rendement interne (TRI) sur la durée de détention
+
+Le TRI est résolu pour toutes les annonces à la fois (itérations de Newton
+protégées par dichotomie sur des tableaux). Le classement des meilleures
+annonces utilise un tas borné et peut donc parcourir un flux d'annonces.
+"""
+
+import heapq
+import sys
+from itertools import islice
+
+import numpy as np
+
+from calcul_mensualite import calculer_mensualites
+from config import INVESTMENT_PARAMS, LOAN_PARAMS
+
+
+def _parametres(params):
+    """Fusionne les paramètres fournis avec INVESTMENT_PARAMS"""
+    merged = dict(INVESTMENT_PARAMS)
+    merged.update(params or {})
+    return merged
+
+
+def flux_de_tresorerie(prix, loyers, params=None):
+    """
+    Construit les flux annuels (hors financement) de chaque annonce
+
+    Année 0 : achat (prix + frais). Années 1 à N : loyers nets des charges.
+    Année N : revente, nette des frais de revente.
+
+    Args:
+        prix (array-like): Prix de vente
+        loyers (array-like): Loyers mensuels estimés
+        params (dict, optional): Hypothèses (voir INVESTMENT_PARAMS)
+
+    Returns:
+        numpy.ndarray: Flux de forme (nb_annonces, N + 1)
+    """
+    p = _parametres(params)
+    prix = np.asarray(prix, dtype=float)
+    loyers = np.asarray(loyers, dtype=float)
+    duree = int(p['holding_period_years'])
+    annees = np.arange(duree + 1)
+
+    flux = np.zeros((prix.size, duree + 1))
+    flux[:, 0] = -prix * (1 + p['acquisition_costs'])
+
+    hausse = (1 + p['rent_growth'] / 100) ** (annees[1:] - 1)
+    flux[:, 1:] = (12 * loyers * (1 - p['operating_costs']))[:, None] * hausse[None, :]
+
+    revente = prix * (1 + p['annual_appreciation'] / 100) ** duree * (1 - p['resale_costs'])
+    flux[:, -1] += revente
+    return flux
+
+
+def van(flux, taux):
+    """
+    Valeur actuelle nette de chaque ligne de flux
+
+    Args:
+        flux (numpy.ndarray): Flux annuels (nb_annonces, N + 1)
+        taux (float ou numpy.ndarray): Taux d'actualisation en fraction (0.05), un par ligne possible
+
+    Returns:
+        numpy.ndarray: VAN de chaque annonce
+    """
+    annees = np.arange(flux.shape[1])
+    taux = np.broadcast_to(np.asarray(taux, dtype=float), flux.shape[:1])
+    actualisation = (1 + taux)[:, None] ** -annees[None, :]
+    return np.sum(flux * actualisation, axis=1)
+
+
+def tri(flux, tolerance=1e-7, max_iterations=100):
+    """
+    Taux de rendement interne de chaque ligne de flux, résolu en lot
+
+    Chaque itération tente un pas de Newton pour toutes les lignes ; lorsqu'il sort
+    de l'intervalle [bas, haut] encadrant la racine, le milieu de l'intervalle est
+    utilisé à la place (dichotomie).
+
+    Args:
+        flux (numpy.ndarray): Flux annuels (nb_annonces, N + 1), un seul changement de signe
+        tolerance (float): Précision visée sur le taux
+        max_iterations (int): Nombre maximal d'itérations
+
+    Returns:
+        numpy.ndarray: TRI en fraction (0.05 = 5 %), NaN si aucune racine n'est encadrée
+    """
+    n = flux.shape[0]
+    annees = np.arange(flux.shape[1])
+    bas = np.full(n, -0.99)
+    haut = np.full(n, 1.0)
+
+    # La VAN décroît avec le taux : la racine est encadrée si VAN(bas) > 0 > VAN(haut)
+    encadre = (van(flux, bas) > 0) & (van(flux, haut) < 0)
+    taux = np.where(encadre, 0.05, np.nan)
+    actif = encadre.copy()
+
+    for _ in range(max_iterations):
+        if not actif.any():
+            break
+        t = taux[actif]
+        f = flux[actif]
+        actualisation = (1 + t)[:, None] ** -annees[None, :]
+        valeur = np.sum(f * actualisation, axis=1)
+        derivee = np.sum(-annees[None, :] * f * actualisation / (1 + t)[:, None], axis=1)
+
+        # Resserrer l'intervalle autour de la racine
+        b, h = bas[actif], haut[actif]
+        b = np.where(valeur > 0, t, b)
+        h = np.where(valeur <= 0, t, h)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = t - valeur / derivee
+        hors_intervalle = ~np.isfinite(newton) | (newton <= b) | (newton >= h)
+        suivant = np.where(hors_intervalle, (b + h) / 2, newton)
+
+        idx = np.flatnonzero(actif)
+        bas[idx], haut[idx], taux[idx] = b, h, suivant
+        actif[idx[(np.abs(suivant - t) < tolerance) | (h - b < tolerance)]] = False
+
+    return taux
+
+
+def indicateurs_investissement(prix, loyers, params=None, taux_annuel=None, duree_annees=None):
+    """
+    Calcule tous les indicateurs d'investissement pour un lot d'annonces
+
+    Args:
+        prix (array-like): Prix de vente
+        loyers (array-like): Loyers mensuels estimés (NaN si inconnus)
+        params (dict, optional): Hypothèses (voir INVESTMENT_PARAMS)
+        taux_annuel (float, optional): Taux du prêt (défaut: LOAN_PARAMS)
+        duree_annees (int, optional): Durée du prêt (défaut: LOAN_PARAMS)
+
+    Returns:
+        dict: Tableaux 'rendement_brut', 'rendement_net', 'cash_on_cash', 'van', 'tri'
+              (fractions, sauf la VAN en euros). NaN lorsque le prix ou le loyer manque.
+    """
+    p = _parametres(params)
+    if taux_annuel is None:
+        taux_annuel = LOAN_PARAMS['interest_rate']
+    if duree_annees is None:
+        duree_annees = LOAN_PARAMS['loan_duration_years']
+
+    prix = np.asarray(prix, dtype=float)
+    loyers = np.asarray(loyers, dtype=float)
+    valides = (prix > 0) & np.isfinite(loyers)
+    prix_v = np.where(valides, prix, 1.0)
+    loyers_v = np.where(valides, loyers, 0.0)
+
+    cout_total = prix_v * (1 + p['acquisition_costs'])
+    loyer_net_annuel = 12 * loyers_v * (1 - p['operating_costs'])
+
+    # Rendement sur fonds propres : flux après mensualités / apport
+    apport = cout_total * p['down_payment']
+    mensualites = calculer_mensualites(cout_total - apport, taux_annuel, duree_annees)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cash_on_cash = np.where(apport > 0, (loyer_net_annuel - 12 * mensualites) / apport, np.nan)
+
+    flux = flux_de_tresorerie(prix_v, loyers_v, p)
+    resultats = {
+        'rendement_brut': 12 * loyers_v / prix_v,
+        'rendement_net': loyer_net_annuel / cout_total,
+        'cash_on_cash': cash_on_cash,
+        'van': van(flux, p['discount_rate'] / 100),
+        'tri': tri(flux)
+    }
+    return {nom: np.where(valides, valeurs, np.nan) for nom, valeurs in resultats.items()}
+
+
+def meilleurs_investissements(announcements, k=10, critere='tri', loyers_par_pieces=None,
+                              estimer_loyers=None, params=None, taille_lot=10000):
+    """
+    Retourne les k meilleures annonces selon un indicateur
+
+    Les annonces sont lues par lots (la source peut être un générateur) et seules
+    les k meilleures sont conservées dans un tas : la mémoire utilisée ne dépend
+    pas du nombre total d'annonces.
+
+    Args:
+        announcements (iterable): Annonces de vente
+        k (int): Nombre d'annonces à retourner
+        critere (str): Indicateur de indicateurs_investissement servant au classement
+        loyers_par_pieces (dict, optional): Loyer de référence par nombre de pièces,
+                                            utilisé si l'estimation individuelle manque
+        estimer_loyers (callable, optional): Loyers estimés d'un lot d'annonces, tableau aligné
+                                             avec NaN si inconnu (ex. RentModel.predict)
+        params (dict, optional): Hypothèses (voir INVESTMENT_PARAMS)
+        taille_lot (int): Nombre d'annonces évaluées à la fois
+
+    Returns:
+        list: Tuples (valeur de l'indicateur, annonce, indicateurs), du meilleur au moins bon
+    """
+    loyers_par_pieces = loyers_par_pieces or {}
+    tas = []
+    compteur = 0  # Départage les égalités sans comparer les annonces
+    iterateur = iter(announcements)
+
+    while True:
+        lot = list(islice(iterateur, taille_lot))
+        if not lot:
+            break
+        prix = [a.get('prix') if isinstance(a.get('prix'), (int, float)) else np.nan for a in lot]
+        loyers = np.array([loyers_par_pieces.get(a.get('pieces'), np.nan) for a in lot], dtype=float)
+        if estimer_loyers is not None:
+            estimes = np.asarray(estimer_loyers(lot), dtype=float)
+            loyers = np.where(np.isnan(estimes), loyers, estimes)
+        resultats = indicateurs_investissement(prix, loyers, params)
+
+        valeurs = resultats[critere]
+        for i in np.flatnonzero(np.isfinite(valeurs)):
+            compteur += 1
+            entree = (float(valeurs[i]), compteur, lot[i], {nom: float(v[i]) for nom, v in resultats.items()})
+            if len(tas) < k:
+                heapq.heappush(tas, entree)
+            elif entree[0] > tas[0][0]:
+                heapq.heapreplace(tas, entree)
+
+    return [(valeur, annonce, details) for valeur, _, annonce, details in sorted(tas, reverse=True)]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python investment.py <ventes.json> <locations.json> [k] [critere]")
+        print("Critères : rendement_brut, rendement_net, cash_on_cash, van, tri (défaut)")
+        sys.exit(1)
+
+    from display_ads import calculate_stats_par_pieces, format_price, load_announcements
+    from analysis_context import AnalysisContext
+    from rent_model import get_rent_model
+
+    ventes = load_announcements(sys.argv[1]) or []
+    locations = load_announcements(sys.argv[2]) or []
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    critere = sys.argv[4] if len(sys.argv) > 4 else 'tri'
+    loyers = AnalysisContext.moyennes_depuis_stats(calculate_stats_par_pieces(locations))
+    modele = get_rent_model(locations)
+
+    print(f"\n{'='*100}")
+    print(f"MEILLEURS INVESTISSEMENTS ({critere})")
+    print(f"{'='*100}")
+    print(f"{'ID':<6} | {'Localisation':<25} | {'Prix':<12} | {'Brut':<7} | {'Net':<7} | {'Cash/cash':<9} | {'VAN':<12} | TRI")
+    print("-" * 100)
+    for _, annonce, d in meilleurs_investissements(ventes, k, critere, loyers_par_pieces=loyers,
+                                                   estimer_loyers=modele.predict if modele else None):
+        print(f"{annonce.get('id', 'N/A'):<6} | {str(annonce.get('localisation', 'N/A'))[:25]:<25} | "
+              f"{format_price(annonce['prix']):<12} | {d['rendement_brut']:<7.2%} | {d['rendement_net']:<7.2%} | "
+              f"{d['cash_on_cash']:<9.2%} | {format_price(int(d['van'])):<12} | {d['tri']:.2%}")
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Capture des réponses JSON de l'API de recherche pendant le chargement d'une page
+
+Le site charge ses résultats depuis sa propre API de recherche (/finder/search).
+Avec SCRAPER_CONFIG['network_capture'], scraper.setup_driver active le journal
+de performance de Chrome (événements réseau du protocole DevTools) et
+scraper.download_page relit, après le chargement, le corps des réponses dont
+l'URL correspond à SCRAPER_CONFIG['api_url_pattern'] (Network.getResponseBody).
+
+Les réponses capturées sont jointes au HTML de la page dans un bloc
+<script id="lbc-api-capture">, si bien que le contenu reste une chaîne HTML
+pour toute la chaîne de collecte (nouvelles tentatives, archive, relecture).
+extract_listings lit ce bloc en priorité : prix, surface, pièces, date et
+coordonnées y sont des valeurs exactes, sans ré-analyse de texte. Le parseur
+DOM (extract_ads.parse_announcements) ne sert plus qu'en l'absence de capture.
+
+Démonstration sur une page locale qui charge ses annonces par XHR :
+    python network_capture.py demo
+"""
+
+import base64
+import json
+import re
+import sys
+import threading
+
+from config import SCRAPER_CONFIG
+
+CAPTURE_ID = 'lbc-api-capture'
+_BLOC = re.compile(r'<script[^>]*id="' + CAPTURE_ID + r'"[^>]*>(.*?)</script>', re.S)
+
+
+def enable_capture(chrome_options):
+    """Active le journal de performance (événements réseau) sur des options Chrome"""
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return chrome_options
+
+
+def collect_responses(driver, url_pattern=None):
+    """
+    Relit les réponses JSON de l'API de recherche reçues par le navigateur
+
+    Le journal de performance est vidé à chaque lecture : seules les réponses
+    reçues depuis l'appel précédent sont retournées.
+
+    Args:
+        driver: Navigateur créé par scraper.setup_driver(capture=True)
+        url_pattern (str, optional): Motif des URL capturées (défaut: SCRAPER_CONFIG['api_url_pattern'])
+
+    Returns:
+        list: Corps JSON décodés, dans l'ordre de réception
+    """
+    motif = re.compile(url_pattern or SCRAPER_CONFIG['api_url_pattern'])
+    requetes = []
+    for entree in driver.get_log('performance'):
+        try:
+            message = json.loads(entree['message'])['message']
+        except (KeyError, ValueError):
+            continue
+        if message.get('method') != 'Network.responseReceived':
+            continue
+        reponse = message['params']['response']
+        if motif.search(reponse.get('url', '')) and 'json' in reponse.get('mimeType', ''):
+            requetes.append(message['params']['requestId'])
+
+    payloads = []
+    for request_id in requetes:
+        try:
+            corps = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            texte = base64.b64decode(corps['body']).decode('utf-8') if corps.get('base64Encoded') else corps['body']
+            payloads.append(json.loads(texte))
+        except Exception as e:
+            # Corps déjà libéré par le navigateur ou réponse non JSON : le DOM servira de repli
+            print(f"Réponse de l'API illisible ({request_id}) : {e}")
+    return payloads
+
+
+def embed_payloads(content, payloads):
+    """Joint les réponses capturées au HTML de la page"""
+    if not payloads:
+        return content
+    donnees = json.dumps(payloads, ensure_ascii=False).replace('</', '<\\/')
+    bloc = f'<script id="{CAPTURE_ID}" type="application/json">{donnees}</script>'
+    fin = content.rfind('</body>')
+    return content[:fin] + bloc + content[fin:] if fin >= 0 else content + bloc
+
+
+def captured_payloads(content):
+    """Réponses de l'API jointes à une page, ou None si la page n'en contient pas"""
+    bloc = _BLOC.search(content)
+    if not bloc:
+        return None
+    try:
+        return json.loads(bloc.group(1))
+    except ValueError as e:
+        print(f"Capture réseau illisible : {e}")
+        return None
+
+
+def _nombre(valeur):
+    if isinstance(valeur, list):
+        valeur = valeur[0] if valeur else None
+    if isinstance(valeur, (int, float)):
+        return valeur
+    try:
+        return int(float(str(valeur).replace(',', '.')))
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_api_ad(ad):
+    """
+    Convertit une annonce de l'API de recherche au format des annonces extraites
+
+    Returns:
+        dict: Annonce ('prix', 'localisation', 'description', 'surface_m2', 'prix_m2',
+              'pieces', 'url', 'date_publication', 'latitude', 'longitude'), ou None
+              si un champ requis manque (mêmes règles que extract_ads)
+    """
+    attributs = {a.get('key'): a.get('value') for a in ad.get('attributes') or [] if isinstance(a, dict)}
+    lieu = ad.get('location') or {}
+    url = ad.get('url') or (f"{SCRAPER_CONFIG['base_url']}/ad/{ad['list_id']}" if ad.get('list_id') else None)
+    if url and not url.startswith('http'):
+        url = SCRAPER_CONFIG['base_url'] + url
+    data = {
+        'id': str(ad.get('list_id', '')),
+        'prix': _nombre(ad.get('price')),
+        'localisation': ' '.join(str(v) for v in (lieu.get('city'), lieu.get('zipcode')) if v) or None,
+        'description': ad.get('subject'),
+        'surface_m2': _nombre(attributs.get('square')),
+        'prix_m2': None,
+        'pieces': _nombre(attributs.get('rooms')),
+        'url': url,
+        'date_publication': (ad.get('first_publication_date') or '')[:10] or None
+    }
+    if data['prix'] and data['surface_m2']:
+        data['prix_m2'] = round(data['prix'] / data['surface_m2'])
+    if isinstance(lieu.get('lat'), (int, float)) and isinstance(lieu.get('lng'), (int, float)):
+        data['latitude'], data['longitude'] = lieu['lat'], lieu['lng']
+    if any(data[champ] is None for champ in ('prix', 'localisation', 'description', 'url')):
+        return None
+    return data
+
+
+def extract_listings(content, reference_date=None):
+    """
+    Annonces d'une page : réponses de l'API capturées si présentes, sinon parseur DOM
+
+    Args:
+        content (str): Contenu HTML (éventuellement avec capture réseau)
+        reference_date (date, optional): Jour du téléchargement (dates relatives du DOM)
+
+    Returns:
+        tuple: (annonces uniques, nombre d'annonces lues, source : 'api' ou 'dom')
+    """
+    payloads = captured_payloads(content)
+    if payloads:
+        brutes = [ad for payload in payloads if isinstance(payload, dict) for ad in payload.get('ads') or []]
+        annonces = {}
+        for ad in brutes:
+            annonce = normalize_api_ad(ad)
+            if annonce:
+                annonces.setdefault(annonce['url'], annonce)
+        if annonces:
+            annonces = list(annonces.values())
+            for i, annonce in enumerate(annonces, 1):
+                annonce['id'] = str(i)
+            return annonces, len(brutes), 'api'
+
+    from extract_ads import parse_announcements
+    annonces, cartes, _ = parse_announcements(content, reference_date)
+    return annonces, cartes, 'dom'
+
+
+def _serveur_demo():
+    """
+    Page locale qui charge ses annonces par XHR, comme le site : GET / renvoie une
+    page vide dont le script appelle /finder/search puis affiche les cartes
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    ads = [{'list_id': 3000000 + i, 'subject': f"Maison {i % 4 + 2} pièces",
+            'url': f"https://www.leboncoin.fr/ad/ventes_immobilieres/{3000000 + i}",
+            'price': [150000 + 5000 * i], 'first_publication_date': '2026-10-18 09:30:00',
+            'location': {'city': 'Albi', 'zipcode': '81000', 'lat': 43.92 + i / 1000, 'lng': 2.14},
+            'attributes': [{'key': 'square', 'value': str(60 + i)}, {'key': 'rooms', 'value': str(i % 4 + 2)}]}
+           for i in range(30)]
+    page = ("<html><body><div id='resultats'></div><script>"
+            "fetch('/finder/search', {method: 'POST', body: '{}'}).then(r => r.json()).then(d => {"
+            "  document.getElementById('resultats').innerHTML = d.ads.map(a =>"
+            "    `<div class='adcard_demo'><a href='${a.url}'>${a.subject}</a>"
+            "     <p data-test-id='price'>${a.price[0]} €</p><p data-test-id='city'>${a.location.city}</p></div>`).join('');"
+            "});</script></body></html>")
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, corps, content_type):
+            data = corps.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._send(page, 'text/html; charset=utf-8')
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            self._send(json.dumps({'total': len(ads), 'ads': ads}), 'application/json')
+
+        def log_message(self, format, *args):
+            pass
+
+    serveur = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'demo':
+        print("Usage: python network_capture.py demo")
+        sys.exit(1)
+
+    from scraper import download_page
+
+    serveur = _serveur_demo()
+    url = f"http://127.0.0.1:{serveur.server_port}/"
+    content = download_page(url, capture=True)
+    serveur.shutdown()
+    if content is None:
+        sys.exit(1)
+    annonces, lues, source = extract_listings(content)
+    print(f"\n{len(annonces)} annonces sur {lues} lues (source : {source})")
+    for annonce in annonces[:5]:
+        print(f"  {annonce['prix']:>8} € | {annonce['surface_m2']} m² | {annonce['pieces']} p. | "
+              f"{annonce['localisation']} ({annonce.get('latitude')}, {annonce.get('longitude')}) | {annonce['url']}")
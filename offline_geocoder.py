@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Géolocalisation hors ligne à partir d'un index des communes françaises
+
+Le fichier data/communes_fr.csv (code_postal, nom_commune, latitude, longitude) est
+chargé dans un index compact en mémoire :
+- recherche exacte par code postal
+- recherche par préfixe sur les noms, insensible aux accents et à la casse (bisect)
+
+Le fichier livré avec le projet ne contient que les principales communes ; la base
+complète se génère à partir du fichier officiel des communes (data.gouv.fr) :
+
+    python offline_geocoder.py build communes-departement-region.csv
+"""
+
+import csv
+import os
+import sys
+from array import array
+from bisect import bisect_left
+
+from ad_index import normalize_text
+from config import GEOCODING_CONFIG
+
+
+def _normalize_name(name):
+    """Normalise un nom de commune ('Saint-Juéry' -> 'saint juery')"""
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in normalize_text(name)).split())
+
+
+class OfflineGeocoder:
+    """Index en mémoire des communes : code postal -> communes, nom normalisé -> communes"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str, optional): Fichier CSV des communes (défaut: GEOCODING_CONFIG['offline_index_path'])
+        """
+        self.path = path or GEOCODING_CONFIG['offline_index_path']
+        if not os.path.isabs(self.path):
+            self.path = os.path.join(os.path.dirname(os.path.abspath(__file__)), self.path)
+
+        self.names = []
+        self.postcodes = []
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self._by_postcode = {}
+        self._sorted_keys = []  # (nom normalisé, position), triés pour la recherche par préfixe
+
+        if os.path.exists(self.path):
+            self._load()
+
+    def _load(self):
+        """Charge le fichier CSV et construit les index"""
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                try:
+                    lat, lon = float(row['latitude']), float(row['longitude'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                pos = len(self.names)
+                self.names.append(row['nom_commune'])
+                self.postcodes.append(row['code_postal'])
+                self.latitudes.append(lat)
+                self.longitudes.append(lon)
+                if row['code_postal']:
+                    self._by_postcode.setdefault(row['code_postal'], []).append(pos)
+
+        self._sorted_keys = sorted((_normalize_name(name), pos) for pos, name in enumerate(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _entry(self, pos, input_type):
+        """Retourne une commune au format de geocoding.get_city_coordinates"""
+        return {
+            'name': self.names[pos],
+            'postcode': self.postcodes[pos],
+            'latitude': self.latitudes[pos],
+            'longitude': self.longitudes[pos],
+            'input_type': input_type
+        }
+
+    def by_postcode(self, postcode):
+        """Communes ayant exactement ce code postal"""
+        return [self._entry(pos, 'postal_code') for pos in self._by_postcode.get(postcode, [])]
+
+    def search_prefix(self, prefix, limit=10):
+        """
+        Communes dont le nom commence par le préfixe (insensible aux accents)
+
+        Args:
+            prefix (str): Début du nom recherché ('st juery' ne correspond pas : utiliser 'saint')
+            limit (int): Nombre maximum de résultats
+
+        Returns:
+            list: Communes correspondantes, dans l'ordre alphabétique
+        """
+        key = _normalize_name(prefix)
+        if not key:
+            return []
+        results = []
+        start = bisect_left(self._sorted_keys, (key, -1))
+        for name, pos in self._sorted_keys[start:]:
+            if not name.startswith(key) or len(results) >= limit:
+                break
+            results.append(self._entry(pos, 'city_name'))
+        return results
+
+    def lookup_commune(self, ville, code_postal=None):
+        """
+        Résout une commune à partir de son nom et, si connu, de son code postal
+
+        Un code postal partagé par plusieurs communes est départagé par le nom ;
+        sans correspondance de nom, la première commune du code postal est retenue.
+
+        Returns:
+            dict: Localisation, ou None si la commune est inconnue
+        """
+        if code_postal:
+            matches = self._by_postcode.get(code_postal, [])
+            key = _normalize_name(ville or '')
+            for pos in matches:
+                if _normalize_name(self.names[pos]) == key:
+                    return self._entry(pos, 'postal_code')
+            if matches:
+                return self._entry(matches[0], 'postal_code')
+        return self.lookup(ville) if ville else None
+
+    def lookup(self, location_input):
+        """
+        Résout une entrée sans ambiguïté : code postal connu, ou nom exact d'une seule commune
+
+        Returns:
+            dict: Localisation, ou None si l'entrée est inconnue ou ambiguë
+        """
+        location_input = location_input.strip()
+        if location_input.isdigit():
+            matches = self.by_postcode(location_input)
+            return matches[0] if matches else None
+
+        key = _normalize_name(location_input)
+        start = bisect_left(self._sorted_keys, (key, -1))
+        exact = []
+        for name, pos in self._sorted_keys[start:]:
+            if name != key:
+                break
+            exact.append(pos)
+        if len(exact) == 1:
+            return self._entry(exact[0], 'city_name')
+        return None
+
+
+_offline = None
+
+
+def get_offline_geocoder():
+    """Retourne l'index hors ligne partagé (chargé au premier appel)"""
+    global _offline
+    if _offline is None:
+        _offline = OfflineGeocoder()
+    return _offline
+
+
+def build_index(source_path, output_path=None):
+    """
+    Génère le fichier de l'index à partir du fichier officiel des communes
+
+    Le fichier source doit contenir les colonnes code_postal, latitude, longitude et
+    nom_commune_complet (ou nom_commune), comme communes-departement-region.csv.
+
+    Args:
+        source_path (str): Fichier CSV source
+        output_path (str, optional): Fichier généré (défaut: GEOCODING_CONFIG['offline_index_path'])
+
+    Returns:
+        int: Nombre de communes écrites
+    """
+    output_path = output_path or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                              GEOCODING_CONFIG['offline_index_path'])
+    seen = set()
+    rows = []
+    with open(source_path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            name = row.get('nom_commune_complet') or row.get('nom_commune')
+            # Communes sans code postal : gardées pour la recherche par nom uniquement
+            postcode = (row.get('code_postal') or '').strip()
+            postcode = postcode.zfill(5) if postcode else ''
+            if not name or not row.get('latitude') or not row.get('longitude'):
+                continue
+            if (postcode, name) in seen:
+                continue
+            seen.add((postcode, name))
+            rows.append((postcode, name, round(float(row['latitude']), 5), round(float(row['longitude']), 5)))
+
+    rows.sort()
+    with open(output_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['code_postal', 'nom_commune', 'latitude', 'longitude'])
+        writer.writerows(rows)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == 'build':
+        count = build_index(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+        print(f"{count} communes enregistrées dans l'index hors ligne")
+    elif len(sys.argv) >= 2:
+        geocoder = get_offline_geocoder()
+        query = ' '.join(sys.argv[1:])
+        result = geocoder.lookup(query)
+        matches = [result] if result else geocoder.search_prefix(query)
+        for match in matches:
+            print(f"{match['name']} ({match['postcode']}) - {match['latitude']}, {match['longitude']}")
+        if not matches:
+            print(f"Aucune commune trouvée pour : {query}")
+    else:
+        print("Usage: python offline_geocoder.py <ville ou code postal>")
+        print("       python offline_geocoder.py build <communes-departement-region.csv> [sortie.csv]")
+        sys.exit(1)
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Archive des pages HTML brutes et relecture hors ligne
+
+Chaque page téléchargée par crawler.fetch_unit est ajoutée à l'archive, jamais
+réécrite : elle est compressée en un membre gzip autonome, ajouté à la fin du
+segment du mois (pages-AAAA-MM.gz dans ARCHIVE_CONFIG['dir']). Un index SQLite
+donne pour chaque page son URL, sa recherche, sa catégorie, sa date de
+téléchargement et sa position dans le segment (décalage, longueur) : une page se
+relit sans décompresser le reste du segment, et un segment entier reste lisible
+avec zcat.
+
+Le mode relecture ré-extrait les annonces des pages archivées, sans navigateur ni
+réseau, dans un pool de processus (un par cœur), puis recalcule les statistiques.
+Les dates relatives (« Hier », « Il y a 3 jours ») sont comptées depuis le jour de
+téléchargement de chaque page. Une annonce vue dans plusieurs pages garde sa
+version la plus récente.
+
+Usage :
+    python page_archive.py list
+    python page_archive.py replay [--depuis AAAA-MM-JJ] [--jusqu AAAA-MM-JJ]
+                                  [--recherche id] [--sortie dossier] [--workers n]
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from ad_index import ad_id
+from config import ARCHIVE_CONFIG
+
+
+class PageArchive:
+    """Archive en ajout seul des pages HTML, indexée par URL, recherche et date"""
+
+    def __init__(self, root=None, compression_level=None):
+        """
+        Args:
+            root (str, optional): Dossier de l'archive (défaut: ARCHIVE_CONFIG['dir'])
+            compression_level (int, optional): Niveau gzip des nouvelles pages
+        """
+        self.root = root or ARCHIVE_CONFIG['dir']
+        self.compression_level = compression_level or ARCHIVE_CONFIG['compression_level']
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, 'index.sqlite'), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " id INTEGER PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " search TEXT,"  # Recherche qui a produit la page (voir crawler.make_unit)
+            " category TEXT,"
+            " furnished INTEGER,"  # NULL si non précisé
+            " fetched_at REAL NOT NULL,"
+            " segment TEXT NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " length INTEGER NOT NULL,"  # Octets compressés
+            " size INTEGER NOT NULL)"  # Octets du HTML
+        )
+        for colonne in ('url', 'search', 'fetched_at'):
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS pages_{colonne} ON pages ({colonne})")
+        self._db.commit()
+
+    def add(self, url, content, search=None, category=None, furnished=None, fetched_at=None):
+        """
+        Ajoute une page à l'archive
+
+        Args:
+            url (str): URL téléchargée
+            content (str): Contenu HTML
+            search (str, optional): Identifiant de la recherche
+            category (str, optional): 'vente' ou 'location'
+            furnished (bool, optional): Statut meublé de la recherche
+            fetched_at (float, optional): Date du téléchargement (défaut: maintenant)
+
+        Returns:
+            int: Identifiant de la page dans l'index
+        """
+        fetched_at = fetched_at or time.time()
+        brut = content.encode('utf-8')
+        membre = gzip.compress(brut, compresslevel=self.compression_level, mtime=0)
+        segment = time.strftime('pages-%Y-%m.gz', time.localtime(fetched_at))
+
+        with self._lock:
+            # Écriture unique en mode ajout : la position lue après l'écriture reste
+            # juste même si un autre processus ajoute au même segment
+            fd = os.open(os.path.join(self.root, segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, membre)
+                offset = os.lseek(fd, 0, os.SEEK_CUR) - len(membre)
+            finally:
+                os.close(fd)
+            curseur = self._db.execute(
+                "INSERT INTO pages (url, search, category, furnished, fetched_at, segment, offset, length, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, search, category, None if furnished is None else int(furnished),
+                 fetched_at, segment, offset, len(membre), len(brut))
+            )
+            self._db.commit()
+            return curseur.lastrowid
+
+    def records(self, since=None, until=None, search=None, url=None):
+        """
+        Pages de l'index, de la plus ancienne à la plus récente
+
+        Args:
+            since (datetime, optional): Téléchargées à partir de cette date
+            until (datetime, optional): Téléchargées avant cette date
+            search (str, optional): D'une seule recherche
+            url (str, optional): D'une seule URL
+
+        Returns:
+            list: dict par page ('id', 'url', 'search', 'category', 'furnished',
+                  'fetched_at', 'segment', 'offset', 'length', 'size')
+        """
+        conditions, valeurs = [], []
+        for condition, valeur in (("fetched_at >= ?", since and since.timestamp()),
+                                  ("fetched_at < ?", until and until.timestamp()),
+                                  ("search = ?", search), ("url = ?", url)):
+            if valeur is not None:
+                conditions.append(condition)
+                valeurs.append(valeur)
+        requete = "SELECT id, url, search, category, furnished, fetched_at, segment, offset, length, size FROM pages"
+        if conditions:
+            requete += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            lignes = self._db.execute(requete + " ORDER BY fetched_at, id", valeurs).fetchall()
+        colonnes = ('id', 'url', 'search', 'category', 'furnished', 'fetched_at', 'segment', 'offset', 'length', 'size')
+        records = [dict(zip(colonnes, ligne)) for ligne in lignes]
+        for record in records:
+            if record['furnished'] is not None:
+                record['furnished'] = bool(record['furnished'])
+        return records
+
+    def read(self, record):
+        """Contenu HTML d'une page de l'index"""
+        return _lire(self.root, record)
+
+    def summary(self):
+        """Pages, volume et période par recherche"""
+        with self._lock:
+            lignes = self._db.execute(
+                "SELECT search, category, COUNT(*), SUM(size), SUM(length), MIN(fetched_at), MAX(fetched_at), MIN(url)"
+                " FROM pages GROUP BY search, category ORDER BY MAX(fetched_at) DESC"
+            ).fetchall()
+        return [{'search': l[0], 'category': l[1], 'pages': l[2], 'size': l[3], 'length': l[4],
+                 'first': l[5], 'last': l[6], 'url': l[7]} for l in lignes]
+
+
+def _lire(root, record):
+    with open(os.path.join(root, record['segment']), 'rb') as f:
+        f.seek(record['offset'])
+        return gzip.decompress(f.read(record['length'])).decode('utf-8')
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_page_archive():
+    """Retourne l'archive partagée (créée au premier appel)"""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = PageArchive()
+        return _archive
+
+
+def _extraire_lot(root, records):
+    """Extrait les annonces d'un lot de pages (exécuté dans un processus de relecture)"""
+    from network_capture import extract_listings
+
+    sortie = []
+    for record in records:
+        try:
+            content = _lire(root, record)
+            annonces, cartes, _ = extract_listings(content, date.fromtimestamp(record['fetched_at']))
+        except Exception as e:
+            sortie.append((record['id'], None, 0, str(e)))
+            continue
+        for annonce in annonces:
+            annonce['category'] = record['category']
+            if record['furnished'] is not None:
+                annonce['furnished'] = record['furnished']
+        sortie.append((record['id'], annonces, cartes, None))
+    return sortie
+
+
+def replay(archive=None, since=None, until=None, search=None, workers=None, batch=None, verbose=True):
+    """
+    Ré-extrait les annonces des pages archivées, sans navigateur ni réseau
+
+    Args:
+        archive (PageArchive, optional): Archive relue (défaut: archive partagée)
+        since (datetime, optional): Pages téléchargées à partir de cette date
+        until (datetime, optional): Pages téléchargées avant cette date
+        search (str, optional): Pages d'une seule recherche
+        workers (int, optional): Processus d'extraction (défaut: nombre de cœurs)
+        batch (int, optional): Pages par lot envoyé à un processus
+        verbose (bool): Afficher l'avancement
+
+    Returns:
+        dict: 'ventes' et 'locations' (annonces dédoublonnées, version la plus récente),
+              'pages', 'erreurs', 'cartes', 'octets' (HTML relu) et 'elapsed' (secondes)
+    """
+    archive = archive or get_page_archive()
+    workers = workers or ARCHIVE_CONFIG['replay_workers'] or os.cpu_count() or 1
+    batch = batch or ARCHIVE_CONFIG['replay_batch']
+    start = time.perf_counter()
+    records = archive.records(since=since, until=until, search=search)
+    rangs = {record['id']: rang for rang, record in enumerate(records)}
+
+    # Lots de pages voisines dans un même segment, pour des lectures séquentielles
+    ordre = sorted(records, key=lambda r: (r['segment'], r['offset']))
+    lots = [ordre[i:i + batch] for i in range(0, len(ordre), batch)]
+    extraits = [None] * len(records)
+    erreurs = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for fait, lot in enumerate(executor.map(_extraire_lot, [archive.root] * len(lots), lots), 1):
+            for record_id, annonces, cartes, erreur in lot:
+                extraits[rangs[record_id]] = (annonces, cartes)
+                if erreur:
+                    erreurs += 1
+                    print(f"Page {record_id} illisible : {erreur}")
+            if verbose and (fait % 20 == 0 or fait == len(lots)):
+                print(f"{min(fait * batch, len(records))}/{len(records)} pages relues")
+
+    # Pages parcourues de la plus ancienne à la plus récente : la dernière version d'une annonce l'emporte
+    annonces = {}
+    for extrait in extraits:
+        if extrait and extrait[0]:
+            for annonce in extrait[0]:
+                annonces[(annonce['category'], ad_id(annonce))] = annonce
+    return {
+        'ventes': [a for (categorie, _), a in annonces.items() if categorie == 'vente'],
+        'locations': [a for (categorie, _), a in annonces.items() if categorie == 'location'],
+        'pages': len(records),
+        'erreurs': erreurs,
+        'cartes': sum(e[1] for e in extraits if e),
+        'octets': sum(r['size'] for r in records),
+        'elapsed': time.perf_counter() - start
+    }
+
+
+def _option(nom, defaut=None):
+    if nom in sys.argv and sys.argv.index(nom) + 1 < len(sys.argv):
+        return sys.argv[sys.argv.index(nom) + 1]
+    return defaut
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('list', 'replay'):
+        print("Usage: python page_archive.py list")
+        print("       python page_archive.py replay [--depuis AAAA-MM-JJ] [--jusqu AAAA-MM-JJ] "
+              "[--recherche id] [--sortie dossier] [--workers n]")
+        sys.exit(1)
+
+    archive = get_page_archive()
+    if sys.argv[1] == 'list':
+        lignes = archive.summary()
+        print(f"{'Recherche':<16} | {'Catégorie':<9} | {'Pages':>6} | {'HTML':>9} | {'Archivé':>9} | "
+              f"{'Première':<16} | {'Dernière':<16} | URL")
+        print("-" * 120)
+        for l in lignes:
+            print(f"{l['search'] or '-':<16} | {l['category'] or '-':<9} | {l['pages']:>6} | "
+                  f"{l['size'] / 1e6:>7.1f}Mo | {l['length'] / 1e6:>7.1f}Mo | "
+                  f"{datetime.fromtimestamp(l['first']):%Y-%m-%d %H:%M} | "
+                  f"{datetime.fromtimestamp(l['last']):%Y-%m-%d %H:%M} | {l['url']}")
+        if lignes:
+            taille = sum(l['size'] for l in lignes)
+            compresse = sum(l['length'] for l in lignes)
+            print(f"\n{sum(l['pages'] for l in lignes)} pages, {taille / 1e6:.1f} Mo de HTML "
+                  f"archivés en {compresse / 1e6:.1f} Mo (x{taille / max(compresse, 1):.1f})")
+        sys.exit(0)
+
+    from calculate_average import calculate_sale_stats_from_data, display_statistics
+    from rental_stats import calculate_rental_stats_from_data
+
+    depuis, jusqu = _option('--depuis'), _option('--jusqu')
+    resultat = replay(archive,
+                      since=datetime.fromisoformat(depuis) if depuis else None,
+                      until=datetime.fromisoformat(jusqu) if jusqu else None,
+                      search=_option('--recherche'),
+                      workers=int(_option('--workers', 0)) or None)
+    duree = max(resultat['elapsed'], 1e-9)
+    print(f"\n{resultat['pages']} pages ({resultat['octets'] / 1e6:.1f} Mo) relues en {duree:.1f}s : "
+          f"{resultat['pages'] / duree:.1f} pages/s, {resultat['octets'] / 1e6 / duree:.1f} Mo/s"
+          + (f", {resultat['erreurs']} illisibles" if resultat['erreurs'] else ""))
+    print(f"{resultat['cartes']} cartes, {len(resultat['ventes'])} ventes et "
+          f"{len(resultat['locations'])} locations distinctes")
+
+    sortie = _option('--sortie', 'replay_output')
+    os.makedirs(sortie, exist_ok=True)
+    for nom in ('ventes', 'locations'):
+        with open(os.path.join(sortie, f'{nom}.json'), 'w', encoding='utf-8') as f:
+            json.dump(resultat[nom], f, ensure_ascii=False, indent=2)
+    print(f"Annonces enregistrées dans {sortie}/")
+
+    if resultat['ventes']:
+        display_statistics(calculate_sale_stats_from_data(resultat['ventes']), "Ventes")
+    if resultat['locations']:
+        display_statistics(calculate_rental_stats_from_data(resultat['locations']), "Locations")
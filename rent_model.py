@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Modèle hédonique des loyers
+
+Régression linéaire (moindres carrés NumPy) du loyer mensuel des annonces de
+location sur :
+- la surface et le nombre de pièces
+- le statut meublé
+- la ville (une indicatrice par ville suffisamment représentée, pénalisée en ridge)
+- en option, la distance au centre de la zone étudiée ('distance_centre')
+
+Les coefficients sont mis en cache par (version du jeu de locations, variables) :
+un même jeu de données n'est ajusté qu'une fois (cache LRU de
+RENT_MODEL_CONFIG['cache_size'] modèles). L'estimation de toutes les
+annonces de vente est un seul produit matriciel.
+"""
+
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ad_index import normalize_text, parse_localisation
+from config import RENT_MODEL_CONFIG
+from enrichment import colonne_numerique
+from spatial_index import haversine_km, resoudre_coordonnees
+
+
+def _ville(annonce):
+    """Nom de ville normalisé d'une annonce ('Saint-Juéry 81160' -> 'saint-juery')"""
+    return normalize_text(parse_localisation(annonce.get('localisation'))[0])
+
+
+def dataset_version(rentals):
+    """Empreinte des champs utilisés par le modèle : change dès qu'une location change"""
+    h = hashlib.sha1()
+    for a in rentals:
+        h.update(json.dumps([a.get('prix'), a.get('surface_m2'), a.get('pieces'), a.get('furnished'),
+                             a.get('localisation'), a.get('latitude'), a.get('longitude')],
+                            ensure_ascii=False, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+class RentModel:
+    """Modèle linéaire du loyer mensuel ajusté sur des annonces de location"""
+
+    def __init__(self, features=None, params=None):
+        """
+        Args:
+            features (tuple, optional): Variables du modèle (défaut: RENT_MODEL_CONFIG['features'])
+            params (dict, optional): Paramètres d'ajustement (voir RENT_MODEL_CONFIG)
+        """
+        self.params = dict(RENT_MODEL_CONFIG)
+        self.params.update(params or {})
+        self.features = tuple(features or self.params['features'])
+        self.coefficients = None
+        self.colonnes = []
+        self.villes = []
+        self.moyennes = {}
+        self.centre = None
+
+    def _variables(self, announcements):
+        """Variables numériques brutes (NaN si inconnues)"""
+        variables = {}
+        if 'surface' in self.features:
+            variables['surface'] = colonne_numerique(announcements, 'surface_m2')
+        if 'pieces' in self.features:
+            variables['pieces'] = colonne_numerique(announcements, 'pieces')
+        if 'furnished' in self.features:
+            variables['furnished'] = np.array(
+                [float(a['furnished']) if isinstance(a.get('furnished'), bool) else np.nan for a in announcements],
+                dtype=float
+            )
+        if 'distance_centre' in self.features:
+            lat, lon = resoudre_coordonnees(announcements)
+            if self.centre is None:
+                localisees = np.isfinite(lat) & np.isfinite(lon)
+                self.centre = ((float(np.mean(lat[localisees])), float(np.mean(lon[localisees])))
+                               if localisees.any() else (0.0, 0.0))
+            variables['distance_centre'] = haversine_km(self.centre[0], self.centre[1], lat, lon)
+        return variables
+
+    def design_matrix(self, announcements):
+        """
+        Matrice des variables explicatives (constante, variables, indicatrices de ville)
+
+        Les valeurs inconnues sont remplacées par la moyenne d'apprentissage ; une
+        ville absente de l'apprentissage n'active aucune indicatrice.
+        """
+        colonnes = [np.ones(len(announcements))]
+        for nom, valeurs in self._variables(announcements).items():
+            colonnes.append(np.where(np.isfinite(valeurs), valeurs, self.moyennes.get(nom, 0.0)))
+        if 'ville' in self.features and self.villes:
+            positions = {ville: i for i, ville in enumerate(self.villes)}
+            par_localisation = {}  # Une seule analyse par texte de localisation distinct
+            lignes, villes = [], []
+            for i, annonce in enumerate(announcements):
+                texte = annonce.get('localisation')
+                if texte not in par_localisation:
+                    par_localisation[texte] = positions.get(_ville(annonce))
+                j = par_localisation[texte]
+                if j is not None:
+                    lignes.append(i)
+                    villes.append(j)
+            indicatrices = np.zeros((len(announcements), len(self.villes)))
+            indicatrices[lignes, villes] = 1.0
+            colonnes.append(indicatrices)
+        return np.column_stack(colonnes)
+
+    def fit(self, rentals):
+        """
+        Ajuste le modèle sur des annonces de location (celles sans loyer sont ignorées)
+
+        Returns:
+            RentModel: Le modèle ajusté
+        """
+        rentals = [a for a in rentals if isinstance(a.get('prix'), (int, float)) and a['prix'] > 0]
+        loyers = colonne_numerique(rentals, 'prix')
+
+        self.centre = None
+        self.moyennes = {nom: float(np.nanmean(v)) if np.isfinite(v).any() else 0.0
+                         for nom, v in self._variables(rentals).items()}
+
+        if 'ville' in self.features:
+            comptes = {}
+            for annonce in rentals:
+                ville = _ville(annonce)
+                if ville:
+                    comptes[ville] = comptes.get(ville, 0) + 1
+            self.villes = sorted(v for v, n in comptes.items() if n >= self.params['min_city_count'])
+
+        X = self.design_matrix(rentals)
+        nb_villes = len(self.villes)
+        self.colonnes = ['constante'] + list(self.moyennes) + [f"ville={v}" for v in self.villes]
+
+        # Ridge sur les indicatrices de ville : lignes supplémentaires sqrt(lambda) * I
+        if nb_villes:
+            penalite = np.zeros((nb_villes, X.shape[1]))
+            penalite[:, -nb_villes:] = np.sqrt(self.params['city_ridge']) * np.eye(nb_villes)
+            X = np.vstack([X, penalite])
+            loyers = np.concatenate([loyers, np.zeros(nb_villes)])
+
+        self.coefficients = np.linalg.lstsq(X, loyers, rcond=None)[0]
+        return self
+
+    def predict(self, announcements):
+        """
+        Estime le loyer mensuel de chaque annonce (un seul produit matriciel)
+
+        Returns:
+            numpy.ndarray: Loyers estimés, NaN si l'estimation n'est pas positive
+        """
+        if self.coefficients is None or not len(announcements):
+            return np.full(len(announcements), np.nan)
+        loyers = self.design_matrix(announcements) @ self.coefficients
+        return np.where(loyers > 0, np.round(loyers, 2), np.nan)
+
+    def to_dict(self):
+        """Coefficients du modèle par variable"""
+        return dict(zip(self.colonnes, (float(c) for c in self.coefficients)))
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_rent_model(rentals, features=None, params=None):
+    """
+    Retourne le modèle ajusté sur ces locations, depuis le cache si le jeu de données est inchangé
+
+    Returns:
+        RentModel: Modèle ajusté, ou None si les locations sont trop peu nombreuses
+    """
+    model = RentModel(features=features, params=params)
+    rentals = [a for a in (rentals or []) if isinstance(a.get('prix'), (int, float)) and a['prix'] > 0]
+    if len(rentals) < model.params['min_rentals']:
+        return None
+
+    key = (dataset_version(rentals), model.features, tuple(sorted((params or {}).items())))
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = model.fit(rentals)
+        _cache.move_to_end(key)
+        while len(_cache) > RENT_MODEL_CONFIG['cache_size']:
+            _cache.popitem(last=False)
+        return _cache[key]
+
+
+def clear_cache():
+    """Oublie les modèles ajustés (les prochains appels les ajustent à nouveau)"""
+    with _cache_lock:
+        _cache.clear()
+
+
+def cross_validate(rentals, features=None, params=None, folds=None, seed=0):
+    """
+    Validation croisée en k blocs du modèle, comparée à la moyenne par nombre de pièces
+
+    Returns:
+        dict: Erreurs hors échantillon 'modele' et 'moyenne_par_pieces'
+              ('mae', 'rmse', 'mape' en fraction, 'r2'), et 'nombre' de locations évaluées
+    """
+    rentals = [a for a in rentals if isinstance(a.get('prix'), (int, float)) and a['prix'] > 0]
+    folds = folds or RENT_MODEL_CONFIG['cv_folds']
+    n = len(rentals)
+    if n < max(folds, 2):
+        return None
+
+    loyers = colonne_numerique(rentals, 'prix')
+    pieces = colonne_numerique(rentals, 'pieces')
+    blocs = np.array_split(np.random.default_rng(seed).permutation(n), folds)
+    predictions = {'modele': np.full(n, np.nan), 'moyenne_par_pieces': np.full(n, np.nan)}
+
+    for test in blocs:
+        masque = np.ones(n, dtype=bool)
+        masque[test] = False
+        apprentissage = [rentals[i] for i in np.flatnonzero(masque)]
+        evaluation = [rentals[i] for i in test]
+
+        predictions['modele'][test] = RentModel(features, params).fit(apprentissage).predict(evaluation)
+
+        # Référence actuelle : loyer moyen du même nombre de pièces
+        moyennes = {}
+        for p in np.unique(pieces[masque][np.isfinite(pieces[masque])]):
+            moyennes[p] = loyers[masque][pieces[masque] == p].mean()
+        predictions['moyenne_par_pieces'][test] = [moyennes.get(p, loyers[masque].mean()) for p in pieces[test]]
+
+    rapport = {'nombre': n}
+    for nom, prevu in predictions.items():
+        ok = np.isfinite(prevu)
+        erreurs = prevu[ok] - loyers[ok]
+        rapport[nom] = {
+            'mae': float(np.mean(np.abs(erreurs))),
+            'rmse': float(np.sqrt(np.mean(erreurs ** 2))),
+            'mape': float(np.mean(np.abs(erreurs) / loyers[ok])),
+            'r2': float(1 - np.sum(erreurs ** 2) / np.sum((loyers[ok] - loyers[ok].mean()) ** 2))
+        }
+    return rapport
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python rent_model.py <locations.json> [--distance-centre]")
+        sys.exit(1)
+
+    from display_ads import format_price, load_announcements
+
+    locations = load_announcements(sys.argv[1]) or []
+    features = RENT_MODEL_CONFIG['features']
+    if '--distance-centre' in sys.argv[2:]:
+        features = tuple(features) + ('distance_centre',)
+
+    model = get_rent_model(locations, features=features)
+    if model is None:
+        print(f"Pas assez d'annonces de location ({len(locations)}) pour ajuster le modèle")
+        sys.exit(1)
+
+    print("\nCoefficients du modèle (€/mois) :")
+    for nom, valeur in model.to_dict().items():
+        print(f"- {nom:<30} : {valeur:10.2f}")
+
+    rapport = cross_validate(locations, features=features)
+    if rapport:
+        print(f"\nValidation croisée ({RENT_MODEL_CONFIG['cv_folds']} blocs, {rapport['nombre']} locations) :")
+        print(f"{'Méthode':<20} | {'MAE':>10} | {'RMSE':>10} | {'MAPE':>7} | {'R²':>6}")
+        print("-" * 66)
+        for nom in ('modele', 'moyenne_par_pieces'):
+            r = rapport[nom]
+            print(f"{nom:<20} | {format_price(r['mae']):>10} | {format_price(r['rmse']):>10} | "
+                  f"{r['mape']:>7.1%} | {r['r2']:>6.3f}")
@@ -1,6 +1,8 @@
 import json
 from collections import defaultdict
 
+from ad_index import parse_localisation
+
 def format_price(price):
     """Formate un prix avec des espaces comme séparateurs de milliers"""
     return f"{price:,.2f} €".replace(',', ' ').replace('.', ',').replace(',00', '')
@@ -20,6 +22,29 @@ def calculate_rental_stats(json_file):
         with open(json_file, 'r', encoding='utf-8') as f:
             annonces = json.load(f)
         
+        return calculate_rental_stats_from_data(annonces)
+        
+    except FileNotFoundError:
+        print(f"Erreur: Le fichier {json_file} n'a pas été trouvé.")
+        return None
+    except json.JSONDecodeError:
+        print("Erreur: Le fichier JSON est mal formé.")
+        return None
+    except Exception as e:
+        print(f"Une erreur s'est produite lors du calcul des statistiques de location: {str(e)}")
+        return None
+
+def calculate_rental_stats_from_data(annonces):
+    """
+    Calcule les statistiques pour des annonces de location déjà chargées en mémoire
+    
+    Args:
+        annonces (list): Liste des annonces de location
+        
+    Returns:
+        dict: Dictionnaire contenant les statistiques de location
+    """
+    try:
         if not annonces:
             print("Aucune annonce de location trouvée dans le fichier.")
             return None
@@ -51,8 +76,9 @@ def calculate_rental_stats(json_file):
             prix_par_ville = defaultdict(list)
             for annonce in liste_annonces:
                 if 'prix' in annonce and annonce['prix'] is not None and 'localisation' in annonce:
-                    ville = annonce['localisation'].split()[0]
-                    prix_par_ville[ville].append(annonce['prix'])
+                    ville = parse_localisation(annonce['localisation'])[0]  # Nom complet, sans le code postal
+                    if ville:
+                        prix_par_ville[ville].append(annonce['prix'])
             
             moyennes_par_ville = {}
             for ville, prix_list in prix_par_ville.items():
@@ -85,12 +111,6 @@ def calculate_rental_stats(json_file):
             'non_meuble': stats_non_meublees
         }
         
-    except FileNotFoundError:
-        print(f"Erreur: Le fichier {json_file} n'a pas été trouvé.")
-        return None
-    except json.JSONDecodeError:
-        print("Erreur: Le fichier JSON est mal formé.")
-        return None
     except Exception as e:
         print(f"Une erreur s'est produite lors du calcul des statistiques de location: {str(e)}")
         return None
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Couche de résilience des téléchargements
+
+Chaque téléchargement passe par un ResilientFetcher qui :
+- impose un délai maximal par requête (SCRAPER_CONFIG['timeout'])
+- classe les erreurs en transitoires (délai dépassé, connexion coupée, HTTP 429
+  ou 5xx...) et définitives (URL invalide, HTTP 404, navigateur introuvable...)
+- retente les erreurs transitoires jusqu'à SCRAPER_CONFIG['max_retries'] fois,
+  avec un délai exponentiel tiré au hasard (« full jitter ») pour ne pas
+  synchroniser les threads
+- coupe un hôte dont le taux d'erreur s'envole (disjoncteur) : les requêtes
+  vers cet hôte échouent immédiatement pendant RESILIENCE_CONFIG['breaker_cooldown']
+  secondes, puis une requête d'essai décide de la réouverture
+- compte les appels, tentatives, nouvelles tentatives et rejets par hôte, pour
+  mesurer l'amplification des requêtes en charge (tentatives par appel)
+
+python resilience.py bench lance un serveur local instable et affiche ces compteurs.
+"""
+
+import random
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from http.client import HTTPException
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlparse
+
+from config import RESILIENCE_CONFIG, SCRAPER_CONFIG
+
+
+class FetchError(Exception):
+    """Échec d'un téléchargement après classement et nouvelles tentatives"""
+
+
+class TransientFetchError(FetchError):
+    """Erreur passagère : une nouvelle tentative peut réussir"""
+
+
+class PermanentFetchError(FetchError):
+    """Erreur définitive : inutile de retenter"""
+
+
+class CircuitOpenError(TransientFetchError):
+    """Requête refusée sans tentative : le disjoncteur de l'hôte est ouvert"""
+
+
+# Exceptions Selenium passagères (comparées par nom pour ne pas importer Selenium)
+_SELENIUM_TRANSITOIRES = {'TimeoutException', 'StaleElementReferenceException', 'NoSuchWindowException'}
+
+
+def is_transient(exc):
+    """
+    Classe une exception de téléchargement
+
+    Returns:
+        bool: True si l'erreur est passagère (à retenter), False si elle est définitive
+    """
+    if isinstance(exc, FetchError):
+        return isinstance(exc, TransientFetchError)
+    if isinstance(exc, HTTPError):
+        return exc.code in (408, 425, 429) or exc.code >= 500
+    if isinstance(exc, URLError):
+        return not isinstance(exc.reason, str) or 'unknown url type' not in exc.reason
+    if isinstance(exc, (TimeoutError, socket.timeout, ConnectionError, HTTPException)):
+        return True
+    nom = type(exc).__name__
+    if nom in _SELENIUM_TRANSITOIRES:
+        return True
+    if nom == 'WebDriverException':
+        # Erreurs réseau du navigateur (net::ERR_CONNECTION_RESET, net::ERR_TIMED_OUT...)
+        return 'net::ERR_' in str(exc)
+    return False
+
+
+class CircuitBreaker:
+    """Disjoncteur d'un hôte, sur une fenêtre glissante des derniers résultats"""
+
+    def __init__(self, window=None, min_calls=None, error_rate=None, cooldown=None):
+        self.window = deque(maxlen=window or RESILIENCE_CONFIG['breaker_window'])
+        self.min_calls = min_calls or RESILIENCE_CONFIG['breaker_min_calls']
+        self.error_rate = error_rate or RESILIENCE_CONFIG['breaker_error_rate']
+        self.cooldown = RESILIENCE_CONFIG['breaker_cooldown'] if cooldown is None else cooldown
+        self.state = 'ferme'  # ferme, ouvert, essai
+        self.opened_at = None
+        self.openings = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Vrai si une requête peut partir (une seule requête d'essai après le délai)"""
+        with self._lock:
+            if self.state == 'ferme':
+                return True
+            if self.state == 'ouvert' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'essai'
+                return True
+            return False
+
+    def record(self, success):
+        """Enregistre le résultat d'une tentative"""
+        with self._lock:
+            if self.state == 'essai':
+                if success:
+                    self.state = 'ferme'
+                    self.window.clear()
+                else:
+                    self._ouvrir()
+                return
+            self.window.append(success)
+            echecs = self.window.count(False)
+            if len(self.window) >= self.min_calls and echecs / len(self.window) >= self.error_rate:
+                self._ouvrir()
+
+    def _ouvrir(self):
+        self.state = 'ouvert'
+        self.opened_at = time.monotonic()
+        self.openings += 1
+        self.window.clear()
+
+
+def backoff_delay(attempt, base=None, maximum=None, rng=random):
+    """Délai avant la tentative suivante : uniforme entre 0 et base * 2^attempt (plafonné)"""
+    base = RESILIENCE_CONFIG['base_delay'] if base is None else base
+    maximum = RESILIENCE_CONFIG['max_delay'] if maximum is None else maximum
+    return rng.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class ResilientFetcher:
+    """Enveloppe une fonction de téléchargement avec délais, nouvelles tentatives et disjoncteurs"""
+
+    COUNTERS = ('appels', 'tentatives', 'nouvelles_tentatives', 'succes', 'erreurs_transitoires',
+                'erreurs_definitives', 'delais_depasses', 'rejets', 'attente_s')
+
+    def __init__(self, fetch, max_retries=None, timeout=None, sleep=time.sleep, breaker_params=None):
+        """
+        Args:
+            fetch (callable): Fonction (url, chemin, timeout=...) -> contenu HTML ; elle lève
+                              une exception en cas d'échec (None est traité comme une erreur passagère)
+            max_retries (int, optional): Nouvelles tentatives (défaut: SCRAPER_CONFIG['max_retries'])
+            timeout (float, optional): Délai par requête en secondes (défaut: SCRAPER_CONFIG['timeout'])
+            sleep (callable): Fonction d'attente entre deux tentatives
+            breaker_params (dict, optional): Paramètres des disjoncteurs (voir CircuitBreaker)
+        """
+        self.fetch = fetch
+        self.max_retries = SCRAPER_CONFIG['max_retries'] if max_retries is None else max_retries
+        self.timeout = timeout or SCRAPER_CONFIG['timeout']
+        self.sleep = sleep
+        self.breaker_params = breaker_params or {}
+        self.breakers = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, host):
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(**self.breaker_params)
+                self.counters[host] = dict.fromkeys(self.COUNTERS, 0)
+            return self.breakers[host]
+
+    def _count(self, host, name, value=1):
+        with self._lock:
+            self.counters[host][name] += value
+
+    def __call__(self, url, output_path=None, **kwargs):
+        """
+        Télécharge une URL
+
+        Returns:
+            str: Contenu HTML
+
+        Raises:
+            PermanentFetchError: Erreur définitive
+            TransientFetchError: Erreur passagère persistante, ou disjoncteur ouvert (CircuitOpenError)
+        """
+        from challenges import ChallengeParked
+
+        host = urlparse(str(url)).netloc or 'local'
+        breaker = self._breaker(host)
+        self._count(host, 'appels')
+
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                self._count(host, 'rejets')
+                raise CircuitOpenError(f"Hôte {host} coupé après trop d'erreurs, réessai dans {breaker.cooldown}s")
+            self._count(host, 'tentatives')
+            if attempt:
+                self._count(host, 'nouvelles_tentatives')
+            try:
+                content = self.fetch(url, output_path, timeout=self.timeout, **kwargs)
+                if content is None:
+                    raise TransientFetchError("Page vide")
+                breaker.record(True)
+                self._count(host, 'succes')
+                return content
+            except ChallengeParked:
+                # Page bloquée par un CAPTCHA : ni erreur réseau, ni nouvelle tentative
+                breaker.record(True)
+                raise
+            except Exception as e:
+                if type(e).__name__ in ('TimeoutException', 'TimeoutError', 'timeout'):
+                    self._count(host, 'delais_depasses')
+                if not is_transient(e):
+                    # Une erreur définitive (page absente, URL invalide) ne dit rien de la santé de l'hôte
+                    breaker.record(True)
+                    self._count(host, 'erreurs_definitives')
+                    raise PermanentFetchError(f"{type(e).__name__}: {e}") from e
+                breaker.record(False)
+                self._count(host, 'erreurs_transitoires')
+                if attempt == self.max_retries:
+                    raise TransientFetchError(f"{type(e).__name__}: {e} (après {attempt + 1} tentatives)") from e
+                delay = backoff_delay(attempt)
+                self._count(host, 'attente_s', delay)
+                self.sleep(delay)
+
+    def stats(self):
+        """
+        Compteurs par hôte et totaux
+
+        Returns:
+            dict: Par hôte, les compteurs, l'état du disjoncteur et 'amplification'
+                  (tentatives par appel non rejeté) ; 'total' cumule tous les hôtes
+        """
+        with self._lock:
+            par_hote = {host: dict(c) for host, c in self.counters.items()}
+        total = dict.fromkeys(self.COUNTERS, 0)
+        for host, compteurs in par_hote.items():
+            for nom in self.COUNTERS:
+                total[nom] += compteurs[nom]
+            compteurs['disjoncteur'] = self.breakers[host].state
+            compteurs['ouvertures'] = self.breakers[host].openings
+        for compteurs in list(par_hote.values()) + [total]:
+            compteurs['attente_s'] = round(compteurs['attente_s'], 2)
+            envoyes = compteurs['appels'] - compteurs['rejets']
+            compteurs['amplification'] = round(compteurs['tentatives'] / envoyes, 3) if envoyes else 0.0
+        return {'hotes': par_hote, 'total': total}
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_resilient_fetcher():
+    """Retourne le téléchargeur partagé (scraper.download_page avec nouvelles tentatives)"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            from scraper import download_page
+            _fetcher = ResilientFetcher(
+                lambda url, output_path, timeout=None, **kwargs:
+                    download_page(url, output_path, timeout=timeout, raise_errors=True, **kwargs)
+            )
+        return _fetcher
+
+
+def display_stats(stats):
+    """Affiche les compteurs d'un ResilientFetcher"""
+    print(f"\n{'Hôte':<25} | {'Appels':>6} | {'Tentat.':>7} | {'Retent.':>7} | {'Succès':>6} | "
+          f"{'Transit.':>8} | {'Défin.':>6} | {'Rejets':>6} | {'Ampl.':>5} | Disjoncteur")
+    print("-" * 115)
+    for host, c in list(stats['hotes'].items()) + [('TOTAL', stats['total'])]:
+        print(f"{host[:25]:<25} | {c['appels']:>6} | {c['tentatives']:>7} | {c['nouvelles_tentatives']:>7} | "
+              f"{c['succes']:>6} | {c['erreurs_transitoires']:>8} | {c['erreurs_definitives']:>6} | "
+              f"{c['rejets']:>6} | {c['amplification']:>5.2f} | "
+              f"{c.get('disjoncteur', '')}{' (' + str(c['ouvertures']) + ' ouvertures)' if c.get('ouvertures') else ''}")
+
+
+def _serveur_instable(taux_erreur=0.15, taux_lent=0.03, delai_lent=2.0, panne=(0.5, 1.5), seed=0):
+    """
+    Serveur HTTP local qui échoue au hasard : 503, 429, réponses lentes, 404 sur
+    /absent, et une panne complète (503) entre panne[0] et panne[1] secondes
+
+    Returns:
+        ThreadingHTTPServer: Serveur démarré sur un port libre de 127.0.0.1
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    tirage = random.Random(seed)
+    verrou = threading.Lock()
+    debut = time.monotonic()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with verrou:
+                r = tirage.random()
+            if self.path.startswith('/absent'):
+                self.send_error(404)
+            elif panne[0] <= time.monotonic() - debut < panne[1]:
+                self.send_error(503)
+            elif r < taux_erreur:
+                self.send_error(503 if r < taux_erreur * 0.7 else 429)
+            else:
+                if r > 1 - taux_lent:
+                    time.sleep(delai_lent)
+                corps = f"<html>{self.path}</html>".encode('utf-8')
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(corps)))
+                    self.end_headers()
+                    self.wfile.write(corps)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Le client a abandonné la requête (délai dépassé)
+
+        def log_message(self, format, *args):
+            pass
+
+    serveur = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+def http_fetch(url, output_path=None, timeout=None):
+    """Téléchargement HTTP simple (urllib), pour le banc d'essai"""
+    from urllib.request import urlopen
+
+    with urlopen(url, timeout=timeout) as reponse:
+        content = reponse.read().decode('utf-8')
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    return content
+
+
+def _benchmark(requetes=200, workers=8):
+    """Charge un serveur instable (avec une panne d'une seconde) et affiche les compteurs de la couche de résilience"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    serveur = _serveur_instable()
+    base = f"http://127.0.0.1:{serveur.server_port}"
+    # Délais d'attente et de coupure réduits pour que le banc reste court
+    fetcher = ResilientFetcher(http_fetch, timeout=1.0, sleep=lambda d: time.sleep(d / 100),
+                               breaker_params={'cooldown': 0.2})
+    urls = [f"{base}/page/{i}" if i % 20 else f"{base}/absent/{i}" for i in range(requetes)]
+
+    def une(url):
+        time.sleep(0.05)  # Traitement de la page précédente
+        try:
+            fetcher(url)
+            return 'ok'
+        except CircuitOpenError:
+            return 'rejet'
+        except PermanentFetchError:
+            return 'definitive'
+        except TransientFetchError:
+            return 'transitoire'
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        issues = list(executor.map(une, urls))
+    duree = time.perf_counter() - start
+    serveur.shutdown()
+
+    print(f"{requetes} URL en {duree:.1f}s : " + ', '.join(f"{issues.count(i)} {i}" for i in sorted(set(issues))))
+    display_stats(fetcher.stats())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        _benchmark(*(int(v) for v in sys.argv[2:4]))
+    else:
+        print("Usage: python resilience.py bench [requetes] [workers]")
+        sys.exit(1)
@@ -3,125 +3,7 @@ import sys
 import subprocess
 import json
 from urllib.parse import urlparse
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
-
-def is_postal_code(input_str):
-    """Vérifie si l'entrée est un code postal français valide (5 chiffres)"""
-    return input_str.isdigit() and len(input_str) == 5 and 1000 <= int(input_str) <= 98999
-
-def get_city_coordinates(location_input):
-    """
-    Récupère les coordonnées GPS et le code postal d'une ville ou d'un code postal
-    
-    Args:
-        location_input (str): Peut être un nom de ville ou un code postal français
-        
-    Returns:
-        dict: Dictionnaire contenant les informations de localisation ou None si non trouvé
-    """
-    max_retries = 3
-    retry_count = 0
-    
-    while retry_count < max_retries:
-        try:
-            # Initialiser le géocodeur avec un user_agent personnalisé et un timeout plus long
-            geolocator = Nominatim(
-                user_agent="lbc_scraper",
-                timeout=10,  # Augmenter le timeout à 10 secondes
-                domain="nominatim.openstreetmap.org"
-            )
-            
-            # Ajouter un délai pour respecter les conditions d'utilisation
-            geocode = RateLimiter(
-                geolocator.geocode,
-                min_delay_seconds=2,  # Augmenter le délai minimum entre les requêtes
-                max_retries=3,  # Nombre de tentatives en cas d'échec
-                error_wait_seconds=5  # Délai d'attente entre les tentatives
-            )
-        
-            # Préparer les requêtes en fonction du type d'entrée
-            if is_postal_code(location_input):
-                # Si c'est un code postal, on le recherche directement
-                queries = [
-                    f"{location_input}, France",
-                    f"{location_input}, FR"
-                ]
-            else:
-                # Si c'est un nom de ville, on essaie différents formats
-                queries = [
-                    f"{location_input}, France",
-                    f"Ville de {location_input}, France",
-                    f"{location_input}, {location_input}, France"
-                ]
-            
-            location = None
-            for query in queries:
-                location = geocode(query, addressdetails=True, language='fr')
-                if location:
-                    break
-            
-            if not location:
-                retry_count += 1
-                if retry_count < max_retries:
-                    print(f"Localisation non trouvée pour '{location_input}'. Nouvelle tentative ({retry_count}/{max_retries-1})...")
-                    import time
-                    time.sleep(2)  # Attendre 2 secondes avant de réessayer
-                    continue
-                else:
-                    print(f"\nErreur : Impossible de trouver la localisation pour '{location_input}' après {max_retries} tentatives.")
-                    print("Conseils :")
-                    print("1. Vérifiez l'orthographe du nom de la ville ou du code postal")
-                    print("2. Essayez d'utiliser un nom de ville plus grand à proximité")
-                    print("3. Vérifiez votre connexion Internet")
-                    print("4. Le service de géolocalisation peut être temporairement indisponible")
-                    return None
-            
-            # Extraire le code postal et le nom de la ville
-            address = location.raw.get('address', {})
-            postcode = address.get('postcode')
-            city_name = address.get('city') or address.get('town') or address.get('village') or location_input
-            
-            # Si pas de code postal, essayer de le trouver dans display_name
-            if not postcode and 'display_name' in location.raw:
-                import re
-                # Chercher un code postal français (5 chiffres) dans le display_name
-                match = re.search(r'\b(?:0[1-9]|[1-8]\d|9[0-8])\d{3}\b', location.raw['display_name'])
-                if match:
-                    postcode = match.group(0)
-            
-            # Si on avait un code postal en entrée mais qu'on ne le retrouve pas dans la réponse
-            if is_postal_code(location_input) and not postcode:
-                postcode = location_input
-            
-            if not postcode:
-                print(f"Impossible de déterminer le code postal pour : {location_input}")
-                return None
-                
-            return {
-                'name': city_name,
-                'postcode': postcode,
-                'latitude': location.latitude,
-                'longitude': location.longitude,
-                'input_type': 'postal_code' if is_postal_code(location_input) else 'city_name'
-            }
-            
-        except Exception as e:
-            retry_count += 1
-            if retry_count < max_retries:
-                print(f"\nERREUR lors de la recherche de localisation : {str(e)}")
-                print(f"Nouvelle tentative dans 5 secondes... ({retry_count}/{max_retries})")
-                import time
-                time.sleep(5)  # Attendre 5 secondes avant de réessayer
-            else:
-                print(f"\nERREUR CRITIQUE après {max_retries} tentatives :")
-                print(str(e))
-                print("\nConseils de dépannage :")
-                print("1. Vérifiez votre connexion Internet")
-                print("2. Le service de géolocalisation peut être temporairement indisponible")
-                print("3. Essayez de réessayer dans quelques instants")
-                print("4. Si le problème persiste, contactez le support technique avec le message d'erreur ci-dessus")
-                return None
+from geocoding import is_postal_code, get_city_coordinates, geocode_batch, split_locations
 
 def get_location_from_user():
     """Demande à l'utilisateur de saisir une localisation et retourne les informations de géolocalisation"""
@@ -149,18 +31,161 @@ def parse_arguments():
     parser.add_argument('--max-price', type=int, help='Prix maximum pour le filtrage')
     parser.add_argument('--min-surface', type=int, help='Surface minimale pour le filtrage')
     parser.add_argument('--location-ville', type=str, help='Localisation pour le filtrage')
+    parser.add_argument('--villes', type=str,
+                        help="Villes ou codes postaux de la zone de recherche, séparés par des virgules (géolocalisés en lot)")
+    parser.add_argument('--job', type=str,
+                        help="Fichier de lot JSON/YAML : exécute toutes ses recherches sans interaction (voir batch_runner.py)")
+    parser.add_argument('--workers', type=int, help="Nombre de navigateurs simultanés en mode lot")
+    parser.add_argument('--couverture', action='store_true',
+                        help="Fusionner / découper les cercles de recherche des localisations pour limiter les doublons")
+    parser.add_argument('--shard', action='store_true',
+                        help="Découper chaque recherche en tranches de prix / surface pour dépasser le plafond de résultats")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Trier par date et arrêter la pagination aux annonces déjà vues (magasin listings.sqlite)")
+    parser.add_argument('--details', action='store_true',
+                        help="Compléter les annonces (étage, charges, DPE, chambres) avec leur page de détail")
+    parser.add_argument('--yes', action='store_true', help="Ne pas demander de confirmation avant la collecte")
+    parser.add_argument('--display-subprocess', action='store_true',
+                        help="Afficher les annonces via un sous-processus display_ads.py (mode de compatibilité)")
     
     return parser.parse_args()
 
+def run_display_subprocess(args, json_file, rental_json_file):
+    """
+    Lance display_ads.py dans un nouvel interpréteur (mode de compatibilité)
+    
+    L'étape d'affichage s'exécute normalement dans le processus courant via
+    display_ads.display_results ; ce mode relit les fichiers JSON produits.
+    
+    Args:
+        args: Arguments de la ligne de commande du pipeline
+        json_file (str): Fichier JSON des annonces de vente
+        rental_json_file (str): Fichier JSON des annonces de location
+    """
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "display_ads.py")
+    cmd = [sys.executable, script_path, f"--vente={json_file}", f"--location={rental_json_file}"]
+    
+    # Ajouter les filtres si spécifiés
+    if args.max_price:
+        cmd.extend(["--max-price", str(args.max_price)])
+    if args.min_surface:
+        cmd.extend(["--min-surface", str(args.min_surface)])
+    if args.location_ville:
+        cmd.extend(["--location-ville", args.location_ville])
+    
+    print("\nExécution de la commande :", subprocess.list2cmdline(cmd))
+    
+    try:
+        # La liste d'arguments est transmise telle quelle, sans passer par un shell
+        subprocess.run(cmd, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except subprocess.CalledProcessError as e:
+        print(f"Erreur lors de l'affichage des annonces : {e}")
+        print(f"Code de sortie : {e.returncode}")
+    except FileNotFoundError:
+        print(f"Erreur : Le fichier {script_path} est introuvable")
+
+def _write_json(path, annonces):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(annonces, f, ensure_ascii=False, indent=2)
+
+def _stats_affichage(annonces):
+    from display_ads import calculate_statistics, calculate_stats_par_pieces
+    return {'generales': calculate_statistics(annonces), 'par_pieces': calculate_stats_par_pieces(annonces)}
+
+def build_fetch_graph(sale_url, rental_url_meuble, rental_url_non_meuble, json_file, rental_json_file,
+                      fetch=None, shard=False, details=False, incremental=False):
+    """
+    Construit le graphe des étapes de collecte du pipeline
+    
+    Les trois téléchargements (ventes, locations meublées, locations non
+    meublées) sont indépendants et s'exécutent simultanément, chacun avec son
+    navigateur ; l'extraction suit chaque téléchargement, et les statistiques
+    d'une catégorie démarrent dès que ses annonces sont prêtes.
+    
+    Args:
+        sale_url (str): URL de recherche des ventes
+        rental_url_meuble (str): URL des locations meublées
+        rental_url_non_meuble (str): URL des locations non meublées
+        json_file (str): Fichier JSON des annonces de vente
+        rental_json_file (str): Fichier JSON des annonces de location
+        fetch (callable, optional): Fonction de téléchargement (voir crawler.fetch_unit)
+        shard (bool): Découper chaque recherche en tranches de prix / surface (voir sharding.py)
+        details (bool): Compléter les annonces avec leur page de détail (voir ad_details.py)
+        incremental (bool): Ne lire que les pages de nouvelles annonces, les autres venant
+                            du magasin des annonces vues (voir incremental.py ; prime sur shard)
+        
+    Returns:
+        TaskGraph: Graphe dont les tâches 'stats_ventes' et 'stats_locations'
+                   produisent (annonces, statistiques, statistiques d'affichage) ; les
+                   statistiques d'affichage ('generales', 'par_pieces') sont reprises
+                   par display_ads.display_results sans nouveau calcul
+    """
+    from crawler import make_unit, fetch_unit, resume_parked
+    from task_graph import TaskGraph
+    
+    def collecter(unit):
+        if incremental:
+            from incremental import run_incremental
+            result = run_incremental([unit], fetch=fetch, verbose=False)[unit['key']]
+            print(f"{unit['url']} : {len(result['nouvelles'])} nouvelles annonces en {result['pages']} pages")
+        elif shard:
+            from sharding import run_sharded
+            result = run_sharded([unit], fetch=fetch, verbose=False)[unit['key']]
+        else:
+            # Une page bloquée n'arrête que sa propre branche, jusqu'à la reprise de la session
+            result = resume_parked(unit, fetch_unit(unit, fetch=fetch))
+        if details and result['status'] == 'ok':
+            from ad_details import get_detail_fetcher
+            result['details'] = get_detail_fetcher().enrich(result['annonces'], verbose=False)
+        print(f"{unit['url']} : " + (f"{len(result['annonces'])} annonces ({result['elapsed']:.1f}s)"
+                                     if result['status'] == 'ok' else f"erreur ({result['error']})"))
+        if result.get('details'):
+            from ad_details import display_stats
+            display_stats(result['details'])
+        return result
+    
+    def stats_ventes(vente):
+        from calculate_average import calculate_sale_stats_from_data
+        if vente['status'] != 'ok':
+            raise RuntimeError(vente['error'])
+        _write_json(json_file, vente['annonces'])
+        return vente['annonces'], calculate_sale_stats_from_data(vente['annonces']), _stats_affichage(vente['annonces'])
+    
+    def stats_locations(*collectes):
+        from rental_stats import calculate_rental_stats_from_data
+        annonces = [a for c in collectes if c['status'] == 'ok' for a in c['annonces']]
+        if not annonces:
+            raise RuntimeError("Aucune annonce de location")
+        _write_json(rental_json_file, annonces)
+        return annonces, calculate_rental_stats_from_data(annonces), _stats_affichage(annonces)
+    
+    graph = TaskGraph()
+    graph.add('vente', lambda: collecter(make_unit(sale_url, 'vente')))
+    graph.add('location_meuble', lambda: collecter(make_unit(rental_url_meuble, 'location', True)))
+    graph.add('location_nue', lambda: collecter(make_unit(rental_url_non_meuble, 'location', False)))
+    graph.add('stats_ventes', stats_ventes, 'vente')
+    graph.add('stats_locations', stats_locations, 'location_meuble', 'location_nue')
+    return graph
+
 def main():
     # Parser les arguments en ligne de commande
     args = parse_arguments()
     
-    # Fichiers temporaires
-    html_file = "page_telechargee.html"
+    # Fichiers produits
     json_file = args.vente if args.vente else "annonces_data.json"
     rental_json_file = args.location if args.location else "locations_data.json"
     
+    # Mode lot : toutes les recherches du fichier, sans aucune saisie
+    if args.job:
+        from batch_runner import load_job, run_batch, display_summary
+        try:
+            job = load_job(args.job)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"Erreur lors du chargement du lot : {e}")
+            sys.exit(1)
+        display_summary(run_batch(job, max_workers=args.workers))
+        return
+    
     try:
         # 1. Construction de l'URL
         print("=" * 80)
@@ -175,8 +200,22 @@ def main():
         # Liste pour stocker les localisations ajoutées
         locations = []
         
-        # Utiliser la localisation fournie en argument ou demander à l'utilisateur
-        if args.location_ville:
+        # Utiliser les localisations fournies en argument ou demander à l'utilisateur
+        if args.villes:
+            print(f"\nGéolocalisation des localisations fournies : {args.villes}")
+            for result in geocode_batch(split_locations(args.villes)):
+                if result['status'] == 'found':
+                    city_info = result['result']
+                    if city_info not in locations:
+                        locations.append(city_info)
+                    print(f"Localisation ajoutée : {city_info['name']} ({city_info['postcode']}) - "
+                          f"{city_info['latitude']}, {city_info['longitude']} [{result['source']}, {result['elapsed'] * 1000:.0f} ms]")
+                else:
+                    print(f"Impossible de trouver les coordonnées pour : {result['input']}"
+                          + (f" ({result['error']})" if result['error'] else ""))
+            if not locations:
+                sys.exit(1)
+        elif args.location_ville:
             print(f"\nUtilisation de la localisation fournie : {args.location_ville}")
             city_info = get_city_coordinates(args.location_ville)
             if city_info:
@@ -221,6 +260,13 @@ def main():
             print(f"- Coordonnées : {loc['latitude']}, {loc['longitude']}")
             print(f"- Type de recherche : {'Code postal' if loc.get('input_type') == 'postal_code' else 'Nom de ville'}")
         
+        # Remplacer les cercles qui se recouvrent par un ensemble réduit couvrant la même zone
+        if args.couverture and len(locations) > 1:
+            from coverage_planner import plan_coverage, display_report
+            plan = plan_coverage(locations)
+            display_report(plan)
+            locations = plan['cercles']
+        
         # Ajouter toutes les localisations à l'URL
         for loc in locations:
             url_builder.add_location(
@@ -228,160 +274,72 @@ def main():
                 loc['postcode'],
                 loc['latitude'],
                 loc['longitude'],
-                10000  # Rayon de 10km
+                int(loc.get('radius_km', 10) * 1000)  # Rayon de 10km par défaut
             )
         
-        # Construire et afficher les URLs de recherche
+        # Construire et afficher les URLs de recherche (toutes les localisations pour chaque collecte)
         sale_url = url_builder.build()  # URL pour la vente (catégorie 9 par défaut)
-        rental_url = url_builder.get_rental_url()  # URL pour la location (catégorie 10)
+        rental_url_meuble = url_builder.get_rental_url(furnished=1)  # Locations meublées (catégorie 10)
+        rental_url_non_meuble = url_builder.get_rental_url(furnished=2)  # Locations non meublées
         
         print("\n" + "=" * 80)
         print("URLS DE RECHERCHE GÉNÉRÉES")
         print("=" * 80)
         print(f"\nURL pour les ventes (catégorie 9) :")
         print(sale_url)
-        print(f"\nURL pour les locations (catégorie 10) :")
-        print(rental_url)
+        print(f"\nURL pour les locations meublées (catégorie 10) :")
+        print(rental_url_meuble)
+        print(f"\nURL pour les locations non meublées (catégorie 10) :")
+        print(rental_url_non_meuble)
         
         # Demander confirmation avant de continuer
-        if input("\nVoulez-vous continuer avec ces paramètres ? (o/n): ").lower() != 'o':
+        if not args.yes and input("\nVoulez-vous continuer avec ces paramètres ? (o/n): ").lower() != 'o':
             print("Annulation par l'utilisateur.")
             return
-            
-        # Utiliser l'URL de vente pour la suite du traitement
-        search_url = sale_url
         
-        # 2. Téléchargement de la page avec Selenium
+        # 2-3. Collecte et extraction concurrentes des trois recherches
         print("\n" + "=" * 80)
-        print("ÉTAPE 2/5 : Téléchargement de la page avec Selenium")
+        print("ÉTAPES 2-3/6 : Téléchargement et extraction (ventes, locations meublées et non meublées)")
         print("=" * 80)
-        from scraper import download_page
-        
-        print(f"Téléchargement de la page : {search_url}")
-        if not download_page(search_url, html_file):
-            print("Erreur lors du téléchargement de la page")
+        from calculate_average import display_statistics
+        
+        graph = build_fetch_graph(sale_url, rental_url_meuble, rental_url_non_meuble,
+                                  json_file, rental_json_file, shard=args.shard,
+                                  details=args.details, incremental=args.incremental)
+        results = graph.run()
+        
+        for name, debut, fin, statut in graph.report():
+            print(f"- {name:<15} : {debut:6.1f}s -> {fin:6.1f}s ({statut})")
+        for name, error in graph.errors.items():
+            print(f"Erreur ({name}) : {error}")
+        from resilience import get_resilient_fetcher, display_stats
+        display_stats(get_resilient_fetcher().stats())
+        
+        if 'stats_ventes' not in results:
+            print("Erreur lors de la collecte des annonces de vente")
             return
-        
-        # 3. Extraction des annonces de vente
-        print("\n" + "=" * 80)
-        print("ÉTAPE 3/5 : Extraction des annonces de vente")
-        print("=" * 80)
-        from extract_ads import extract_ads
-        
-        print(f"Extraction des annonces de vente depuis : {html_file}")
-        if not extract_ads(html_file, json_file):
-            print("Erreur lors de l'extraction des annonces de vente")
+        if 'stats_locations' not in results:
+            print("Aucune annonce de location trouvée.")
             return
         
-        # 3.1. Extraction des annonces de location (meublées et non meublées)
-        rental_html_file_meuble = "page_location_meuble_telechargee.html"
-        rental_html_file_non_meuble = "page_location_non_meuble_telechargee.html"
-        rental_json_file = "locations_data.json"
-        
-        print("\n" + "=" * 80)
-        print("ÉTAPE 3.1/5 : Extraction des annonces de location")
-        print("=" * 80)
-        
-        all_rental_ads = []
+        sale_ads, stats, affichage_ventes = results['stats_ventes']
+        all_rental_ads, rental_stats, affichage_locations = results['stats_locations']
+        print(f"\n{len(sale_ads)} annonces de vente enregistrées dans {json_file}")
+        print(f"{len(all_rental_ads)} annonces de location enregistrées dans {rental_json_file}")
         
-        # Traitement des locations meublées (furnished=1)
-        print("\nRecherche des locations meublées...")
-        rental_url_builder_meuble = LBCUrlBuilder()
-        
-        # Utiliser la première localisation de la liste
-        loc = locations[0]
-        rental_url_builder_meuble.add_location(
-            loc['name'],
-            loc['postcode'],
-            loc['latitude'],
-            loc['longitude'],
-            10000  # Rayon de 10km
-        )
-        rental_url_meuble = rental_url_builder_meuble.get_rental_url() + "&furnished=1"
-        
-        print(f"Téléchargement de la page des locations meublées : {rental_url_meuble}")
-        if download_page(rental_url_meuble, rental_html_file_meuble):
-            print(f"Extraction des annonces de location meublée depuis : {rental_html_file_meuble}")
-            temp_json = "temp_meuble.json"
-            if extract_ads(rental_html_file_meuble, temp_json):
-                # Ajouter le champ furnished=True aux annonces
-                try:
-                    with open(temp_json, 'r', encoding='utf-8') as f:
-                        ads = json.load(f)
-                        for ad in ads:
-                            ad['furnished'] = True
-                        all_rental_ads.extend(ads)
-                    print(f"{len(ads)} annonces de locations meublées trouvées")
-                except Exception as e:
-                    print(f"Erreur lors du traitement des annonces meublées : {str(e)}")
-                finally:
-                    if os.path.exists(temp_json):
-                        os.remove(temp_json)
-        
-        # Traitement des locations non meublées (furnished=2)
-        print("\nRecherche des locations non meublées...")
-        rental_url_builder_non_meuble = LBCUrlBuilder()
-        
-        # Utiliser la première localisation de la liste
-        loc = locations[0]
-        rental_url_builder_non_meuble.add_location(
-            loc['name'],
-            loc['postcode'],
-            loc['latitude'],
-            loc['longitude'],
-            10000  # Rayon de 10km
-        )
-        rental_url_non_meuble = rental_url_builder_non_meuble.get_rental_url() + "&furnished=2"
-        
-        print(f"Téléchargement de la page des locations non meublées : {rental_url_non_meuble}")
-        if download_page(rental_url_non_meuble, rental_html_file_non_meuble):
-            print(f"Extraction des annonces de location non meublée depuis : {rental_html_file_non_meuble}")
-            temp_json = "temp_non_meuble.json"
-            if extract_ads(rental_html_file_non_meuble, temp_json):
-                # Ajouter le champ furnished=False aux annonces
-                try:
-                    with open(temp_json, 'r', encoding='utf-8') as f:
-                        ads = json.load(f)
-                        for ad in ads:
-                            ad['furnished'] = False
-                        all_rental_ads.extend(ads)
-                    print(f"{len(ads)} annonces de locations non meublées trouvées")
-                except Exception as e:
-                    print(f"Erreur lors du traitement des annonces non meublées : {str(e)}")
-                finally:
-                    if os.path.exists(temp_json):
-                        os.remove(temp_json)
-        
-        # Écrire toutes les annonces dans le fichier final
-        if all_rental_ads:
-            with open(rental_json_file, 'w', encoding='utf-8') as f:
-                json.dump(all_rental_ads, f, ensure_ascii=False, indent=2)
-            print(f"\nTotal de {len(all_rental_ads)} annonces de location enregistrées dans {rental_json_file}")
-        else:
-            print("Aucune annonce de location trouvée.")
-            return
-            
-        # 4. Calcul des statistiques pour les ventes
+        # 4. Statistiques des ventes (calculées dès la fin de leur extraction)
         print("\n" + "=" * 80)
         print("ÉTAPE 4/6 : Calcul des statistiques pour les ventes")
         print("=" * 80)
-        from calculate_average import calculate_sale_stats, display_statistics
-        from rental_stats import calculate_rental_stats
-        
-        print(f"Calcul des statistiques pour les ventes : {json_file}")
-        stats = calculate_sale_stats(json_file)
         if stats:
             display_statistics(stats, "Ventes")
         else:
             print("Aucune statistique à afficher pour les ventes")
             
-        # 5. Calcul des statistiques pour les locations
+        # 5. Statistiques des locations
         print("\n" + "=" * 80)
         print("ÉTAPE 5/6 : Calcul des statistiques pour les locations")
         print("=" * 80)
-        
-        print(f"Calcul des statistiques pour les locations : {rental_json_file}")
-        rental_stats = calculate_rental_stats(rental_json_file)
         if rental_stats:
             display_statistics(rental_stats, "Locations")
         else:
@@ -392,54 +350,21 @@ def main():
         print("ÉTAPE 6/6 : Affichage des annonces")
         print("=" * 80)
         
-        # Préparer les arguments pour display_ads.py
-        # Utiliser le chemin complet vers Python et le script
-        import sys
-        python_exec = sys.executable
-        script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "display_ads.py")
-        
-        cmd = [python_exec, script_path]
-        
-        # Ajouter les arguments si spécifiés
-        if args.vente:
-            cmd.append(f"--vente={args.vente}")
-        if args.location:
-            cmd.append(f"--location={args.location}")
-        if args.max_price:
-            cmd.append("--max-price")
-            cmd.append(str(args.max_price))
-        if args.min_surface:
-            cmd.append("--min-surface")
-            cmd.append(str(args.min_surface))
-        if args.location_ville:
-            cmd.append("--location-ville")
-            cmd.append(args.location_ville)
-        
-        # Afficher la commande pour le débogage
-        print("\nExécution de la commande :", " ".join(f'"{arg}"' if ' ' in arg else arg for arg in cmd))
-        
-        # Configurer le répertoire de travail pour éviter les problèmes avec les chemins UNC
-        cwd = os.path.dirname(os.path.abspath(__file__))
-        
-        try:
-            # Utiliser shell=True avec un chemin complet pour éviter les problèmes de chemins UNC
-            if os.name == 'nt':  # Windows
-                cmd_str = ' '.join(f'"{arg}"' if ' ' in arg else arg for arg in cmd)
-                subprocess.run(cmd_str, check=True, shell=True, cwd=cwd)
-            else:
-                subprocess.run(cmd, check=True, cwd=cwd)
-                
-        except subprocess.CalledProcessError as e:
-            print(f"Erreur lors de l'affichage des annonces : {e}")
-            print(f"Code de sortie : {e.returncode}")
-            if e.stdout:
-                print("Sortie standard :", e.stdout)
-            if e.stderr:
-                print("Erreur standard :", e.stderr)
-        except FileNotFoundError:
-            print(f"Erreur : Le fichier {script_path} est introuvable")
-        except Exception as e:
-            print(f"Erreur inattendue : {e}")
+        if args.display_subprocess:
+            run_display_subprocess(args, json_file, rental_json_file)
+        else:
+            from display_ads import display_results
+            display_results(
+                ventes=sale_ads,
+                locations=all_rental_ads,
+                max_price=args.max_price,
+                min_surface=args.min_surface,
+                location=args.location_ville,
+                stats_ventes=affichage_ventes['par_pieces'],
+                stats_locations=affichage_locations['par_pieces'],
+                statistiques_ventes=affichage_ventes['generales'],
+                statistiques_locations=affichage_locations['generales']
+            )
         
         print("\n" + "=" * 80)
         print("PIPELINE TERMINÉ AVEC SUCCÈS")
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Grille de scénarios de financement
+
+Compare, pour chaque annonce de vente, plusieurs taux, durées et niveaux d'apport.
+Les mensualités de toutes les combinaisons annonces × taux × durées × apports sont
+calculées en une seule opération NumPy (tenseur à 4 dimensions), avec un facteur
+d'annuité mis en cache par couple (taux, durée).
+"""
+
+import sys
+
+import numpy as np
+
+from calcul_mensualite import facteur_annuite
+from config import FINANCING_SCENARIOS
+
+
+class ScenarioGrid:
+    """Mensualités et écarts loyer - mensualité pour une grille de scénarios"""
+
+    def __init__(self, prix, loyers, taux=None, durees=None, apports=None):
+        """
+        Args:
+            prix (array-like): Prix de vente des annonces
+            loyers (array-like): Loyer estimé de chaque annonce (NaN si inconnu)
+            taux (list, optional): Taux annuels en pourcentage (défaut: FINANCING_SCENARIOS)
+            durees (list, optional): Durées en années (défaut: FINANCING_SCENARIOS)
+            apports (list, optional): Apports en fraction du prix (défaut: FINANCING_SCENARIOS)
+        """
+        self.taux = np.asarray(FINANCING_SCENARIOS['interest_rates'] if taux is None else taux, dtype=float)
+        self.durees = np.asarray(FINANCING_SCENARIOS['loan_durations_years'] if durees is None else durees, dtype=int)
+        self.apports = np.asarray(FINANCING_SCENARIOS['down_payments'] if apports is None else apports, dtype=float)
+        self.prix = np.asarray(prix, dtype=float)
+        self.loyers = np.asarray(loyers, dtype=float)
+
+        # Facteurs d'annuité (taux × durées), calculés une fois par couple
+        facteurs = np.array([[facteur_annuite(float(t), int(d)) for d in self.durees] for t in self.taux])
+
+        # Montant emprunté (annonces × apports), puis mensualités (annonces × taux × durées × apports)
+        emprunt = np.where(self.prix > 0, self.prix, np.nan)[:, None] * (1 - self.apports)[None, :]
+        self.mensualites = emprunt[:, None, None, :] * facteurs[None, :, :, None]
+        self.ecarts = self.loyers[:, None, None, None] - self.mensualites
+
+    @classmethod
+    def from_announcements(cls, announcements, loyers_par_pieces=None, loyers=None, **grille):
+        """
+        Construit la grille à partir d'annonces de vente
+
+        Args:
+            announcements (list): Annonces de vente
+            loyers_par_pieces (dict, optional): Loyer de référence par nombre de pièces
+            loyers (array-like, optional): Loyer estimé par annonce (prioritaire sur loyers_par_pieces)
+            **grille: taux, durees, apports (voir __init__)
+        """
+        prix = [a.get('prix') if isinstance(a.get('prix'), (int, float)) else np.nan for a in announcements]
+        if loyers is None:
+            loyers_par_pieces = loyers_par_pieces or {}
+            loyers = [loyers_par_pieces.get(a.get('pieces'), np.nan) for a in announcements]
+        return cls(prix, loyers, **grille)
+
+    @property
+    def shape(self):
+        """Forme du tenseur (annonces, taux, durées, apports)"""
+        return self.mensualites.shape
+
+    def scenario(self, flat_index):
+        """Retourne (taux, durée, apport) pour un indice de scénario aplati"""
+        i, j, k = np.unravel_index(flat_index, self.shape[1:])
+        return float(self.taux[i]), int(self.durees[j]), float(self.apports[k])
+
+    def _indices(self, taux, duree, apport):
+        """Positions d'un scénario dans la grille"""
+        try:
+            return (int(np.flatnonzero(np.isclose(self.taux, taux))[0]),
+                    int(np.flatnonzero(self.durees == duree)[0]),
+                    int(np.flatnonzero(np.isclose(self.apports, apport))[0]))
+        except IndexError:
+            raise ValueError(f"Scénario absent de la grille : {taux}% / {duree} ans / apport {apport:.0%}")
+
+    def best_scenario_per_ad(self):
+        """
+        Meilleur scénario (écart loyer - mensualité maximal) pour chaque annonce
+
+        Returns:
+            dict: Tableaux alignés sur les annonces : 'scenario' (indice aplati, voir scenario()),
+                  'ecart', 'mensualite', 'taux', 'duree', 'apport'. Les annonces sans loyer
+                  ou sans prix n'ont pas de meilleur scénario : indice -1, autres valeurs NaN.
+        """
+        n = self.shape[0]
+        ecarts = self.ecarts.reshape(n, -1)
+        valides = ~np.all(np.isnan(ecarts), axis=1)
+        meilleurs = np.argmax(np.where(np.isnan(ecarts), -np.inf, ecarts), axis=1)
+        i, j, k = np.unravel_index(meilleurs, self.shape[1:])
+        lignes = np.arange(n)
+        return {
+            'scenario': np.where(valides, meilleurs, -1),
+            'ecart': np.where(valides, ecarts[lignes, meilleurs], np.nan),
+            'mensualite': np.where(valides, self.mensualites.reshape(n, -1)[lignes, meilleurs], np.nan),
+            'taux': np.where(valides, self.taux[i], np.nan),
+            'duree': np.where(valides, self.durees[j], np.nan),
+            'apport': np.where(valides, self.apports[k], np.nan)
+        }
+
+    def positive_cash_flow(self, taux, duree, apport):
+        """
+        Annonces dont le loyer couvre la mensualité pour un scénario donné
+
+        Returns:
+            numpy.ndarray: Positions des annonces avec un écart loyer - mensualité positif
+        """
+        i, j, k = self._indices(taux, duree, apport)
+        ecarts = self.ecarts[:, i, j, k]
+        return np.flatnonzero(np.nan_to_num(ecarts, nan=-np.inf) > 0)
+
+    def summary(self):
+        """
+        Nombre d'annonces à cash-flow positif pour chaque scénario
+
+        Returns:
+            list: Tuples (taux, durée, apport, nombre d'annonces), triés par nombre décroissant
+        """
+        comptes = np.sum(np.nan_to_num(self.ecarts, nan=-np.inf) > 0, axis=0)
+        resultats = [
+            (float(t), int(d), float(a), int(comptes[i, j, k]))
+            for i, t in enumerate(self.taux)
+            for j, d in enumerate(self.durees)
+            for k, a in enumerate(self.apports)
+        ]
+        return sorted(resultats, key=lambda r: r[3], reverse=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python scenarios.py <ventes.json> <locations.json>")
+        sys.exit(1)
+
+    from display_ads import calculate_stats_par_pieces, load_announcements
+    from analysis_context import AnalysisContext
+
+    ventes = load_announcements(sys.argv[1]) or []
+    locations = load_announcements(sys.argv[2]) or []
+    loyers = AnalysisContext.moyennes_depuis_stats(calculate_stats_par_pieces(locations))
+
+    grid = ScenarioGrid.from_announcements(ventes, loyers_par_pieces=loyers)
+    print(f"Grille : {grid.shape[0]} annonces × {grid.shape[1] * grid.shape[2] * grid.shape[3]} scénarios")
+    print(f"\n{'Taux':<8} | {'Durée':<8} | {'Apport':<8} | Annonces à cash-flow positif")
+    print("-" * 60)
+    for taux, duree, apport, nombre in grid.summary():
+        print(f"{taux:<8.2f} | {duree:<8} | {apport:<8.0%} | {nombre}")
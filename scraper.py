@@ -3,9 +3,18 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 import time
+from challenges import ChallengeParked, is_challenge_page
+from config import SCRAPER_CONFIG
+from network_capture import collect_responses, embed_payloads, enable_capture
 
-def setup_driver():
-    """Configure et retourne un navigateur Chrome avec Selenium"""
+def setup_driver(capture=False):
+    """
+    Configure et retourne un navigateur Chrome avec Selenium
+    
+    Args:
+        capture (bool): Activer le journal de performance pour capturer les réponses
+                        de l'API de recherche (voir network_capture.py)
+    """
     chrome_options = Options()
     
     # Options pour faire ressembler à un vrai navigateur
@@ -19,6 +28,9 @@ def setup_driver():
     # Désactiver les logs inutiles
     chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
     
+    if capture:
+        enable_capture(chrome_options)
+    
     # Initialiser le driver
     driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
     
@@ -27,16 +39,28 @@ def setup_driver():
     
     return driver
 
-def download_page(url, output_path=None):
+def download_page(url, output_path=None, challenges=None, timeout=None, raise_errors=False, capture=None):
     """
     Télécharge le contenu d'une page web avec Selenium
     
     Args:
         url (str ou LBCUrlBuilder): URL de la page à télécharger ou objet LBCUrlBuilder
         output_path (str, optional): Chemin de sortie du fichier HTML
+        challenges (ChallengeQueue, optional): File des sessions bloquées. Si elle est
+            fournie, une page protégée par un CAPTCHA est mise en attente avec son
+            navigateur (ChallengeParked est levée) au lieu d'attendre une saisie
+        timeout (float, optional): Délai maximal de chargement de la page en secondes
+            (défaut: SCRAPER_CONFIG['timeout'])
+        raise_errors (bool): Lever les erreurs au lieu de retourner None, pour qu'elles
+            soient classées et retentées (voir resilience.py)
+        capture (bool, optional): Joindre au HTML les réponses JSON de l'API de recherche
+            reçues pendant le chargement (défaut: SCRAPER_CONFIG['network_capture'])
     
     Returns:
         str: Contenu HTML de la page ou None en cas d'erreur
+    
+    Raises:
+        ChallengeParked: Page bloquée mise en attente dans challenges
     """
     driver = None
     try:
@@ -50,10 +74,17 @@ def download_page(url, output_path=None):
         # Vérifier que l'URL est valide
         if not url_str.startswith(('http://', 'https://')):
             print(f"ERREUR: URL invalide : {url_str}")
+            if raise_errors:
+                raise ValueError(f"URL invalide : {url_str}")
             return None
         
         print("Lancement du navigateur...")
-        driver = setup_driver()
+        capture = SCRAPER_CONFIG['network_capture'] if capture is None else capture
+        driver = setup_driver(capture=capture)
+        driver.set_page_load_timeout(timeout or SCRAPER_CONFIG['timeout'])
+        if capture:
+            # Le corps des réponses n'est lisible que si le domaine réseau est actif avant le chargement
+            driver.execute_cdp_cmd('Network.enable', {})
         
         print(f"Accès à l'URL : {url_str}")
         driver.get(url_str)
@@ -62,12 +93,21 @@ def download_page(url, output_path=None):
         time.sleep(5)  # Augmentez ce délai si nécessaire
         
         # Vérifier si on est bloqué
-        if "datadome" in driver.page_source.lower() or "access denied" in driver.page_source.lower():
+        if is_challenge_page(driver.page_source):
+            if challenges is not None:
+                # Le navigateur reste ouvert : il appartient désormais à la file d'attente
+                entry = challenges.park(url_str, driver, output_path)
+                driver = None
+                raise ChallengeParked(entry)
             print("Détection de protection anti-bot. Essayez de résoudre le CAPTCHA manuellement...")
             input("Appuyez sur Entrée après avoir résolu le CAPTCHA...")
         
         # Récupérer le contenu de la page
         page_content = driver.page_source
+        if capture:
+            payloads = collect_responses(driver)
+            print(f"{len(payloads)} réponses de l'API de recherche capturées")
+            page_content = embed_payloads(page_content, payloads)
         
         # Sauvegarder dans un fichier si un chemin est fourni
         if output_path:
@@ -77,8 +117,13 @@ def download_page(url, output_path=None):
         
         return page_content
         
+    except ChallengeParked:
+        raise
+        
     except Exception as e:
         print(f"Erreur lors du téléchargement : {str(e)}")
+        if raise_errors:
+            raise
         return None
         
     finally:
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Découpage adaptatif des recherches en tranches de prix et de surface
+
+Une recherche sur une grande ville renvoie plus d'annonces qu'une requête ne
+peut en lire. Le planificateur sonde la recherche : si le nombre de résultats
+dépasse le plafond (SHARD_CONFIG['max_results']), la fourchette de prix est
+coupée en deux (set_price_range), puis celle de surface quand les tranches de
+prix sont trop étroites, jusqu'à ce que chaque tranche tienne sous le plafond.
+
+Le point de coupe est la médiane des prix (ou surfaces) observés dans la page
+de sondage, ce qui équilibre les tranches mieux qu'un milieu arithmétique. Une
+dimension n'est filtrée dans l'URL que si la recherche la filtrait déjà ou si
+elle est coupée, et une borne ouverte de la recherche le reste dans la tranche
+extrême : une annonce sans surface ou hors des bornes par défaut
+(SHARD_CONFIG['price_bounds'], 'surface_bounds') n'est pas écartée en silence. Les
+sondages d'un même niveau s'exécutent ensemble dans le pool de crawler.run_units,
+et la page d'une tranche qui tient sous le plafond sert directement de résultat.
+
+Le plan (liste des tranches finales) est mémorisé par recherche : les exécutions
+suivantes téléchargent directement les tranches, sans sondage.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+
+from ad_index import ad_id
+from config import SHARD_CONFIG
+from crawler import make_unit, run_units
+from url_builder import LBCUrlBuilder
+
+
+def _fourchette(value):
+    """Convertit 'min-max' en tuple d'entiers, None pour une borne absente"""
+    bas, haut = (re.split(r'\s*-\s*', value, maxsplit=1) + [''])[:2] if value else ('', '')
+    return (int(bas) if bas.strip() else None, int(haut) if haut.strip() else None)
+
+
+def _params(url):
+    return dict(parse_qsl(urlparse(url).query))
+
+
+def root_shard(url):
+    """Tranche couvrant toute la recherche (fourchettes de l'URL, None pour une borne ouverte)"""
+    params = _params(url)
+    return {'price': _fourchette(params.get('price')), 'surface': _fourchette(params.get('square'))}
+
+
+def shard_url(url, shard):
+    """URL de la recherche restreinte à une tranche (sans filtre sur une dimension ouverte)"""
+    builder = LBCUrlBuilder()
+    builder.params = {k: v for k, v in _params(url).items() if k not in ('price', 'square')}
+    builder.set_price_range(*shard['price']).set_surface_range(*shard['surface'])
+    return builder.build()
+
+
+def _bornes_travail(fourchette, defaut, pas):
+    """Bornes finies servant à placer une coupe dans une fourchette éventuellement ouverte"""
+    bas = defaut[0] if fourchette[0] is None else fourchette[0]
+    haut = fourchette[1]
+    if haut is None:
+        haut = defaut[1] if defaut[1] > bas else bas + 2 * pas
+    return bas, haut
+
+
+def _coupe(bas, haut, pas, echantillon):
+    """
+    Point de coupe d'une fourchette [bas, haut] : médiane de l'échantillon, ramenée
+    pour que chaque moitié mesure au moins pas ; None si la fourchette est trop étroite
+    """
+    if haut - bas + 1 < 2 * pas:
+        return None
+    valeurs = np.array([v for v in echantillon if bas <= v <= haut], dtype=float)
+    coupe = int(np.median(valeurs)) if len(valeurs) >= 4 else (bas + haut) // 2
+    return min(max(coupe, bas + pas - 1), haut - pas)
+
+
+def split_shard(shard, annonces=(), category='9'):
+    """
+    Coupe une tranche en deux, sur le prix tant que possible, puis sur la surface
+
+    Args:
+        shard (dict): Tranche ('price', 'surface')
+        annonces (list): Annonces de la page de sondage, pour placer la coupe
+        category (str): Catégorie de la recherche ('9' vente, '10' location)
+
+    Returns:
+        list: Deux tranches, ou liste vide si la tranche n'est plus divisible
+    """
+    dimensions = (
+        ('price', 'prix', SHARD_CONFIG['min_price_step'].get(category, 1),
+         SHARD_CONFIG['price_bounds'].get(category, (0, 2000000))),
+        ('surface', 'surface_m2', SHARD_CONFIG['min_surface_step'], SHARD_CONFIG['surface_bounds'])
+    )
+    for champ, attribut, pas, defaut in dimensions:
+        bas, haut = shard[champ]
+        echantillon = [a[attribut] for a in annonces if isinstance(a.get(attribut), (int, float))]
+        coupe = _coupe(*_bornes_travail(shard[champ], defaut, pas), pas, echantillon)
+        if coupe is not None:
+            # Les bornes ouvertes restent ouvertes dans les tranches extrêmes
+            return [dict(shard, **{champ: (bas, coupe)}), dict(shard, **{champ: (coupe + 1, haut)})]
+    return []
+
+
+def _sature(result, cap):
+    """Vrai si la requête a plus de résultats qu'elle ne peut en lire"""
+    if result['total'] is not None:
+        return result['total'] > cap
+    return result['cartes'] >= cap
+
+
+def load_plans(path=None):
+    """Plans mémorisés par clé de recherche"""
+    path = path or SHARD_CONFIG['plans_path']
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Plans de découpage illisibles ({path}) : {e}")
+        return {}
+
+
+def save_plans(plans, path=None):
+    """Enregistre les plans de découpage"""
+    path = path or SHARD_CONFIG['plans_path']
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(plans, f, ensure_ascii=False, indent=2)
+
+
+_plans_lock = threading.Lock()
+
+
+def _plan_valide(plan, cap):
+    if not plan or plan.get('cap') != cap:
+        return False
+    cree = datetime.fromisoformat(plan['created'])
+    return datetime.now() - cree < timedelta(days=SHARD_CONFIG['plan_ttl_days'])
+
+
+def run_sharded(units, max_workers=None, pages_dir=None, fetch=None, cap=None,
+                plans_path=None, refresh=False, verbose=True):
+    """
+    Exécute des unités de collecte en les découpant en tranches sous le plafond de résultats
+
+    Args:
+        units (iterable): Unités créées par crawler.make_unit
+        max_workers (int, optional): Taille du pool (voir crawler.run_units)
+        pages_dir (str, optional): Dossier des pages HTML
+        fetch (callable, optional): Fonction de téléchargement (voir crawler.fetch_unit)
+        cap (int, optional): Résultats lisibles par requête (défaut: SHARD_CONFIG['max_results'])
+        plans_path (str, optional): Fichier des plans mémorisés
+        refresh (bool): Ignorer les plans mémorisés et sonder à nouveau
+        verbose (bool): Afficher l'avancement
+
+    Returns:
+        dict: Par clé d'unité, un résultat au format de crawler.fetch_unit dont les
+              annonces sont fusionnées et dédoublonnées par identifiant d'annonce,
+              complété de 'shards' (tranches finales), 'requetes', 'sondages',
+              'satures' (tranches encore au-dessus du plafond) et 'plan_en_cache'
+    """
+    start = time.perf_counter()
+    cap = cap or SHARD_CONFIG['max_results']
+    plans = load_plans(plans_path)
+    uniques = {}
+    for unit in units:
+        uniques.setdefault(unit['key'], unit)
+
+    etats = {}
+    frontiere = []  # (clé d'unité, tranche) à télécharger au prochain niveau
+    for key, unit in uniques.items():
+        plan = plans.get(key)
+        en_cache = not refresh and _plan_valide(plan, cap)
+        etats[key] = {'unit': unit, 'feuilles': [], 'resultats': [], 'requetes': 0,
+                      'sondages': 0, 'plan_en_cache': en_cache}
+        if en_cache:
+            frontiere.extend((key, {'price': tuple(s['price']), 'surface': tuple(s['surface']), 'final': True})
+                             for s in plan['shards'])
+        else:
+            frontiere.append((key, root_shard(unit['url'])))
+
+    niveau = 0
+    while frontiere:
+        niveau += 1
+        sous_unites = [make_unit(shard_url(etats[key]['unit']['url'], shard), etats[key]['unit']['category'],
+                                 etats[key]['unit'].get('furnished'), etats[key]['unit'].get('search'))
+                       for key, shard in frontiere]
+        if verbose:
+            print(f"Niveau {niveau} : {len(sous_unites)} requêtes")
+        resultats = run_units(sous_unites, max_workers=max_workers, pages_dir=pages_dir,
+                              fetch=fetch, verbose=verbose)
+
+        suivante = []
+        for (key, shard), sous_unite in zip(frontiere, sous_unites):
+            etat = etats[key]
+            result = resultats[sous_unite['key']]
+            etat['requetes'] += 1
+            enfants = []
+            if not shard.get('final') and result['status'] == 'ok' and _sature(result, cap):
+                etat['sondages'] += 1
+                en_attente = len(etat['feuilles']) + sum(1 for k, _ in frontiere if k == key) + \
+                    sum(1 for k, _ in suivante if k == key)
+                if en_attente < SHARD_CONFIG['max_shards']:
+                    enfants = split_shard(shard, result['annonces'], _params(sous_unite['url']).get('category', '9'))
+            if enfants:
+                suivante.extend((key, enfant) for enfant in enfants)
+            else:
+                etat['feuilles'].append(dict(shard, count=result['total'] if result['total'] is not None
+                                             else result['cartes'], status=result['status']))
+                etat['resultats'].append(result)
+        frontiere = suivante
+
+    sortie = {}
+    nouveaux = {}
+    for key, etat in etats.items():
+        annonces = {}
+        for result in etat['resultats']:
+            for annonce in result['annonces']:
+                annonces.setdefault(ad_id(annonce), annonce)
+        erreurs = [r['error'] for r in etat['resultats'] if r['status'] != 'ok']
+        satures = sum(1 for s in etat['feuilles'] if s['status'] == 'ok' and s['count'] is not None and s['count'] > cap)
+        sortie[key] = {
+            'key': key,
+            'url': etat['unit']['url'],
+            'status': 'ok' if len(erreurs) < len(etat['resultats']) else 'error',
+            'annonces': list(annonces.values()),
+            'cartes': sum(r['cartes'] for r in etat['resultats']),
+            'total': sum(s['count'] or 0 for s in etat['feuilles']),
+            'elapsed': time.perf_counter() - start,
+            'error': '; '.join(sorted(set(erreurs))) or None,
+            'shards': [{'price': list(s['price']), 'surface': list(s['surface']), 'count': s['count']}
+                       for s in etat['feuilles']],
+            'requetes': etat['requetes'],
+            'sondages': etat['sondages'],
+            'satures': satures,
+            'plan_en_cache': etat['plan_en_cache']
+        }
+        if not etat['plan_en_cache'] and not erreurs:
+            nouveaux[key] = {'created': datetime.now().isoformat(timespec='seconds'), 'cap': cap,
+                          'shards': sortie[key]['shards']}
+
+    if nouveaux:
+        # Relecture sous verrou : plusieurs collectes peuvent enregistrer leurs plans en même temps
+        with _plans_lock:
+            plans = load_plans(plans_path)
+            plans.update(nouveaux)
+            save_plans(plans, plans_path)
+    return sortie
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python sharding.py <url_de_recherche> [vente|location] [--refresh]")
+        sys.exit(1)
+
+    categorie = sys.argv[2] if len(sys.argv) > 2 and not sys.argv[2].startswith('--') else 'vente'
+    unit = make_unit(sys.argv[1], categorie)
+    result = run_sharded([unit], refresh='--refresh' in sys.argv)[unit['key']]
+
+    print(f"\n{len(result['shards'])} tranches, {result['requetes']} requêtes "
+          f"({result['sondages']} sondages{', plan en cache' if result['plan_en_cache'] else ''})")
+    print(f"{len(result['annonces'])} annonces distinctes sur {result['total']} annoncées")
+    if result['satures']:
+        print(f"{result['satures']} tranches dépassent encore le plafond (fourchettes trop étroites pour être coupées)")
+    print(f"\n{'Prix':>20} | {'Surface':>10} | Résultats")
+    print("-" * 45)
+    borne = lambda v: '' if v is None else str(v)
+    for shard in result['shards']:
+        print(f"{borne(shard['price'][0]):>9}-{borne(shard['price'][1]):<10} | "
+              f"{borne(shard['surface'][0]):>4}-{borne(shard['surface'][1]):<5} | {shard['count']}")
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Index spatial des annonces
+
+Chaque annonce est géolocalisée à partir de la ville et du code postal de sa
+localisation (index hors ligne des communes, puis Nominatim en option). Les
+coordonnées sont rangées dans une grille régulière :
+- identifiant de cellule = ligne × nombre de colonnes + colonne
+- annonces triées par cellule : une ligne de cellules est une tranche contiguë,
+  trouvée par np.searchsorted
+
+Une requête ne calcule donc la distance (haversine) que pour les annonces des
+cellules qui recouvrent la zone recherchée. La durée de la dernière requête est
+disponible dans last_query_ms.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from ad_index import parse_localisation
+from config import SPATIAL_CONFIG
+from offline_geocoder import get_offline_geocoder
+
+RAYON_TERRE_KM = 6371.0088
+KM_PAR_DEGRE = np.pi * RAYON_TERRE_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance orthodromique en km (accepte des tableaux NumPy)"""
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAYON_TERRE_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def resoudre_coordonnees(announcements, remote=None):
+    """
+    Détermine les coordonnées de chaque annonce
+
+    Les coordonnées déjà présentes dans l'annonce ('latitude', 'longitude') sont
+    conservées ; sinon la localisation est résolue une seule fois par texte distinct.
+
+    Args:
+        announcements (list): Liste des annonces
+        remote (bool, optional): Compléter via Nominatim (défaut: SPATIAL_CONFIG['remote_geocoding'])
+
+    Returns:
+        tuple: (latitudes, longitudes) en tableaux NumPy, NaN pour les annonces non localisées
+    """
+    if remote is None:
+        remote = SPATIAL_CONFIG['remote_geocoding']
+    offline = get_offline_geocoder()
+
+    resolues = {}
+    for annonce in announcements:
+        texte = annonce.get('localisation')
+        if texte and texte not in resolues:
+            ville, code_postal = parse_localisation(texte)
+            resolues[texte] = offline.lookup_commune(ville, code_postal)
+
+    if remote:
+        from geocoding import geocode_batch
+
+        manquantes = [texte for texte, result in resolues.items() if result is None]
+        requetes = [' '.join(filter(None, parse_localisation(texte))) for texte in manquantes]
+        for texte, result in zip(manquantes, geocode_batch(requetes)):
+            resolues[texte] = result['result']
+
+    latitudes = np.full(len(announcements), np.nan)
+    longitudes = np.full(len(announcements), np.nan)
+    for i, annonce in enumerate(announcements):
+        if isinstance(annonce.get('latitude'), (int, float)) and isinstance(annonce.get('longitude'), (int, float)):
+            latitudes[i], longitudes[i] = annonce['latitude'], annonce['longitude']
+            continue
+        result = resolues.get(annonce.get('localisation'))
+        if result:
+            latitudes[i], longitudes[i] = result['latitude'], result['longitude']
+    return latitudes, longitudes
+
+
+class SpatialIndex:
+    """Grille de cellules pour les requêtes par rayon, plus proches voisins et rectangle"""
+
+    def __init__(self, latitudes, longitudes, cell_size_km=None):
+        """
+        Args:
+            latitudes (array-like): Latitude de chaque point (NaN : point ignoré)
+            longitudes (array-like): Longitude de chaque point
+            cell_size_km (float, optional): Côté d'une cellule (défaut: SPATIAL_CONFIG)
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        self.cell_size_km = cell_size_km or SPATIAL_CONFIG['cell_size_km']
+        self.last_query_ms = None
+
+        valides = np.isfinite(latitudes) & np.isfinite(longitudes)
+        lat, lon = latitudes[valides], longitudes[valides]
+
+        # Cellules carrées à la latitude moyenne des points
+        lat_ref = float(np.mean(lat)) if lat.size else 0.0
+        self.cell_lat = self.cell_size_km / KM_PAR_DEGRE
+        self.cell_lon = self.cell_lat / max(np.cos(np.radians(lat_ref)), 0.1)
+
+        lignes = np.floor(lat / self.cell_lat).astype(np.int64)
+        colonnes = np.floor(lon / self.cell_lon).astype(np.int64)
+        self.ligne_min = int(lignes.min()) if lat.size else 0
+        self.ligne_max = int(lignes.max()) if lat.size else -1
+        self.colonne_min = int(colonnes.min()) if lat.size else 0
+        self.colonne_max = int(colonnes.max()) if lat.size else -1
+        self.nb_colonnes = self.colonne_max - self.colonne_min + 1
+
+        cellules = (lignes - self.ligne_min) * self.nb_colonnes + (colonnes - self.colonne_min)
+        ordre = np.argsort(cellules, kind='stable')
+        self.cellules = cellules[ordre]
+        self.lat = lat[ordre]
+        self.lon = lon[ordre]
+        self.positions = np.flatnonzero(valides)[ordre]  # Position de chaque point dans la liste d'origine
+
+    @classmethod
+    def from_announcements(cls, announcements, remote=None, cell_size_km=None):
+        """Construit l'index en géolocalisant les annonces (voir resoudre_coordonnees)"""
+        latitudes, longitudes = resoudre_coordonnees(announcements, remote=remote)
+        return cls(latitudes, longitudes, cell_size_km=cell_size_km)
+
+    def __len__(self):
+        """Nombre de points localisés"""
+        return self.positions.size
+
+    def _candidats(self, lat_min, lat_max, lon_min, lon_max):
+        """Indices (dans l'ordre trié) des points des cellules recouvrant le rectangle"""
+        l0 = max(int(np.floor(lat_min / self.cell_lat)), self.ligne_min)
+        l1 = min(int(np.floor(lat_max / self.cell_lat)), self.ligne_max)
+        c0 = max(int(np.floor(lon_min / self.cell_lon)), self.colonne_min)
+        c1 = min(int(np.floor(lon_max / self.cell_lon)), self.colonne_max)
+        if l0 > l1 or c0 > c1:
+            return np.empty(0, dtype=np.int64)
+
+        # Une tranche contiguë du tableau trié par ligne de cellules
+        lignes = np.arange(l0, l1 + 1) - self.ligne_min
+        debuts = np.searchsorted(self.cellules, lignes * self.nb_colonnes + (c0 - self.colonne_min), 'left')
+        fins = np.searchsorted(self.cellules, lignes * self.nb_colonnes + (c1 - self.colonne_min), 'right')
+        return np.concatenate([np.arange(d, f) for d, f in zip(debuts, fins)])
+
+    def _chrono(self, debut):
+        """Enregistre la durée de la requête en cours"""
+        self.last_query_ms = (time.perf_counter() - debut) * 1000
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """
+        Points situés à moins de radius_km d'un point
+
+        Returns:
+            tuple: (positions dans la liste d'origine, distances en km), du plus proche au plus lointain
+        """
+        debut = time.perf_counter()
+        d_lat = radius_km / KM_PAR_DEGRE
+        d_lon = d_lat / max(np.cos(np.radians(min(abs(latitude) + d_lat, 89.0))), 1e-6)
+        idx = self._candidats(latitude - d_lat, latitude + d_lat, longitude - d_lon, longitude + d_lon)
+
+        distances = haversine_km(latitude, longitude, self.lat[idx], self.lon[idx])
+        dans_rayon = distances <= radius_km
+        idx, distances = idx[dans_rayon], distances[dans_rayon]
+        ordre = np.argsort(distances, kind='stable')
+        self._chrono(debut)
+        return self.positions[idx[ordre]], distances[ordre]
+
+    def nearest(self, latitude, longitude, k=10):
+        """
+        k points les plus proches d'un point
+
+        Le rayon de recherche double jusqu'à contenir k points (ou toute la grille).
+
+        Returns:
+            tuple: (positions dans la liste d'origine, distances en km), du plus proche au plus lointain
+        """
+        debut = time.perf_counter()
+        if not len(self) or k <= 0:
+            self._chrono(debut)
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Au-delà de ce rayon, tous les points de la grille sont couverts
+        etendue_km = KM_PAR_DEGRE * ((self.ligne_max - self.ligne_min + 1) * self.cell_lat
+                                     + (self.colonne_max - self.colonne_min + 1) * self.cell_lon)
+        rayon_max = etendue_km + haversine_km(latitude, longitude, self.lat[0], self.lon[0])
+        rayon = self.cell_size_km
+        while True:
+            positions, distances = self.within_radius(latitude, longitude, rayon)
+            if positions.size >= k or rayon > rayon_max:
+                break
+            rayon *= 2
+        self._chrono(debut)
+        return positions[:k], distances[:k]
+
+    def in_bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """
+        Points situés dans un rectangle de coordonnées
+
+        Returns:
+            numpy.ndarray: Positions dans la liste d'origine, en ordre croissant
+        """
+        debut = time.perf_counter()
+        idx = self._candidats(lat_min, lat_max, lon_min, lon_max)
+        dedans = ((self.lat[idx] >= lat_min) & (self.lat[idx] <= lat_max)
+                  & (self.lon[idx] >= lon_min) & (self.lon[idx] <= lon_max))
+        resultat = np.sort(self.positions[idx[dedans]])
+        self._chrono(debut)
+        return resultat
+
+
+def _benchmark(n, requetes=100):
+    """Mesure la construction et les requêtes sur n points aléatoires en France métropolitaine"""
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(42.3, 51.1, n)
+    lon = rng.uniform(-4.8, 8.2, n)
+
+    debut = time.perf_counter()
+    index = SpatialIndex(lat, lon)
+    print(f"Construction de l'index ({n} points) : {(time.perf_counter() - debut) * 1000:.0f} ms")
+
+    centres = zip(rng.uniform(43, 50, requetes), rng.uniform(-1, 7, requetes))
+    mesures = {'rayon 10 km': [], '10 plus proches': [], 'rectangle 0.2°': []}
+    trouves = []
+    for la, lo in centres:
+        trouves.append(index.within_radius(la, lo, 10)[0].size)
+        mesures['rayon 10 km'].append(index.last_query_ms)
+        index.nearest(la, lo, 10)
+        mesures['10 plus proches'].append(index.last_query_ms)
+        index.in_bbox(la - 0.1, la + 0.1, lo - 0.1, lo + 0.1)
+        mesures['rectangle 0.2°'].append(index.last_query_ms)
+
+    print(f"Points par requête de rayon : {np.mean(trouves):.0f} en moyenne")
+    for nom, durees in mesures.items():
+        print(f"{nom:<16} : médiane {np.median(durees):.3f} ms, p95 {np.percentile(durees, 95):.3f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == 'bench':
+        _benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
+        sys.exit(0)
+
+    if len(sys.argv) < 3:
+        print("Usage: python spatial_index.py <annonces.json> <ville ou code postal> [rayon_km]")
+        print("       python spatial_index.py bench [nombre de points]")
+        sys.exit(1)
+
+    from display_ads import format_price, load_announcements
+    from geocoding import get_city_coordinates
+
+    annonces = load_announcements(sys.argv[1]) or []
+    centre = get_city_coordinates(sys.argv[2])
+    rayon = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    if not centre:
+        sys.exit(1)
+
+    index = SpatialIndex.from_announcements(annonces)
+    print(f"{len(index)}/{len(annonces)} annonces localisées")
+    positions, distances = index.within_radius(centre['latitude'], centre['longitude'], rayon)
+    print(f"{positions.size} annonces à moins de {rayon:g} km de {centre['name']} ({index.last_query_ms:.3f} ms)\n")
+    for pos, distance in zip(positions, distances):
+        annonce = annonces[pos]
+        prix = format_price(annonce['prix']) if isinstance(annonce.get('prix'), (int, float)) else 'N/A'
+        print(f"{distance:6.1f} km | {str(annonce.get('localisation', 'N/A'))[:30]:<30} | {prix}")
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Rendu en flux des tableaux d'annonces
+
+Contrairement à tabulate, qui calcule la largeur des colonnes sur toutes les lignes
+et construit une seule grande chaîne, ce module :
+- fixe la largeur des colonnes à partir d'un échantillon de lignes
+- produit le tableau page par page, au fur et à mesure du formatage
+- écrit directement en CSV/TSV pour une sortie non interactive
+"""
+
+import csv
+from itertools import islice
+
+from config import DISPLAY_CONFIG
+
+
+def _cell(value):
+    """Convertit une valeur de cellule en texte sur une seule ligne"""
+    if value is None:
+        return ''
+    return ' '.join(str(value).split())
+
+
+def compute_column_widths(headers, sample_rows, max_width=None):
+    """
+    Calcule la largeur des colonnes à partir des en-têtes et d'un échantillon de lignes
+
+    Args:
+        headers (list): En-têtes du tableau
+        sample_rows (list): Échantillon de lignes déjà formatées
+        max_width (int, optional): Largeur maximale d'une colonne
+
+    Returns:
+        list: Largeur de chaque colonne
+    """
+    if max_width is None:
+        max_width = DISPLAY_CONFIG['max_column_width']
+    widths = [len(_cell(h)) for h in headers]
+    for row in sample_rows:
+        for col, value in enumerate(row):
+            widths[col] = max(widths[col], len(_cell(value)))
+    return [min(w, max_width) for w in widths]
+
+
+def _fit(value, width):
+    """Tronque une cellule à la largeur de la colonne et l'aligne à droite"""
+    text = _cell(value)
+    if len(text) > width:
+        text = text[:width - 1] + '…'
+    return text.rjust(width)
+
+
+def iter_grid_pages(headers, rows, page_size=None, sample_size=None, max_width=None):
+    """
+    Produit un tableau au format grille, page par page
+
+    Seules les `sample_size` premières lignes sont lues avant d'écrire la première page :
+    le temps d'affichage de la première ligne ne dépend pas de la taille du jeu de données.
+
+    Args:
+        headers (list): En-têtes du tableau
+        rows (iterable): Lignes formatées (peut être un générateur)
+        page_size (int, optional): Nombre de lignes par page
+        sample_size (int, optional): Nombre de lignes utilisées pour les largeurs
+        max_width (int, optional): Largeur maximale d'une colonne
+
+    Yields:
+        str: Texte d'une page du tableau (la première contient l'en-tête)
+    """
+    if page_size is None:
+        page_size = DISPLAY_CONFIG['page_size']
+    if sample_size is None:
+        sample_size = DISPLAY_CONFIG['width_sample_rows']
+
+    rows = iter(rows)
+    sample = list(islice(rows, sample_size))
+    widths = compute_column_widths(headers, sample, max_width)
+
+    border = '+' + '+'.join('-' * (w + 2) for w in widths) + '+'
+    header_border = '+' + '+'.join('=' * (w + 2) for w in widths) + '+'
+
+    def format_line(row):
+        return '| ' + ' | '.join(_fit(v, w) for v, w in zip(row, widths)) + ' |'
+
+    page = [border, format_line(headers), header_border]
+    for row in sample:
+        page.append(format_line(row))
+        page.append(border)
+        if len(page) >= 2 * page_size:
+            yield '\n'.join(page)
+            page = []
+
+    for row in rows:
+        page.append(format_line(row))
+        page.append(border)
+        if len(page) >= 2 * page_size:
+            yield '\n'.join(page)
+            page = []
+
+    if page:
+        yield '\n'.join(page)
+
+
+def write_delimited(headers, rows, stream, delimiter=','):
+    """
+    Écrit les lignes au format CSV (ou TSV avec delimiter='\\t') au fil de l'eau
+
+    Args:
+        headers (list): En-têtes des colonnes
+        rows (iterable): Lignes à écrire
+        stream: Flux de sortie texte
+        delimiter (str): Séparateur de champs
+
+    Returns:
+        int: Nombre de lignes écrites
+    """
+    writer = csv.writer(stream, delimiter=delimiter, lineterminator='\n')
+    writer.writerow(headers)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Exécution concurrente d'étapes dépendantes (graphe orienté sans cycle)
+
+Chaque tâche démarre dès que toutes ses dépendances sont terminées, dans un pool
+de threads : des téléchargements indépendants s'exécutent en parallèle, et
+l'extraction ou les statistiques d'une branche commencent sans attendre les
+autres branches. Une tâche en erreur annule les tâches qui en dépendent.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class TaskGraph:
+    """Graphe de tâches exécutées dès que leurs dépendances sont prêtes"""
+
+    def __init__(self):
+        self.tasks = {}  # nom -> (fonction, dépendances)
+        self.results = {}
+        self.errors = {}
+        self.timings = {}  # nom -> (début, fin) en secondes depuis le lancement
+
+    def add(self, name, func, *deps):
+        """
+        Ajoute une tâche
+
+        Args:
+            name (str): Nom unique de la tâche
+            func (callable): Fonction appelée avec les résultats des dépendances, dans l'ordre de deps
+            *deps (str): Noms des tâches dont elle dépend (déjà ajoutées)
+        """
+        if name in self.tasks:
+            raise ValueError(f"Tâche déjà définie : {name}")
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"Dépendance inconnue pour {name} : {dep}")
+        self.tasks[name] = (func, deps)
+        return self
+
+    def run(self, max_workers=None):
+        """
+        Exécute toutes les tâches
+
+        Args:
+            max_workers (int, optional): Tâches simultanées (défaut: nombre de tâches)
+
+        Returns:
+            dict: Résultat de chaque tâche terminée ; les erreurs sont dans self.errors
+                  (exception, ou message pour une tâche annulée)
+        """
+        start = time.perf_counter()
+        pending = dict(self.tasks)
+        running = {}
+
+        def execute(name, func, args):
+            debut = time.perf_counter() - start
+            try:
+                return func(*args)
+            finally:
+                self.timings[name] = (debut, time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=max_workers or max(len(self.tasks), 1)) as executor:
+            while pending or running:
+                # Annuler les tâches dont une dépendance a échoué, lancer celles qui sont prêtes
+                for name, (func, deps) in list(pending.items()):
+                    failed = [d for d in deps if d in self.errors]
+                    if failed:
+                        self.errors[name] = f"Annulée : échec de {', '.join(failed)}"
+                        del pending[name]
+                    elif all(d in self.results for d in deps):
+                        args = [self.results[d] for d in deps]
+                        running[executor.submit(execute, name, func, args)] = name
+                        del pending[name]
+
+                if not running:
+                    if pending:
+                        # Les tâches restantes attendent une dépendance annulée plus loin dans la liste
+                        continue
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        self.errors[name] = e
+        return self.results
+
+    def report(self):
+        """Chronologie des tâches : (nom, début, fin, statut), dans l'ordre de démarrage"""
+        lignes = []
+        for name, (debut, fin) in sorted(self.timings.items(), key=lambda t: t[1][0]):
+            lignes.append((name, debut, fin, 'ok' if name in self.results else 'erreur'))
+        return lignes
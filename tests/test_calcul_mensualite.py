@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Parité du noyau vectorisé d'amortissement avec la boucle mois par mois d'origine"""
+
+import numpy as np
+import pytest
+
+from calcul_mensualite import (calculer_mensualite, capital_restant_du, cout_total_interets,
+                               plan_amortissement)
+
+CAS = [
+    (200000, 3.5, 25),
+    (150000, 1.2, 20),
+    (85000, 4.8, 15),
+    (120000, 0.0, 10),  # Taux nul
+    (50000, 7.0, 1),
+]
+
+
+def plan_boucle(montant, taux_annuel, duree_annees):
+    """Boucle scalaire d'origine (afficher_plan_remboursement) : intérêts, capital remboursé, restant dû"""
+    taux_mensuel = (taux_annuel / 100) / 12
+    nb_mensualites = duree_annees * 12
+    if taux_mensuel == 0:
+        mensualite = montant / nb_mensualites
+    else:
+        mensualite = (montant * taux_mensuel * (1 + taux_mensuel) ** nb_mensualites) / \
+                     ((1 + taux_mensuel) ** nb_mensualites - 1)
+    capital_restant = montant
+    interets, rembourse, restant = [], [], []
+    for _ in range(nb_mensualites):
+        interets_mois = capital_restant * taux_mensuel
+        capital_rembourse = mensualite - interets_mois
+        capital_restant -= capital_rembourse
+        interets.append(interets_mois)
+        rembourse.append(capital_rembourse)
+        restant.append(max(capital_restant, 0.0))
+    return mensualite, np.array(interets), np.array(rembourse), np.array(restant)
+
+
+@pytest.mark.parametrize("montant, taux, duree", CAS)
+def test_plan_amortissement_identique_a_la_boucle(montant, taux, duree):
+    mensualite, interets, rembourse, restant = plan_boucle(montant, taux, duree)
+    plan = plan_amortissement(montant, taux, duree)
+
+    assert plan['mensualite'][0] == pytest.approx(mensualite, rel=1e-12)
+    assert calculer_mensualite(montant, taux, duree) == pytest.approx(mensualite, rel=1e-12)
+    np.testing.assert_allclose(plan['interets'][0], interets, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(plan['capital_rembourse'][0], rembourse, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(plan['capital_restant'][0], restant, rtol=1e-9, atol=1e-6)
+
+
+@pytest.mark.parametrize("montant, taux, duree", CAS)
+def test_cout_total_interets_identique_a_la_boucle(montant, taux, duree):
+    _, interets, _, _ = plan_boucle(montant, taux, duree)
+    assert cout_total_interets([montant], taux, duree)[0] == pytest.approx(interets.sum(), rel=1e-9, abs=1e-6)
+
+
+@pytest.mark.parametrize("montant, taux, duree", CAS)
+def test_capital_restant_du_identique_a_la_boucle(montant, taux, duree):
+    _, _, _, restant = plan_boucle(montant, taux, duree)
+    for annees in range(1, duree + 1):
+        attendu = restant[annees * 12 - 1]
+        assert capital_restant_du([montant], taux, duree, annees)[0] == pytest.approx(attendu, rel=1e-9, abs=1e-6)
+    assert capital_restant_du([montant], taux, duree, 0)[0] == pytest.approx(montant)
+
+
+@pytest.mark.parametrize("taux", [3.5, 0.0])
+def test_lot_de_prets_et_montants_invalides(taux):
+    montants = [200000, 0, -5, 90000, float('nan')]
+    plan = plan_amortissement(montants, taux, 20)
+    assert plan['interets'].shape == (5, 240)
+    for cle in ('interets', 'capital_rembourse', 'capital_restant'):
+        np.testing.assert_array_equal(plan[cle][[1, 2, 4]], 0.0)
+    np.testing.assert_array_equal(plan['mensualite'][[1, 2, 4]], 0.0)
+    np.testing.assert_allclose(plan['interets'][3], plan_boucle(90000, taux, 20)[1], rtol=1e-9, atol=1e-6)
+    np.testing.assert_array_equal(cout_total_interets(montants, taux, 20)[[1, 2, 4]], 0.0)
+    np.testing.assert_array_equal(capital_restant_du(montants, taux, 20, 5)[[1, 2, 4]], 0.0)
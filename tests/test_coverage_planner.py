@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""Planification des cercles de recherche"""
+
+from coverage_planner import plan_coverage
+
+
+def test_cercle_plus_petit_que_la_grille():
+    locations = [
+        {'name': 'Petit', 'postcode': '81000', 'latitude': 43.9, 'longitude': 2.1, 'radius_km': 0.2},
+        {'name': 'Grand', 'postcode': '12000', 'latitude': 44.9, 'longitude': 3.1, 'radius_km': 50},
+    ]
+    plan = plan_coverage(locations, max_radius_km=30)
+
+    petits = [c for c in plan['cercles'] if c['membres'] == ['Petit']]
+    assert len(petits) == 1
+    assert (petits[0]['latitude'], petits[0]['longitude'], petits[0]['radius_km']) == (43.9, 2.1, 0.2)
+    assert all(c['radius_km'] <= 30 for c in plan['cercles'])
+    assert plan['rapport']['couverture'] == 1.0
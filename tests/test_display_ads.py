@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""Format du tableau des annonces selon l'appelant"""
+
+import io
+
+from display_ads import default_output_format, display_announcements_table
+
+ANNONCES = [{'id': '1', 'prix': 150000, 'localisation': 'Albi 81000', 'description': 'Maison 4 pièces · 90 m²',
+             'surface_m2': 90, 'prix_m2': 1667, 'pieces': 4, 'date_publication': '2026-10-18',
+             'url': 'https://www.leboncoin.fr/ad/ventes_immobilieres/1'}]
+
+
+def test_format_detecte_seulement_a_la_demande():
+    sortie = io.StringIO()
+    assert default_output_format(sortie) == 'tsv'
+
+    # Appel sans format (rapport du pipeline redirigé) : toujours le tableau
+    display_announcements_table(ANNONCES, stream=sortie)
+    assert '\t' not in sortie.getvalue() and 'Albi' in sortie.getvalue()
+
+    delimite = io.StringIO()
+    display_announcements_table(ANNONCES, stream=delimite, output_format=default_output_format(delimite))
+    assert '\t' in delimite.getvalue()
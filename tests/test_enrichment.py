@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Colonnes dérivées des annonces"""
+
+from datetime import date
+
+import numpy as np
+
+from enrichment import enrichir_annonces
+
+
+def test_prix_m2_extrait_conserve():
+    annonces = [
+        {'prix': 100000, 'surface_m2': 33, 'prix_m2': 3000},  # Valeur de l'annonce, différente de 100000 / 33
+        {'prix': 100000, 'surface_m2': 40},  # Calculé : valeur absente
+        {'prix': 100000, 'prix_m2': 2500},  # Surface inconnue
+        {'prix': 100000},
+    ]
+    prix_m2 = enrichir_annonces(annonces, aujourdhui=date(2026, 10, 19))['prix_m2']
+    np.testing.assert_array_equal(prix_m2[:3], [3000, 2500, 2500])
+    assert np.isnan(prix_m2[3])
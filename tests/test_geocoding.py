@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""Géolocalisation : index hors ligne, puis Nominatim pour les communes absentes"""
+
+import geocoding
+from geocoding import GeocodeCache, get_city_coordinates
+
+
+def test_commune_absente_de_l_index(monkeypatch):
+    appels = []
+
+    def geocode_remote(location_input, max_retries=3, verbose=True):
+        appels.append(location_input)
+        return {'name': 'Lisle-sur-Tarn', 'postcode': '81310', 'latitude': 43.85, 'longitude': 1.81,
+                'input_type': 'city_name'}
+
+    monkeypatch.setattr(geocoding, 'geocode_remote', geocode_remote)
+    cache = GeocodeCache(':memory:')
+
+    # Commune de l'index livré : aucune requête
+    assert get_city_coordinates('Albi', cache=cache)['postcode'] == '81000'
+    # Commune absente de l'index : Nominatim, puis le cache
+    assert get_city_coordinates('Lisle-sur-Tarn', cache=cache)['postcode'] == '81310'
+    assert get_city_coordinates('Lisle-sur-Tarn', cache=cache)['postcode'] == '81310'
+    assert appels == ['Lisle-sur-Tarn']
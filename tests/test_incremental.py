@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Collecte incrémentale : annonces rattachées à chaque unité de collecte"""
+
+from urllib.parse import parse_qsl, urlparse
+
+import pytest
+
+from config import ARCHIVE_CONFIG
+from crawler import make_unit
+from incremental import ListingStore, run_incremental
+
+
+def _carte(numero, categorie):
+    return (f'<div class="adcard_x"><a href="/ad/{categorie}/{numero}">x</a>'
+            f'<p data-test-id="price">{100000 + numero % 100} €</p><p data-test-id="city">Albi 81000</p>'
+            f'<p class="text-body-2">Maison 3 pièces · 80 m²</p></div>')
+
+
+def test_variantes_d_une_meme_recherche(tmp_path, monkeypatch):
+    monkeypatch.setitem(ARCHIVE_CONFIG, 'enabled', False)
+    marches = {'9': ('ventes_immobilieres', range(1000, 1005)), '10': ('locations', range(2000, 2003))}
+
+    def fetch(url, output_path=None):
+        categorie, ids = marches[dict(parse_qsl(urlparse(url).query))['category']]
+        return f'<html>"total": {len(ids)}' + ''.join(_carte(n, categorie) for n in ids) + '</html>'
+
+    # Deux variantes de la recherche "albi" : même nom, URL distinctes
+    vente = make_unit('https://www.leboncoin.fr/recherche?category=9&locations=Albi', 'vente', search='albi')
+    location = make_unit('https://www.leboncoin.fr/recherche?category=10&locations=Albi', 'location', search='albi')
+    store = ListingStore(str(tmp_path / 'listings.sqlite'))
+
+    for passage in range(2):
+        resultats = run_incremental([vente, location], pages_dir=str(tmp_path), fetch=fetch, store=store,
+                                    verbose=False)
+        ventes, locations = resultats[vente['key']], resultats[location['key']]
+        assert len(ventes['annonces']) == 5 and len(locations['annonces']) == 3
+        assert {a['category'] for a in ventes['annonces']} == {'vente'}
+        assert {a['category'] for a in locations['annonces']} == {'location'}
+        assert (len(ventes['nouvelles']), len(locations['nouvelles'])) == ((5, 3) if passage == 0 else (0, 0))
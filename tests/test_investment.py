@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""Classement des investissements avec des loyers estimés par annonce"""
+
+import numpy as np
+
+from investment import meilleurs_investissements
+
+
+def test_loyers_estimes_prioritaires_sur_la_moyenne_par_pieces():
+    ventes = [{'id': str(i), 'prix': 150000, 'pieces': 3} for i in range(5)]
+    loyers_par_pieces = {3: 700}
+
+    def estimer(lot):
+        # Estimation connue pour l'annonce 2 uniquement
+        return [1200 if a['id'] == '2' else np.nan for a in lot]
+
+    classement = meilleurs_investissements(iter(ventes), k=2, critere='rendement_brut',
+                                           loyers_par_pieces=loyers_par_pieces, estimer_loyers=estimer,
+                                           taille_lot=2)
+    assert classement[0][1]['id'] == '2'
+    assert classement[0][2]['rendement_brut'] == 12 * 1200 / 150000
+    assert classement[1][2]['rendement_brut'] == 12 * 700 / 150000
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Capture des réponses de l'API de recherche, avec repli sur le parseur DOM"""
+
+import json
+from urllib.request import Request, urlopen
+
+import pytest
+
+from network_capture import collect_responses, embed_payloads, extract_listings, _serveur_demo
+
+
+class FauxNavigateur:
+    """Navigateur minimal : journal de performance et Network.getResponseBody"""
+
+    def __init__(self, reponses):
+        # reponses : liste de (url, type MIME, corps)
+        self.corps = {}
+        self.journal = []
+        for i, (url, mime, corps) in enumerate(reponses):
+            request_id = f"req-{i}"
+            self.corps[request_id] = corps
+            self.journal.append({'message': json.dumps({'message': {
+                'method': 'Network.responseReceived',
+                'params': {'requestId': request_id, 'response': {'url': url, 'mimeType': mime}}
+            }})})
+        self.journal.append({'message': json.dumps({'message': {'method': 'Network.loadingFinished', 'params': {}}})})
+
+    def get_log(self, nom):
+        assert nom == 'performance'
+        journal, self.journal = self.journal, []
+        return journal
+
+    def execute_cdp_cmd(self, commande, params):
+        assert commande == 'Network.getResponseBody'
+        return {'body': self.corps[params['requestId']], 'base64Encoded': False}
+
+
+@pytest.fixture(scope='module')
+def recherche():
+    """URL et corps JSON de l'API de recherche du serveur de démonstration"""
+    serveur = _serveur_demo()
+    url = f"http://127.0.0.1:{serveur.server_port}/finder/search"
+    with urlopen(Request(url, data=b'{}', method='POST')) as reponse:
+        corps = reponse.read().decode('utf-8')
+    serveur.shutdown()
+    return url, corps
+
+
+def _page_dom(ads):
+    """Cartes d'annonces telles que le parseur DOM les lit"""
+    cartes = ''.join(
+        f"<div class='adcard_demo'><a href='{a['url']}'>{a['subject']}</a>"
+        f"<p data-test-id='price'>{a['price'][0]} €</p><p data-test-id='city'>{a['location']['city']}</p>"
+        f"<p class='text-body-2'>{a['subject']} · {a['attributes'][0]['value']} m²</p></div>"
+        for a in ads)
+    return f"<html><body><div id='resultats'>{cartes}</div></body></html>"
+
+
+def test_annonces_lues_dans_la_capture(recherche):
+    url, corps = recherche
+    navigateur = FauxNavigateur([(url.replace('/finder/search', '/'), 'text/html', '<html></html>'),
+                                 (url, 'application/json', corps)])
+    payloads = collect_responses(navigateur)
+    assert payloads == [json.loads(corps)]
+    assert collect_responses(navigateur) == []  # Journal vidé à chaque lecture
+
+    annonces, lues, source = extract_listings(embed_payloads('<html><body></body></html>', payloads))
+    assert (len(annonces), lues, source) == (30, 30, 'api')
+    premiere = annonces[0]
+    assert premiere['id'] == '1'
+    assert premiere['url'] == 'https://www.leboncoin.fr/ad/ventes_immobilieres/3000000'
+    assert (premiere['prix'], premiere['surface_m2'], premiere['pieces']) == (150000, 60, 2)
+    assert premiere['prix_m2'] == 2500
+    assert premiere['localisation'] == 'Albi 81000'
+    assert premiere['date_publication'] == '2026-10-18'
+    assert (premiere['latitude'], premiere['longitude']) == (43.92, 2.14)
+
+
+def test_repli_sur_le_dom_sans_capture(recherche):
+    url, corps = recherche
+    ads = json.loads(corps)['ads']
+    # Aucune réponse de l'API dans le journal : la page n'est pas modifiée
+    navigateur = FauxNavigateur([(url.replace('/finder/search', '/'), 'text/html', '<html></html>')])
+    page = _page_dom(ads)
+    assert embed_payloads(page, collect_responses(navigateur)) == page
+
+    annonces, lues, source = extract_listings(page)
+    assert (len(annonces), lues, source) == (30, 30, 'dom')
+    assert annonces[0]['url'] == ads[0]['url'] and annonces[0]['prix'] == 150000
+    assert annonces[0]['surface_m2'] == 60
+
+
+def test_repli_sur_le_dom_si_capture_inexploitable(recherche):
+    _, corps = recherche
+    page = embed_payloads(_page_dom(json.loads(corps)['ads'][:3]), [{'total': 0, 'ads': []}])
+    annonces, lues, source = extract_listings(page)
+    assert (len(annonces), lues, source) == (3, 3, 'dom')
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Génération et lecture de l'index hors ligne des communes"""
+
+import csv
+
+from offline_geocoder import OfflineGeocoder, build_index
+
+
+def test_commune_sans_code_postal(tmp_path):
+    source = tmp_path / 'communes.csv'
+    with open(source, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['code_postal', 'nom_commune_complet', 'latitude', 'longitude'])
+        writer.writerow(['1000', 'Bourg-en-Bresse', '46.2052', '5.2255'])
+        writer.writerow(['', 'Commune Sans Code', '45.0', '3.0'])
+
+    index = tmp_path / 'index.csv'
+    assert build_index(str(source), str(index)) == 2
+
+    geocoder = OfflineGeocoder(str(index))
+    assert geocoder.lookup('01000')['name'] == 'Bourg-en-Bresse'
+    assert geocoder.by_postcode('00000') == []
+    assert geocoder.by_postcode('') == []
+    commune = geocoder.lookup('Commune Sans Code')
+    assert commune['postcode'] == '' and commune['latitude'] == 45.0
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Cache des modèles de loyer ajustés"""
+
+import rent_model
+from config import RENT_MODEL_CONFIG
+
+
+def _locations(decalage):
+    return [{'prix': 400 + 12 * s + decalage, 'surface_m2': s, 'pieces': 1 + s // 25, 'furnished': s % 2 == 0,
+             'localisation': 'Albi 81000'} for s in range(20, 80, 4)]
+
+
+def test_cache_borne_et_vidable(monkeypatch):
+    monkeypatch.setitem(RENT_MODEL_CONFIG, 'cache_size', 2)
+    rent_model.clear_cache()
+
+    premier = rent_model.get_rent_model(_locations(0))
+    assert rent_model.get_rent_model(_locations(0)) is premier
+    rent_model.get_rent_model(_locations(10))
+    rent_model.get_rent_model(_locations(0))  # Le premier jeu redevient le plus récent
+    rent_model.get_rent_model(_locations(20))
+    assert len(rent_model._cache) == 2
+    assert rent_model.get_rent_model(_locations(0)) is premier
+    assert rent_model.get_rent_model(_locations(10)) is not None
+
+    rent_model.clear_cache()
+    assert not rent_model._cache
+    assert rent_model.get_rent_model(_locations(0)) is not premier
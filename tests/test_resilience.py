@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Nouvelles tentatives et disjoncteur du ResilientFetcher face au serveur instable"""
+
+import pytest
+
+from resilience import (CircuitOpenError, PermanentFetchError, ResilientFetcher, TransientFetchError,
+                        _serveur_instable, http_fetch)
+
+
+@pytest.fixture
+def serveurs():
+    """Un serveur toujours en erreur (503/429) et un serveur sain"""
+    en_erreur = _serveur_instable(taux_erreur=1.0, taux_lent=0, panne=(0, 0))
+    sain = _serveur_instable(taux_erreur=0, taux_lent=0, panne=(0, 0))
+    yield (f"http://127.0.0.1:{en_erreur.server_port}", f"http://127.0.0.1:{sain.server_port}")
+    en_erreur.shutdown()
+    sain.shutdown()
+
+
+def test_nouvelles_tentatives_sur_erreur_passagere(serveurs):
+    attentes = []
+    fetcher = ResilientFetcher(http_fetch, max_retries=3, timeout=5, sleep=attentes.append,
+                               breaker_params={'min_calls': 100})
+    with pytest.raises(TransientFetchError, match="après 4 tentatives"):
+        fetcher(serveurs[0] + '/page')
+
+    compteurs = fetcher.stats()['total']
+    assert (compteurs['tentatives'], compteurs['nouvelles_tentatives'], compteurs['erreurs_transitoires']) == (4, 3, 4)
+    assert len(attentes) == 3
+    assert fetcher(serveurs[1] + '/page') == '<html>/page</html>'
+
+
+def test_erreur_definitive_non_retentee(serveurs):
+    attentes = []
+    fetcher = ResilientFetcher(http_fetch, max_retries=3, timeout=5, sleep=attentes.append)
+    with pytest.raises(PermanentFetchError):
+        fetcher(serveurs[1] + '/absent')
+
+    compteurs = fetcher.stats()['total']
+    assert (compteurs['tentatives'], compteurs['erreurs_definitives']) == (1, 1)
+    assert attentes == []
+    assert fetcher.stats()['hotes'][serveurs[1][7:]]['disjoncteur'] == 'ferme'
+
+
+def test_cycle_du_disjoncteur(serveurs):
+    # Un même hôte logique, servi par le serveur en erreur puis par le serveur sain
+    hote = 'http://site.test'
+    etat = {'cible': serveurs[0], 'envois': 0, 'rejet_pendant_essai': None}
+
+    def fetch(url, output_path=None, timeout=None):
+        etat['envois'] += 1
+        if disjoncteur().state == 'essai' and etat['rejet_pendant_essai'] is None:
+            # Une seule requête d'essai : un appel concurrent est refusé
+            with pytest.raises(CircuitOpenError):
+                fetcher(url)
+            etat['rejet_pendant_essai'] = True
+        return http_fetch(url.replace(hote, etat['cible']), output_path, timeout=timeout)
+
+    fetcher = ResilientFetcher(fetch, max_retries=0, timeout=5, sleep=lambda s: None,
+                               breaker_params={'window': 4, 'min_calls': 4, 'error_rate': 0.5, 'cooldown': 60})
+    disjoncteur = lambda: fetcher.breakers['site.test']
+
+    for _ in range(4):
+        with pytest.raises(TransientFetchError):
+            fetcher(hote + '/page')
+    assert disjoncteur().state == 'ouvert' and disjoncteur().openings == 1
+
+    # Ouvert : refus sans requête tant que le délai n'est pas écoulé
+    with pytest.raises(CircuitOpenError):
+        fetcher(hote + '/page')
+    assert etat['envois'] == 4
+
+    # Délai écoulé, essai en échec : le disjoncteur se rouvre
+    disjoncteur().opened_at -= 60
+    with pytest.raises(TransientFetchError):
+        fetcher(hote + '/page')
+    assert disjoncteur().state == 'ouvert' and disjoncteur().openings == 2
+    assert etat['rejet_pendant_essai']
+
+    # Délai écoulé, hôte rétabli : l'essai réussit et referme le disjoncteur
+    etat['cible'] = serveurs[1]
+    disjoncteur().opened_at -= 60
+    assert fetcher(hote + '/page') == '<html>/page</html>'
+    assert disjoncteur().state == 'ferme'
+    assert fetcher(hote + '/suite') == '<html>/suite</html>'
+
+    compteurs = fetcher.stats()['hotes']['site.test']
+    assert (compteurs['rejets'], compteurs['succes'], compteurs['ouvertures']) == (2, 2, 2)
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""Meilleur scénario par annonce"""
+
+import numpy as np
+
+from scenarios import ScenarioGrid
+
+
+def test_best_scenario_sans_loyer_ni_prix():
+    grid = ScenarioGrid([200000, 150000, None, 90000], [900, np.nan, 700, 650],
+                        taux=[3.0, 4.0], durees=[15, 25], apports=[0.0, 0.2])
+    best = grid.best_scenario_per_ad()
+
+    np.testing.assert_array_equal(best['scenario'][[1, 2]], [-1, -1])
+    for cle in ('ecart', 'mensualite', 'taux', 'duree', 'apport'):
+        assert np.isnan(best[cle][[1, 2]]).all()
+
+    # Écart maximal : taux le plus bas, durée la plus longue, apport le plus élevé
+    for ligne in (0, 3):
+        assert grid.scenario(best['scenario'][ligne]) == (3.0, 25, 0.2)
+        assert (best['taux'][ligne], best['duree'][ligne], best['apport'][ligne]) == (3.0, 25, 0.2)
+        assert best['ecart'][ligne] == np.nanmax(grid.ecarts[ligne])
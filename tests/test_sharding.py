@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Découpage des recherches : seules les dimensions coupées sont filtrées"""
+
+from urllib.parse import parse_qsl, urlparse
+
+from config import ARCHIVE_CONFIG
+from crawler import make_unit
+from sharding import root_shard, run_sharded, shard_url, split_shard
+
+URL = 'https://www.leboncoin.fr/recherche?category=9&locations=Albi'
+
+
+def _dans(valeur, fourchette):
+    if not fourchette:
+        return True
+    bas, haut = (fourchette.split('-') + [''])[:2]
+    return (not bas or valeur >= int(bas)) and (not haut or valeur <= int(haut))
+
+
+def test_recherche_sans_filtre():
+    racine = root_shard(URL)
+    assert racine == {'price': (None, None), 'surface': (None, None)}
+    params = dict(parse_qsl(urlparse(shard_url(URL, racine)).query))
+    assert 'price' not in params and 'square' not in params
+
+    bas, haut = split_shard(racine, [{'prix': p} for p in (100000, 200000, 300000, 400000)])
+    assert bas['price'][0] is None and haut['price'][1] is None
+    assert bas['surface'] == haut['surface'] == (None, None)
+    assert 'square' not in dict(parse_qsl(urlparse(shard_url(URL, haut)).query))
+
+
+def test_borne_ouverte_de_l_utilisateur():
+    url = URL + '&price=150000-'
+    racine = root_shard(url)
+    assert racine['price'] == (150000, None)
+    enfants = split_shard(racine, [{'prix': p} for p in (160000, 250000, 400000, 900000)])
+    assert enfants[0]['price'][0] == 150000 and enfants[-1]['price'][1] is None
+    assert dict(parse_qsl(urlparse(shard_url(url, enfants[-1])).query))['price'].endswith('-')
+
+
+def test_annonces_hors_des_bornes_par_defaut(tmp_path, monkeypatch):
+    monkeypatch.setitem(ARCHIVE_CONFIG, 'enabled', False)
+    # 100 annonces, dont 10 au-dessus de la borne par défaut de 2 M€
+    prix = {1000 + i: 50000 + 20000 * i for i in range(90)}
+    prix.update({2000 + i: 2500000 + 100000 * i for i in range(10)})
+    requetes = []
+
+    def fetch(url, output_path=None):
+        params = dict(parse_qsl(urlparse(url).query))
+        requetes.append(params)
+        ids = [n for n, p in prix.items() if _dans(p, params.get('price'))]
+        cartes = ''.join(
+            f'<div class="adcard_x"><a href="/ad/ventes_immobilieres/{n}">x</a>'
+            f'<p data-test-id="price">{prix[n]} €</p><p data-test-id="city">Albi 81000</p>'
+            f'<p class="text-body-2">Maison 4 pièces · 90 m²</p></div>' for n in ids[:35])
+        return f'<html>"total": {len(ids)}' + cartes + '</html>'
+
+    unit = make_unit(URL, 'vente')
+    result = run_sharded([unit], pages_dir=str(tmp_path), fetch=fetch, cap=35,
+                         plans_path=str(tmp_path / 'plans.json'), verbose=False)[unit['key']]
+    assert len(result['annonces']) == 100
+    assert result['satures'] == 0
+    assert all('square' not in params for params in requetes)
+    assert 'price' not in requetes[0]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Agrégats par tuiles : annonces déjà comptées"""
+
+from tile_rollup import TileRollup
+
+
+def _page(identifiants, decalage=0):
+    """Annonces d'une page extraite : 'id' renuméroté à partir de 1, identifiant réel dans l'URL"""
+    return [{'id': str(i), 'url': f"https://www.leboncoin.fr/ad/ventes_immobilieres/{ident}",
+             'prix': 150000 + decalage, 'surface_m2': 75, 'pieces': 3,
+             'latitude': 43.92, 'longitude': 2.14}
+            for i, ident in enumerate(identifiants, 1)]
+
+
+def test_ids_de_page_qui_se_chevauchent(tmp_path):
+    rollup = TileRollup(precisions=(5,))
+    assert rollup.add(_page([1001, 1002, 1003]), category='vente') == 3
+    # Mêmes 'id' 1..3 que la première page, mais deux annonces nouvelles
+    assert rollup.add(_page([1003, 1004, 1005], decalage=1500), category='vente') == 2
+    # Même identifiant dans une autre catégorie : annonce distincte
+    assert rollup.add(_page([1001]), category='location') == 1
+    assert rollup.add(_page([1002, 1005]), category='vente') == 0
+
+    assert sum(c['nombre'] for c in rollup.query(5, category='vente')) == 5
+
+    chemin = tmp_path / 'tiles.json'
+    rollup.save(str(chemin))
+    recharge = TileRollup.load(str(chemin))
+    assert recharge.seen == rollup.seen
+    assert recharge.add(_page([1004]), category='vente') == 0
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Agrégats de prix au m² par tuiles geohash
+
+Pour chaque précision geohash (4 à 7 par défaut) et chaque cellule, les annonces
+sont agrégées par catégorie (vente / location) et nombre de pièces :
+- nombre d'annonces et somme des prix au m² (loyer au m² pour les locations)
+- une esquisse de quantiles : histogramme à classes logarithmiques, fusionnable,
+  dont les quantiles ont une erreur relative bornée (TILE_CONFIG['sketch_accuracy'])
+
+Les agrégats se construisent de façon incrémentale (les annonces déjà comptées
+sont ignorées) et sont enregistrés dans un fichier JSON. Une carte se lit en
+parcourant les cellules d'une précision, sans reparcourir les annonces.
+"""
+
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+from ad_index import ad_id
+from config import TILE_CONFIG
+from spatial_index import resoudre_coordonnees
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION_MAX = 7
+
+
+def encode_geohash(latitudes, longitudes, precision=PRECISION_MAX):
+    """
+    Geohash entier de chaque point (5 bits par caractère, bits longitude/latitude alternés)
+
+    Returns:
+        numpy.ndarray: Entiers de 5 × precision bits (-1 pour un point sans coordonnées)
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    valides = np.isfinite(latitudes) & np.isfinite(longitudes)
+    nb_bits = 5 * precision
+    bits_lon, bits_lat = (nb_bits + 1) // 2, nb_bits // 2
+
+    x = np.clip((np.nan_to_num(longitudes) + 180) / 360 * (1 << bits_lon), 0, (1 << bits_lon) - 1).astype(np.int64)
+    y = np.clip((np.nan_to_num(latitudes) + 90) / 180 * (1 << bits_lat), 0, (1 << bits_lat) - 1).astype(np.int64)
+
+    # Entrelacement : le bit de poids fort est un bit de longitude
+    code = np.zeros(latitudes.shape, dtype=np.int64)
+    for i in range(nb_bits):
+        if i % 2 == 0:
+            bit = (x >> (bits_lon - 1 - i // 2)) & 1
+        else:
+            bit = (y >> (bits_lat - 1 - i // 2)) & 1
+        code = (code << 1) | bit
+    return np.where(valides, code, -1)
+
+
+def geohash_str(code, precision):
+    """Convertit un geohash entier en chaîne ('spey61y')"""
+    code = int(code)
+    return ''.join(BASE32[(code >> (5 * (precision - 1 - i))) & 31] for i in range(precision))
+
+
+def geohash_bbox(code, precision):
+    """
+    Rectangle couvert par un geohash entier
+
+    Returns:
+        tuple: (lat_min, lat_max, lon_min, lon_max)
+    """
+    code = int(code)
+    nb_bits = 5 * precision
+    bits_lon, bits_lat = (nb_bits + 1) // 2, nb_bits // 2
+    x = y = 0
+    for i in range(nb_bits):
+        bit = (code >> (nb_bits - 1 - i)) & 1
+        if i % 2 == 0:
+            x = (x << 1) | bit
+        else:
+            y = (y << 1) | bit
+    d_lon, d_lat = 360 / (1 << bits_lon), 180 / (1 << bits_lat)
+    return -90 + y * d_lat, -90 + (y + 1) * d_lat, -180 + x * d_lon, -180 + (x + 1) * d_lon
+
+
+class TileRollup:
+    """Agrégats (nombre, somme, esquisse de quantiles) par cellule geohash, catégorie et pièces"""
+
+    def __init__(self, precisions=None, accuracy=None):
+        """
+        Args:
+            precisions (tuple, optional): Précisions geohash (défaut: TILE_CONFIG['precisions'])
+            accuracy (float, optional): Précision relative des quantiles (défaut: TILE_CONFIG)
+        """
+        self.precisions = tuple(precisions or TILE_CONFIG['precisions'])
+        self.accuracy = accuracy or TILE_CONFIG['sketch_accuracy']
+        self.gamma = (1 + self.accuracy) / (1 - self.accuracy)
+        # cells[precision][(geohash, catégorie, pièces)] = [nombre, somme, {classe: nombre}]
+        self.cells = {p: {} for p in self.precisions}
+        self.seen = set()
+
+    def add(self, announcements, category=None):
+        """
+        Ajoute des annonces aux agrégats (les annonces déjà comptées sont ignorées)
+
+        Une annonce est reconnue par sa catégorie et son identifiant Le Bon Coin
+        (ad_index.ad_id) : le champ 'id' est renuméroté à chaque page.
+
+        Args:
+            announcements (list): Annonces à agréger
+            category (str, optional): Catégorie des annonces qui n'ont pas de champ 'category'
+                                      ('vente' ou 'location')
+
+        Returns:
+            int: Nombre d'annonces ajoutées
+        """
+        nouvelles = []
+        for annonce in announcements:
+            identifiant = ad_id(annonce)
+            cle = (annonce.get('category') or category or '', identifiant)
+            if identifiant and cle in self.seen:
+                continue
+            if identifiant:
+                self.seen.add(cle)
+            nouvelles.append(annonce)
+        if not nouvelles:
+            return 0
+
+        # Prix au m² (loyer au m² pour une location)
+        valeurs = np.array([self._prix_m2(a) for a in nouvelles], dtype=float)
+        lat, lon = resoudre_coordonnees(nouvelles)
+        codes = encode_geohash(lat, lon, PRECISION_MAX)
+        gardees = (codes >= 0) & (valeurs > 0)
+        if not gardees.any():
+            return 0
+
+        categories = np.array([a.get('category') or category or '' for a in nouvelles], dtype=object)[gardees]
+        pieces = np.array([a['pieces'] if isinstance(a.get('pieces'), int) else 0 for a in nouvelles])[gardees]
+        valeurs, codes = valeurs[gardees], codes[gardees]
+        classes = np.ceil(np.log(valeurs) / np.log(self.gamma)).astype(np.int64)
+        noms, cat_codes = np.unique(categories.astype(str), return_inverse=True)
+
+        for precision in self.precisions:
+            cellules = codes >> (5 * (PRECISION_MAX - precision))
+            groupes = np.stack([cellules, cat_codes, pieces, classes], axis=1)
+            uniques, inverse, comptes = np.unique(groupes, axis=0, return_inverse=True, return_counts=True)
+            sommes = np.bincount(inverse.ravel(), weights=valeurs, minlength=len(uniques))
+
+            table = self.cells[precision]
+            for (cellule, cat, nb_pieces, classe), compte, somme in zip(uniques.tolist(), comptes.tolist(), sommes):
+                entree = table.setdefault((cellule, str(noms[cat]), nb_pieces), [0, 0.0, {}])
+                entree[0] += compte
+                entree[1] += float(somme)
+                entree[2][classe] = entree[2].get(classe, 0) + compte
+        return int(gardees.sum())
+
+    @staticmethod
+    def _prix_m2(annonce):
+        """Prix au m² d'une annonce (calculé depuis le prix et la surface si absent)"""
+        if isinstance(annonce.get('prix_m2'), (int, float)):
+            return annonce['prix_m2']
+        prix, surface = annonce.get('prix'), annonce.get('surface_m2')
+        if isinstance(prix, (int, float)) and isinstance(surface, (int, float)) and surface > 0:
+            return prix / surface
+        return np.nan
+
+    def _quantile(self, histogramme, total, q):
+        """Quantile approché d'un histogramme logarithmique"""
+        rang = q * (total - 1)
+        cumul = 0
+        for classe in sorted(histogramme):
+            cumul += histogramme[classe]
+            if cumul > rang:
+                # Milieu de la classe ]gamma^(c-1), gamma^c] : erreur relative <= accuracy
+                return 2 * self.gamma ** classe / (self.gamma + 1)
+        return float('nan')
+
+    def query(self, precision, category=None, pieces=None, bbox=None, quantiles=(0.25, 0.5, 0.75)):
+        """
+        Cellules d'une précision, fusionnées sur les critères non précisés
+
+        Args:
+            precision (int): Précision geohash
+            category (str, optional): 'vente' ou 'location' (défaut: toutes)
+            pieces (int, optional): Nombre de pièces (défaut: tous)
+            bbox (tuple, optional): (lat_min, lat_max, lon_min, lon_max) à couvrir
+            quantiles (tuple): Quantiles à estimer
+
+        Returns:
+            list: Un dictionnaire par cellule : 'geohash', 'bbox', 'nombre', 'moyenne', 'q<quantile>'
+        """
+        if precision not in self.cells:
+            raise ValueError(f"Précision non agrégée : {precision} (disponibles : {self.precisions})")
+
+        fusion = {}
+        for (cellule, cat, nb_pieces), (compte, somme, histogramme) in self.cells[precision].items():
+            if (category is not None and cat != category) or (pieces is not None and nb_pieces != pieces):
+                continue
+            entree = fusion.setdefault(cellule, [0, 0.0, {}])
+            entree[0] += compte
+            entree[1] += somme
+            for classe, n in histogramme.items():
+                entree[2][classe] = entree[2].get(classe, 0) + n
+
+        resultats = []
+        for cellule, (compte, somme, histogramme) in sorted(fusion.items()):
+            rectangle = geohash_bbox(cellule, precision)
+            if bbox and (rectangle[1] < bbox[0] or rectangle[0] > bbox[1]
+                         or rectangle[3] < bbox[2] or rectangle[2] > bbox[3]):
+                continue
+            ligne = {
+                'geohash': geohash_str(cellule, precision),
+                'bbox': rectangle,
+                'nombre': compte,
+                'moyenne': round(somme / compte, 2)
+            }
+            for q in quantiles:
+                ligne[f"q{int(q * 100)}"] = round(self._quantile(histogramme, compte, q), 2)
+            resultats.append(ligne)
+        return resultats
+
+    def save(self, path=None):
+        """Enregistre les agrégats dans un fichier JSON"""
+        data = {
+            'precisions': self.precisions,
+            'accuracy': self.accuracy,
+            'seen': sorted(list(cle) for cle in self.seen),
+            'cells': {
+                str(p): [[c, cat, nb, compte, somme, {str(k): v for k, v in h.items()}]
+                         for (c, cat, nb), (compte, somme, h) in table.items()]
+                for p, table in self.cells.items()
+            }
+        }
+        with open(path or TILE_CONFIG['path'], 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path=None):
+        """Charge les agrégats enregistrés (agrégats vides si le fichier n'existe pas)"""
+        path = path or TILE_CONFIG['path']
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        rollup = cls(precisions=data['precisions'], accuracy=data['accuracy'])
+        rollup.seen = {tuple(cle) for cle in data['seen'] if isinstance(cle, list)}
+        for p, lignes in data['cells'].items():
+            rollup.cells[int(p)] = {
+                (c, cat, nb): [compte, somme, {int(k): v for k, v in h.items()}]
+                for c, cat, nb, compte, somme, h in lignes
+            }
+        return rollup
+
+
+def export_geojson(cells, path):
+    """Écrit les cellules de TileRollup.query en GeoJSON (un polygone par cellule)"""
+    features = []
+    for cell in cells:
+        lat_min, lat_max, lon_min, lon_max = cell['bbox']
+        features.append({
+            'type': 'Feature',
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [[[lon_min, lat_min], [lon_max, lat_min], [lon_max, lat_max],
+                                 [lon_min, lat_max], [lon_min, lat_min]]]
+            },
+            'properties': {k: v for k, v in cell.items() if k != 'bbox'}
+        })
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f, ensure_ascii=False)
+
+
+def export_csv(cells, path):
+    """Écrit les cellules de TileRollup.query en CSV (centre et rectangle de chaque cellule)"""
+    colonnes = [k for k in (cells[0] if cells else {}) if k != 'bbox']
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(colonnes + ['latitude', 'longitude', 'lat_min', 'lat_max', 'lon_min', 'lon_max'])
+        for cell in cells:
+            lat_min, lat_max, lon_min, lon_max = cell['bbox']
+            writer.writerow([cell[k] for k in colonnes]
+                            + [(lat_min + lat_max) / 2, (lon_min + lon_max) / 2, lat_min, lat_max, lon_min, lon_max])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ('add', 'export') or (sys.argv[1] == 'add' and len(sys.argv) < 4):
+        print("Usage: python tile_rollup.py add <vente|location> <annonces.json> [...]")
+        print("       python tile_rollup.py export <sortie.geojson|sortie.csv> [précision] [vente|location] [pièces]")
+        sys.exit(1)
+
+    rollup = TileRollup.load()
+    if sys.argv[1] == 'add':
+        from display_ads import load_announcements
+
+        for fichier in sys.argv[3:]:
+            ajoutees = rollup.add(load_announcements(fichier) or [], category=sys.argv[2])
+            print(f"{fichier} : {ajoutees} annonces ajoutées aux agrégats")
+        rollup.save()
+    else:
+        sortie = sys.argv[2]
+        precision = int(sys.argv[3]) if len(sys.argv) > 3 else rollup.precisions[0]
+        categorie = sys.argv[4] if len(sys.argv) > 4 else None
+        pieces = int(sys.argv[5]) if len(sys.argv) > 5 else None
+        cells = rollup.query(precision, category=categorie, pieces=pieces)
+        (export_csv if sortie.endswith('.csv') else export_geojson)(cells, sortie)
+        print(f"{len(cells)} cellules (précision {precision}) exportées dans {sortie}")
@@ -1,4 +1,4 @@
-from urllib.parse import urlencode, urlparse, parse_qs, urlunparse
+from urllib.parse import urlencode, urlparse, parse_qs, parse_qsl, urlunparse
 from config import DEFAULT_SEARCH_PARAMS, RENTAL_PARAMS, SCRAPER_CONFIG
 
 class LBCUrlBuilder:
@@ -145,11 +145,14 @@ class LBCUrlBuilder:
         query_string = urlencode(params, doseq=True)
         return f"{self.BASE_URL}?{query_string}"
     
-    def get_rental_url(self):
+    def get_rental_url(self, furnished=None):
         """
         Retourne une URL pour la location (catégorie 10) avec des paramètres optimisés
         pour la recherche de locations (appartements et maisons).
         
+        Args:
+            furnished (int, optional): 1 pour meublé, 2 pour non meublé, None pour ne pas filtrer
+        
         Returns:
             str: URL pour la recherche de locations
         """
@@ -160,6 +163,9 @@ class LBCUrlBuilder:
         if 'locations' in self.params and self.params['locations']:
             rental_params['locations'] = self.params['locations']
         
+        if furnished in [1, 2]:
+            rental_params['furnished'] = str(furnished)
+        
         # Construire l'URL avec les paramètres optimisés pour la location
         return self.build(category_id='10', custom_params=rental_params)
         
@@ -173,6 +179,13 @@ class LBCUrlBuilder:
         return self.build()
 
 
+def canonical_url(url):
+    """URL dont les paramètres sont triés, pour reconnaître deux recherches identiques"""
+    parsed = urlparse(str(url))
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=False)))
+    return urlunparse(parsed._replace(query=query, fragment=''))
+
+
 if __name__ == "__main__":
     # Exemple d'utilisation
     builder = LBCUrlBuilder()